@@ -19,5 +19,64 @@ CREATE TABLE IF NOT EXISTS products(
                         emba_report_path VARCHAR(1024),
                         embark_report_link VARCHAR(1024),
                         runner_uuid CHAR(128),
-                        additional_data JSON
-                    );
\ No newline at end of file
+                        additional_data JSON,
+                        natural_key CHAR(64) GENERATED ALWAYS AS (SHA2(LOWER(CONCAT_WS(CHAR(31 USING utf8mb4),
+                        COALESCE(manufacturer, ''), COALESCE(product_name, ''),
+                        COALESCE(product_type, ''), COALESCE(version, ''),
+                        COALESCE(download_link, ''))), 256)) STORED,
+                        UNIQUE INDEX natural_key (natural_key)
+                    );
+
+CREATE TABLE IF NOT EXISTS firmware_checksums(
+                        product_id INT PRIMARY KEY,
+                        md5 CHAR(32),
+                        sha1 CHAR(40),
+                        sha256 CHAR(64),
+                        file_size BIGINT,
+                        INDEX (sha256)
+                    );
+
+CREATE TABLE IF NOT EXISTS download_validators(
+                        link_hash CHAR(64) PRIMARY KEY,
+                        download_link VARCHAR(1024),
+                        etag VARCHAR(255),
+                        last_modified VARCHAR(64),
+                        content_length BIGINT,
+                        content_type VARCHAR(255),
+                        checked_at DATETIME
+                    );
+
+CREATE TABLE IF NOT EXISTS download_queue(
+                        product_id INT PRIMARY KEY,
+                        manufacturer VARCHAR(128),
+                        priority INT DEFAULT 0,
+                        attempts INT DEFAULT 0,
+                        last_error TEXT,
+                        next_attempt_at DATETIME,
+                        lease_owner VARCHAR(128),
+                        lease_expires_at DATETIME,
+                        INDEX claim (manufacturer, next_attempt_at, priority)
+                    );
+
+CREATE TABLE IF NOT EXISTS unpacked_archives(
+                        sha256 CHAR(64) PRIMARY KEY,
+                        extract_dir VARCHAR(1024),
+                        num_files INT,
+                        error TEXT,
+                        unpacked_at DATETIME
+                    );
+
+CREATE TABLE IF NOT EXISTS firmware_files(
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        product_id INT,
+                        archive_sha256 CHAR(64),
+                        member_path VARCHAR(1024),
+                        file_path VARCHAR(1024),
+                        md5 CHAR(32),
+                        sha1 CHAR(40),
+                        sha256 CHAR(64),
+                        file_size BIGINT,
+                        INDEX (product_id),
+                        INDEX (archive_sha256),
+                        INDEX (sha256)
+                    );
@@ -14,6 +14,8 @@ ignored_exceptions = (Exception)
 
 
 class ABBScraper(Scraper):
+    name = MANUFACTURER
+
     def __init__(
         self,
         driver,
@@ -23,7 +25,6 @@ class ABBScraper(Scraper):
     ):
         self.scrape_entry_url = scrape_entry_url
         self.max_products = max_products
-        self.name = MANUFACTURER
         self.__scrape_cnt = 0
         self.headless = headless
         self.logger = get_logger()
@@ -12,9 +12,10 @@ from src.logger import *
 
 
 class AVMScraper(Scraper):
+    name = "AVM"
+
     def __init__(self, driver, max_products: int = float("inf")):
         self.url = "https://download.avm.de"
-        self.name = "AVM"
         self.fw_types = [".image", ".exe", ".zip", ".dmg"]
         self.catalog = []
         self.logger = get_logger()
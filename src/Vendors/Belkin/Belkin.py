@@ -6,9 +6,10 @@ from src.logger import *
 
 
 class BelkinScraper:
+    name = "Belkin"
+
     def __init__(self, driver, max_products: int = float("inf")):
         self.url = "https://www.belkin.com/support-article/?articleNum=10807"
-        self.name = "Belkin"
         self.driver = driver
         self.catalog: list[dict] = []
         self.logger = get_logger()
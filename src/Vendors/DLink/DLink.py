@@ -1,5 +1,6 @@
 import time
 import json
+from typing import Iterator
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support.ui import Select
@@ -13,8 +14,32 @@ DOWNLOAD_URL = "https://tsd.dlink.com.tw/ddgo"
 MANUFACTURER = "DLink"
 ignored_exceptions = (Exception)
 
+# runs a download link with window.open() and form.submit() intercepted, returns the requested URL
+RESOLVE_DOWNLOAD_SCRIPT = """
+var resolved = null;
+var open = window.open;
+var submit = HTMLFormElement.prototype.submit;
+window.open = function (url) { resolved = new URL(url, location.href).href; return null; };
+HTMLFormElement.prototype.submit = function () {
+    var url = new URL(this.action, location.href);
+    new FormData(this).forEach(function (value, key) { url.searchParams.append(key, value); });
+    resolved = url.href;
+};
+try {
+    eval(arguments[0].replace(/^javascript:/, ''));
+} finally {
+    window.open = open;
+    HTMLFormElement.prototype.submit = submit;
+}
+return resolved;
+"""
+
 
 class DLinkScraper(Scraper):
+    name = MANUFACTURER
+    supports_checkpoints = True
+    resolves_downloads = True
+
     def __init__(
         self,
         driver,
@@ -26,9 +51,9 @@ class DLinkScraper(Scraper):
         self.logger = get_logger()
         self.max_products = max_products
         self.headless = headless
-        self.name = MANUFACTURER
         self.__scrape_cnt = 0
         self.__meta_data = []
+        self.__download_page_open = False
 
         self.driver = driver
 
@@ -283,7 +308,7 @@ class DLinkScraper(Scraper):
                 category_name = sel_product_selector.get_attribute('innerHTML')
                 time.sleep(2)
 
-                WebDriverWait(self.driver, 1000).until(
+                WebDriverWait(self.driver, 30).until(
                     EC.element_to_be_clickable(sel_product_selector))\
                     .click()
 
@@ -327,7 +352,7 @@ class DLinkScraper(Scraper):
 
         return None
 
-    def scrape_without_category(self):
+    def scrape_without_category(self) -> Iterator[dict]:
         try:
             type_sel = self.__get_type_selector()
             type_options = type_sel.find_elements(By.TAG_NAME, 'option')
@@ -368,6 +393,11 @@ class DLinkScraper(Scraper):
                     # Get Name of Product Model
                     option_model_name = model_options[j].get_attribute('value')
 
+                    # Skip Models already scraped by an aborted run
+                    checkpoint_key = option_type_name + '/' + option_model_name
+                    if self.is_done(checkpoint_key):
+                        continue
+
                     # Select Product Model
                     model_select = Select(model_sel)
                     model_select.select_by_visible_text(option_model_name)
@@ -380,12 +410,18 @@ class DLinkScraper(Scraper):
                     self.logger.debug("Could not Select Model Type")
                     continue
 
+                # Emit Firmware of Model as soon as it is scraped
+                if self.__meta_data:
+                    yield from self.__meta_data
+                    self.__meta_data = []
+                    self.mark_done(checkpoint_key)
+
                 if self.__scrape_cnt == self.max_products:
                     return
 
                 time.sleep(1)
 
-    def download_firmware(self, links: list):
+    def __open_download_page(self) -> bool:
         try:
             self.driver.get(self.scrape_entry_url)
             type_sel = self.__get_type_selector()
@@ -402,6 +438,28 @@ class DLinkScraper(Scraper):
             self.logger.important(firmware_url_success(DOWNLOAD_URL))
         except ignored_exceptions:
             self.logger.error(firmware_scraping_failure(DOWNLOAD_URL))
+            return False
+        self.__download_page_open = True
+        return True
+
+    def resolve_download(self, download_link: str):
+        # download links are calls of the page's dwn() function, which opens or submits the
+        # URL of the binary. Both are intercepted to hand the URL to the core instead.
+        if not self.__download_page_open and not self.__open_download_page():
+            return None
+        try:
+            resolved = self.driver.execute_script(
+                RESOLVE_DOWNLOAD_SCRIPT, download_link
+            )
+        except ignored_exceptions:
+            self.logger.debug('Could not resolve Download Link -> ' + download_link)
+            return None
+        if not resolved:
+            return None
+        return (resolved, *self.get_browser_session())
+
+    def download_firmware(self, links: list):
+        if not self.__open_download_page():
             self.driver.quit()
             return []
 
@@ -412,7 +470,10 @@ class DLinkScraper(Scraper):
         self.driver.quit()
 
     def scrape_metadata(self) -> list:
-        meta_data = []
+        return list(self.iter_metadata())
+
+    def iter_metadata(self) -> Iterator[dict]:
+        meta_data_cnt = 0
         self.__scrape_cnt = 0
         self.__meta_data = []
 
@@ -429,18 +490,18 @@ class DLinkScraper(Scraper):
         except ignored_exceptions:
             self.logger.error(firmware_scraping_failure(self.scrape_entry_url))
             self.driver.quit()
-            return []
+            return
 
         time.sleep(5)
 
         '''Function Loop Categorys doesnt work properly'''
         # self._loop_categorys()
 
-        self.scrape_without_category()
+        for firmware_item in self.scrape_without_category():
+            meta_data_cnt += 1
+            yield firmware_item
 
-        meta_data = self.__meta_data
-
-        self.logger.debug('Metadata Found -> ' + str(len(meta_data)))
+        self.logger.debug('Metadata Found -> ' + str(meta_data_cnt))
         self.logger.important(finish_scraping())
 
         self.__scrape_cnt = 0
@@ -448,8 +509,6 @@ class DLinkScraper(Scraper):
 
         self.driver.quit()
 
-        return meta_data
-
 
 if __name__ == "__main__":
     from selenium import webdriver
@@ -12,6 +12,10 @@ ignored_exceptions = (Exception)
 
 
 class EngeniusScraper(Scraper):
+    name = MANUFACTURER
+    resolves_downloads = True
+    session_url = HOME_URL
+
     def __init__(
         self,
         driver,
@@ -20,7 +24,6 @@ class EngeniusScraper(Scraper):
         max_products: int = float("inf")
     ):
         self.scrape_entry_url = scrape_entry_url
-        self.name = MANUFACTURER
         self.logger = get_logger()
         self.max_products = max_products
         self.headless = headless
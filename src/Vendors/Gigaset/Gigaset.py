@@ -6,9 +6,10 @@ from src.Vendors.scraper import Scraper
 
 
 class GigasetScraper(Scraper):
+    name = "Gigaset"
+
     def __init__(self, driver, max_products: int = float("inf")):
         self.url = "https://teamwork.gigaset.com/gigawiki/pages/viewpage.action?pageId=37486876"
-        self.name = "Gigaset"
         self.driver = driver
         self.catalog: list[dict] = []
         self.logger = get_logger()
@@ -8,11 +8,12 @@ from src.Vendors.scraper import Scraper
 
 
 class LinksysScraper(Scraper):
+    name = "Linksys"
+
     def __init__(
         self, driver, max_products: int = float("inf"), headless: bool = True
     ):
         self.url = "https://www.linksys.com/sitemap"
-        self.name = "Linksys"
         self.driver = driver
         self.logger = get_logger()
         self.max_products: int = max_products
@@ -13,6 +13,8 @@ SEL_CHILD_XPATH = './*'
 
 
 class NetgearScraper:
+    name = MANUFACTURER
+
     def __init__(
         self,
         driver,
@@ -21,7 +23,6 @@ class NetgearScraper:
         max_products: int = float("inf")
     ):
         self.scrape_entry_url = scrape_entry_url
-        self.name = MANUFACTURER
         self.logger = get_logger()
         self.max_products = max_products
         self.headless = headless
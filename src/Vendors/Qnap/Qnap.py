@@ -10,6 +10,8 @@ MANUFACTURER = "Qnap"
 
 
 class QnapScraper(Scraper):
+    name = MANUFACTURER
+
     def __init__(
         self,
         driver,
@@ -21,7 +23,6 @@ class QnapScraper(Scraper):
         self.logger = get_logger()
         self.max_products = max_products
         self.headless = headless
-        self.name = MANUFACTURER
         self.__scrape_cnt = 0
         self.driver = driver
 
@@ -14,10 +14,11 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 
 class RockwellScraper(Scraper):
+    name = "Rockwell"
+
     def __init__(self, driver, max_products: int = float("inf"), headless: bool = False):
         self.login_url = "https://compatibility.rockwellautomation.com/Pages/MyProfile.aspx"
         self.url = "https://compatibility.rockwellautomation.com/Pages/MultiProductDownload.aspx"
-        self.name = "Rockwell"
         self.logger = get_logger()
         self.driver = driver
         self.max_products: int = max_products
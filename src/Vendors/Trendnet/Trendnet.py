@@ -10,6 +10,10 @@ DOWNLOAD_BASE_LINK = "https://www.trendnet.com/asp/download_manager/inc_download
 
 
 class TrendnetScraper(Scraper):
+    name = MANUFACTURER
+    resolves_downloads = True
+    session_url = HOME_URL
+
     def __init__(
         self,
         driver,
@@ -17,7 +21,6 @@ class TrendnetScraper(Scraper):
         headless: bool = True,
         max_products: int = float("inf")
     ):
-        self.name = MANUFACTURER
         self.scrape_entry_url = scrape_entry_url
         self.logger = get_logger()
         self.__scrape_cnt = 0
@@ -14,6 +14,8 @@ ignored_exceptions = (Exception)
 
 
 class ZyxelScraper(Scraper):
+    name = "Zyxel"
+
     def __init__(
         self,
         driver,
@@ -22,7 +24,6 @@ class ZyxelScraper(Scraper):
         max_products: int = float("inf"),
     ):
         self.scrape_entry_url = scrape_entry_url
-        self.name = "Zyxel"
         self.max_products = max_products
         self.headless = headless
         self.logger = get_logger()
@@ -11,6 +11,8 @@ DOWNLOAD_URL = "https://dd-wrt.com/support/other-downloads/?path=betas"
 
 
 class DDWRTScraper(Scraper):
+    name = "DD-WRT"
+
     def __init__(
         self,
         driver,
@@ -18,7 +20,6 @@ class DDWRTScraper(Scraper):
         headless: bool = True,
         max_products: int = float("inf"),
     ):
-        self.name = "DD-WRT"
         self.logger = get_logger()
         self.scrape_entry_url = scrape_entry_url
         self.headless = headless
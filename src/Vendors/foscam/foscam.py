@@ -14,6 +14,7 @@ VENDOR_URL = 'https://www.foscam.com/downloads/index.html'
 
 
 class FoscamScraper(Scraper):
+    name = "foscam"
 
     def __init__(
             self,
@@ -25,7 +26,6 @@ class FoscamScraper(Scraper):
     ):
         self.headless = headless
         self.url = url
-        self.name = "foscam"
         self.max_products = max_products
         self.driver = driver
         self.driver.implicitly_wait(0.5)  # has to be set only once
@@ -10,7 +10,7 @@ These products are therefore filtered out.
 """
 import json
 import re
-from typing import Optional
+from typing import Iterator, Optional
 
 from selenium.common import WebDriverException
 from selenium.webdriver.common.by import By
@@ -28,6 +28,9 @@ DOWNLOAD_URL_USA = "https://www.se.com/us/en/download/doc-group-type/3587139-Sof
 
 
 class SchneiderElectricScraper(Scraper):
+    name = "SchneiderElectric"
+    supports_checkpoints = True
+
     def __init__(
         self,
         driver,
@@ -38,7 +41,6 @@ class SchneiderElectricScraper(Scraper):
         self.scrape_entry_url = scrape_entry_url
         self.max_products = max_products
         self.headless = headless
-        self.name = "SchneiderElectric"
         self.logger = get_logger()
         self.driver = driver
         self.driver.implicitly_wait(0.5)  # has to be set only once
@@ -226,6 +228,9 @@ class SchneiderElectricScraper(Scraper):
             return False
 
     def scrape_metadata(self) -> list[dict]:
+        return list(self.iter_metadata())
+
+    def iter_metadata(self) -> Iterator[dict]:
         self.logger.important(start_scraping())
 
         CSS_SELECTOR_REJECT_COOKIES = "#onetrust-reject-all-handler"
@@ -238,7 +243,7 @@ class SchneiderElectricScraper(Scraper):
         except WebDriverException as e:
             self.logger.error(entry_point_url_failure(self.scrape_entry_url))
             self.logger.important(abort_scraping())
-            return []
+            return
 
         firmware_product_urls = self._scrape_product_page_urls()
         while self._get_next_result_page():
@@ -247,16 +252,18 @@ class SchneiderElectricScraper(Scraper):
                 break
 
         if not firmware_product_urls:
-            return []
+            return
 
         # iterate over found products
-        extracted_data = []
         for product_url in firmware_product_urls[: self.max_products]:
+            if self.is_done(product_url):
+                continue
             if firmware_items := self._scrape_product_metadata(product_url):
-                extracted_data += firmware_items
+                yield from firmware_items
+                # pages without firmware (or failed pages) are not checkpointed and visited again on resume
+                self.mark_done(product_url)
 
         self.logger.important(finish_scraping())
-        return extracted_data
 
 
 if __name__ == "__main__":
@@ -1,9 +1,77 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
 
 
 class Scraper(ABC):
     """Defines public interface of vendor-specific scraper classes."""
 
+    # Vendor name as class attribute, so that the core can identify a vendor without starting a browser.
+    name: str = None
+
+    # Checkpoint of an aborted scrape, set by the core. See src/checkpoint.py.
+    # Scrapers that skip finished work via is_done() set supports_checkpoints to True.
+    supports_checkpoints: bool = False
+    checkpoint = None
+
+    # Scrapers with a browser-driven download_firmware() that can instead resolve their download links
+    # to plain HTTP requests set resolves_downloads to True. See resolve_download().
+    resolves_downloads: bool = False
+
+    # Page to open once before the first link is resolved, for scrapers whose download links are plain
+    # URLs that only need the session cookies of that page. See resolve_download().
+    session_url: str = None
+    _session_opened: bool = False
+
+    def set_checkpoint(self, checkpoint):
+        """Sets the checkpoint the scraper records its progress in."""
+        self.checkpoint = checkpoint
+
+    def is_done(self, key: str) -> bool:
+        """
+        Returns True if the unit of work identified by key (e.g. a category, result page or product URL)
+        was finished by an earlier, aborted scrape and can be skipped.
+        """
+        return self.checkpoint is not None and self.checkpoint.is_done(key)
+
+    def mark_done(self, key: str):
+        """
+        Marks the unit of work identified by key as finished.
+        Must be called after all records of that unit of work have been yielded by iter_metadata().
+        """
+        if self.checkpoint is not None:
+            self.checkpoint.mark_done(key)
+
+    def resolve_download(self, download_link: str):
+        """
+        Resolves a scraped download link to the HTTP request of the firmware binary, so that the core
+        downloads it instead of the browser. Only called if resolves_downloads is True.
+
+        The default requests the link itself, with the cookies and user agent of the scraper's browser.
+        If session_url is set, the browser opens it once beforehand to get its session cookies.
+
+        Returns:
+            A tuple (url, headers, cookies) with dicts of request headers and cookies,
+            or None if the link can only be downloaded by download_firmware().
+        """
+        if self.session_url is not None and not self._session_opened:
+            self.driver.get(self.session_url)
+            self._session_opened = True
+        return (download_link, *self.get_browser_session())
+
+    def get_browser_session(self) -> tuple[dict, dict]:
+        """
+        Returns the headers and cookies that make a plain HTTP request look like it was sent by the
+        scraper's browser, as a tuple (headers, cookies).
+        """
+        headers = {
+            "User-Agent": self.driver.execute_script("return navigator.userAgent;"),
+            "Referer": self.driver.current_url,
+        }
+        cookies = {
+            cookie["name"]: cookie["value"] for cookie in self.driver.get_cookies()
+        }
+        return headers, cookies
+
     @abstractmethod
     def scrape_metadata(self) -> list[dict]:
         """
@@ -27,6 +95,19 @@ class Scraper(ABC):
         """
         pass
 
+    def iter_metadata(self) -> Iterator[dict]:
+        """
+        Yields firmware metadata of the respective vendor one dict at a time, as soon as it is scraped.
+
+        The core persists yielded dicts in batches, so that a crash late in a long scrape does not lose
+        everything scraped so far and memory does not grow with the size of the catalog.
+        The dicts are expected in the same format as returned by scrape_metadata().
+
+        Scrapers should override this method to emit records while scraping. The default falls back
+        to scrape_metadata() and therefore only yields after the whole catalog has been scraped.
+        """
+        yield from self.scrape_metadata()
+
     def get_attributes_to_compare(self) -> list[str]:
         """
         Defines keys (as defined by scrape_metadata()) to be used by the core when comparing
@@ -10,13 +10,14 @@ DOWNLOAD_URL_EN = "https://www.swisscom.ch/en/residential/help/device/firmware.h
 
 
 class SwisscomScraper(Scraper):
+    name = "Swisscom"
+
     def __init__(
         self, driver, scrape_entry_url: str = DOWNLOAD_URL_EN, headless: bool = True, max_products: int = float("inf")
     ):
         self.logger = get_logger()
         self.scrape_entry_url = scrape_entry_url
         self.headless = headless
-        self.name = "Swisscom"
         self.driver = driver
         self.driver.implicitly_wait(0.5)  # has to be set only once
 
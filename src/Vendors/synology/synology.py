@@ -27,6 +27,8 @@ SELECTOR_DOWNLOAD = (
 
 
 class SynologyScraper(Scraper):
+    name = "Synology"
+
     def __init__(
         self,
         driver,
@@ -36,7 +38,6 @@ class SynologyScraper(Scraper):
     ):
         self.headless = headless
         self.url = url
-        self.name = "Synology"
         self.max_products = max_products
         self.driver = driver
         self.driver.implicitly_wait(0.5)  # has to be set only once
@@ -11,6 +11,8 @@ DOWNLOAD_URL_GLOBAL = "https://www.tp-link.com/en/support/download/"
 
 
 class TPLinkScraper(Scraper):
+    name = "TP-Link"
+
     def __init__(
         self,
         driver,
@@ -22,7 +24,6 @@ class TPLinkScraper(Scraper):
         self.scrape_entry_url = scrape_entry_url
         self.headless = headless
         self.max_products = max_products
-        self.name = "TP-Link"
         self.driver = driver
         # self.driver.implicitly_wait(0.5)  # has to be set only once
 
@@ -0,0 +1,196 @@
+"""
+Module to limit the bandwidth used by firmware downloads.
+
+Limits are token buckets refilled at a fixed rate of bytes per second. A download takes tokens for
+every chunk it received and sleeps while the bucket is in debt, so the average rate of all downloads
+sharing a bucket stays below its limit. Every chunk passes through up to three buckets: a global one,
+one per vendor and one per host.
+
+Limits are configured in MB/s in config.json:
+- "bandwidth": {"global_mb_per_s": ..., "per_host_mb_per_s": ...}
+- "download_mb_per_s" of a vendor entry, it applies to the scraper class named by its "class_name"
+null disables a limit. The limiter re-reads config.json when it changes, so limits of a running
+process can be adjusted without restarting it.
+"""
+import json
+import os
+import threading
+import time
+
+from src.logger import get_logger
+
+logger = get_logger()
+
+MB = 1024 * 1024
+
+
+class TokenBucket:
+    def __init__(self, rate: float = None):
+        """Token bucket of a bandwidth limit
+
+        Args:
+            rate (float, optional): bytes per second, None for no limit. Defaults to None.
+        """
+        self._lock = threading.Lock()
+        self.rate = None
+        self.set_rate(rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+
+    def set_rate(self, rate: float):
+        """Change the rate, the bucket holds at most one second worth of tokens"""
+        with self._lock:
+            self.rate = rate or None
+            self.burst = self.rate or 0
+
+    def consume(self, num_bytes: int):
+        """Take tokens for num_bytes and wait until the bucket is out of debt
+
+        Args:
+            num_bytes (int): number of received bytes
+        """
+        with self._lock:
+            if self.rate is None:
+                return
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            self._tokens -= num_bytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+def _to_rate(mb_per_s) -> float:
+    return mb_per_s * MB if mb_per_s else None
+
+
+class BandwidthLimiter:
+    def __init__(
+        self,
+        global_rate: float = None,
+        per_host_rate: float = None,
+        vendor_rates: dict = None,
+        config_path: str = None,
+        reload_interval: float = 5.0,
+    ):
+        """Global, per-vendor and per-host bandwidth limits
+
+        Args:
+            global_rate (float, optional): bytes per second of all downloads. Defaults to None.
+            per_host_rate (float, optional): bytes per second of every host. Defaults to None.
+            vendor_rates (dict, optional): vendor class name -> bytes per second. Defaults to None.
+            config_path (str, optional): config.json to reload the limits from when it changes.
+                Defaults to None (fixed limits).
+            reload_interval (float, optional): min. seconds between two checks of config_path.
+                Defaults to 5.0.
+        """
+        self._lock = threading.Lock()
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_host_rate = per_host_rate
+        self.vendor_rates = vendor_rates or {}
+        self._host_buckets = {}
+        self._vendor_buckets = {}
+        self.config_path = config_path
+        self.reload_interval = reload_interval
+        self._config_mtime = self._get_config_mtime()
+        self._last_check = time.monotonic()
+
+    @classmethod
+    def from_config(
+        cls, config: dict, config_path: str = "src/config.json"
+    ) -> "BandwidthLimiter":
+        """Create a limiter from the bandwidth settings in config.json
+
+        Args:
+            config (dict): content of config.json
+            config_path (str, optional): path of config.json to watch for changes.
+                Defaults to "src/config.json".
+
+        Returns:
+            BandwidthLimiter: limiter with the configured limits
+        """
+        limiter = cls(config_path=config_path)
+        limiter.apply_config(config)
+        return limiter
+
+    def apply_config(self, config: dict):
+        """Set all limits to the values of config
+
+        Args:
+            config (dict): content of config.json
+        """
+        bandwidth = config.get("bandwidth") or {}
+        vendor_rates = {
+            vendor["class_name"]: _to_rate(vendor.get("download_mb_per_s"))
+            for vendor in config.get("vendors", [])
+        }
+        with self._lock:
+            self.global_bucket.set_rate(_to_rate(bandwidth.get("global_mb_per_s")))
+            self.per_host_rate = _to_rate(bandwidth.get("per_host_mb_per_s"))
+            for bucket in self._host_buckets.values():
+                bucket.set_rate(self.per_host_rate)
+            self.vendor_rates = vendor_rates
+            for vendor, bucket in self._vendor_buckets.items():
+                bucket.set_rate(self.vendor_rates.get(vendor))
+
+    def vendor_rate(self, vendor: str) -> float:
+        """Return the limit of a vendor class in bytes per second, None if it is unlimited"""
+        return self.vendor_rates.get(vendor)
+
+    def throttle(self, num_bytes: int, host: str = None, vendor: str = None):
+        """Account for num_bytes received from host for vendor and wait if a limit is exceeded
+
+        Args:
+            num_bytes (int): number of received bytes
+            host (str, optional): host the bytes were received from. Defaults to None.
+            vendor (str, optional): class name of the vendor the download belongs to.
+                Defaults to None.
+        """
+        self._reload_if_changed()
+        with self._lock:
+            buckets = [self.global_bucket]
+            if vendor is not None:
+                if vendor not in self._vendor_buckets:
+                    self._vendor_buckets[vendor] = TokenBucket(
+                        self.vendor_rates.get(vendor)
+                    )
+                buckets.append(self._vendor_buckets[vendor])
+            if host is not None:
+                if host not in self._host_buckets:
+                    self._host_buckets[host] = TokenBucket(self.per_host_rate)
+                buckets.append(self._host_buckets[host])
+        for bucket in buckets:
+            bucket.consume(num_bytes)
+
+    def _get_config_mtime(self):
+        if self.config_path is None:
+            return None
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return None
+
+    def _reload_if_changed(self):
+        if self.config_path is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_check < self.reload_interval:
+                return
+            self._last_check = now
+        mtime = self._get_config_mtime()
+        if mtime is None or mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+        try:
+            with open(self.config_path) as config_file:
+                config = json.load(config_file)
+        except Exception as e:
+            logger.warning("Could not reload bandwidth limits.")
+            logger.warning(e)
+            return
+        self.apply_config(config)
+        logger.important("Reloaded bandwidth limits from config.json.")
@@ -0,0 +1,281 @@
+"""
+Module to create the Chrome WebDrivers used by the vendor scrapers.
+
+Options are built per driver, so that e.g. headless download browsers do not change the
+options of the scraping browsers.
+
+The chromedriver binary is resolved only once per process. The lookup order is:
+1. the path in environment variable CHROMEDRIVER_PATH
+2. the preinstalled /usr/bin/chromedriver (provided by src/Dockerfile)
+3. the on-disk cache, keyed by the installed Chrome version
+4. webdriver_manager (requires network access), whose result is added to the on-disk cache
+
+Vendors can select a browser profile via "browser_profile" in config.json:
+- "default": full page loads, as a user would see them
+- "lean": no images, fonts, media or analytics requests and the "eager" page load strategy
+  (driver.get() returns as soon as the DOM is ready). Meant for vendors that only read the DOM.
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import Optional
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from src.logger import get_logger
+
+logger = get_logger()
+
+PREINSTALLED_CHROMEDRIVER = "/usr/bin/chromedriver"
+CHROMEDRIVER_CACHE_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "firmware-scraper", "chromedriver.json"
+)
+CHROME_BINARIES = [
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+]
+
+BROWSER_PROFILES = ["default", "lean"]
+
+# content settings: 2 = block
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.managed_default_content_settings.plugins": 2,
+    "profile.default_content_setting_values.notifications": 2,
+}
+
+# URL patterns blocked via the DevTools protocol (Network.setBlockedURLs)
+LEAN_BLOCKED_URLS = [
+    # images
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    # fonts
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.eot",
+    # media
+    "*.mp4",
+    "*.webm",
+    "*.mp3",
+    "*.ogg",
+    # analytics and ads
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*connect.facebook.net*",
+    "*hotjar.com*",
+    "*adroll.com*",
+    "*clarity.ms*",
+    "*bat.bing.com*",
+    "*snap.licdn.com*",
+    "*nr-data.net*",
+    "*demdex.net*",
+    "*omtrdc.net*",
+]
+
+# ChromeDriverManager is not safe to run concurrently (shared cache directory)
+driver_install_lock = threading.Lock()
+_chromedriver_path = None
+
+
+def get_chrome_version() -> Optional[str]:
+    """Return version of the installed Chrome, or None if Chrome could not be found"""
+    for binary in CHROME_BINARIES:
+        binary_path = shutil.which(binary)
+        if not binary_path:
+            continue
+        try:
+            output = subprocess.run(
+                [binary_path, "--version"],
+                capture_output=True,
+                text=True,
+                timeout=10,
+            ).stdout
+        except Exception:
+            continue
+        if match := re.search(r"\d+(\.\d+)+", output):
+            return match.group()
+    return None
+
+
+def _load_chromedriver_cache() -> dict:
+    try:
+        with open(CHROMEDRIVER_CACHE_FILE) as cache_file:
+            return json.load(cache_file)
+    except Exception:
+        return {}
+
+
+def _save_chromedriver_cache(cache: dict):
+    try:
+        os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE_FILE), exist_ok=True)
+        with open(CHROMEDRIVER_CACHE_FILE, "w") as cache_file:
+            json.dump(cache, cache_file, indent=2)
+    except Exception as e:
+        logger.warning("Could not write chromedriver cache.")
+        logger.warning(e)
+
+
+def _resolve_chromedriver_path() -> str:
+    if (env_path := os.getenv("CHROMEDRIVER_PATH")) and os.path.isfile(
+        env_path
+    ):
+        return env_path
+
+    if os.path.isfile(PREINSTALLED_CHROMEDRIVER):
+        return PREINSTALLED_CHROMEDRIVER
+
+    chrome_version = get_chrome_version() or "unknown"
+    cache = _load_chromedriver_cache()
+    cached_path = cache.get(chrome_version)
+    if cached_path and os.path.isfile(cached_path):
+        return cached_path
+
+    try:
+        driver_path = ChromeDriverManager().install()
+    except Exception:
+        # offline: fall back to any cached driver that still exists
+        fallback_paths = [p for p in cache.values() if os.path.isfile(p)]
+        if not fallback_paths:
+            raise
+        logger.warning(
+            f"Could not install chromedriver for Chrome {chrome_version}. Use cached {fallback_paths[-1]}."
+        )
+        return fallback_paths[-1]
+
+    cache[chrome_version] = driver_path
+    _save_chromedriver_cache(cache)
+    return driver_path
+
+
+def get_chromedriver_path() -> str:
+    """Return path of the chromedriver binary, resolved only once per process
+
+    Returns:
+        str: path to chromedriver
+    """
+    global _chromedriver_path
+    with driver_install_lock:
+        if not _chromedriver_path:
+            _chromedriver_path = _resolve_chromedriver_path()
+            logger.info(f"Using chromedriver {_chromedriver_path}.")
+        return _chromedriver_path
+
+
+def get_chrome_options(
+    headless: bool = False, profile: str = "default"
+) -> Options:
+    """Return a fresh set of Chrome options
+
+    Args:
+        headless (bool, optional): start Chrome without a window. Defaults to False.
+        profile (str, optional): browser profile, one of BROWSER_PROFILES. Defaults to "default".
+
+    Returns:
+        Options: selenium Chrome options
+    """
+    if profile not in BROWSER_PROFILES:
+        logger.warning(
+            f"Unknown browser profile '{profile}'. Use 'default' instead."
+        )
+        profile = "default"
+
+    options = Options()
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--start-maximized")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("log-level=3")
+
+    if profile == "lean":
+        options.add_experimental_option("prefs", LEAN_PREFS)
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--disable-remote-fonts")
+        options.add_argument("--autoplay-policy=user-gesture-required")
+        options.page_load_strategy = "eager"
+
+    return options
+
+
+def create_driver(
+    headless: bool = False, profile: str = "default"
+) -> webdriver.Chrome:
+    """Start a new Chrome WebDriver
+
+    Args:
+        headless (bool, optional): start Chrome without a window. Defaults to False.
+        profile (str, optional): browser profile, one of BROWSER_PROFILES. Defaults to "default".
+
+    Returns:
+        webdriver.Chrome: started WebDriver
+    """
+    driver = webdriver.Chrome(
+        service=Service(get_chromedriver_path()),
+        options=get_chrome_options(headless=headless, profile=profile),
+    )
+
+    if profile == "lean":
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS}
+            )
+        except Exception as e:
+            logger.warning("Could not enable request blocking for lean profile.")
+            logger.warning(e)
+
+    return driver
+
+
+def limit_download_rate(driver, bytes_per_second: float):
+    """Throttle all network traffic of a browser, e.g. for vendors downloading firmware with it
+
+    Args:
+        driver: Chrome webdriver
+        bytes_per_second (float): max. download rate, None for no limit
+    """
+    if not bytes_per_second:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd(
+            "Network.emulateNetworkConditions",
+            {
+                "offline": False,
+                "latency": 0,
+                "downloadThroughput": bytes_per_second,
+                "uploadThroughput": -1,
+            },
+        )
+    except Exception as e:
+        logger.warning("Could not limit download rate of browser.")
+        logger.warning(e)
+
+
+def quit_driver(driver):
+    """Quit driver if it is still running. Most scrapers quit their driver themselves."""
+    if driver is None:
+        return
+    try:
+        driver.quit()
+    except Exception:
+        pass
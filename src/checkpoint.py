@@ -0,0 +1,85 @@
+"""
+Module to persist the progress of a vendor scrape, so that an aborted scrape can be resumed.
+
+A checkpoint stores
+- the keys of all units of work (categories, result pages, product URLs, ...) a scraper has finished
+- the number of scraped products that were already flushed into the temporary vendor table
+
+Scrapers mark keys as done after they yielded the corresponding records. The core saves the checkpoint
+right after every flush into the temporary vendor table, so that every key in a saved checkpoint belongs
+to records that are already persisted.
+"""
+import json
+import os
+
+from src.logger import get_logger
+
+logger = get_logger()
+
+
+class Checkpoint:
+    def __init__(self, path: str):
+        """Checkpoint of a single vendor scrape, stored as JSON file
+
+        Args:
+            path (str): path of the checkpoint file
+        """
+        self.path = path
+        self.done = set()
+        self.flushed = 0
+
+    @classmethod
+    def load(cls, checkpoint_dir: str, vendor_name: str) -> "Checkpoint":
+        """Load the checkpoint of a vendor, or create an empty one if there is none
+
+        Args:
+            checkpoint_dir (str): directory of the checkpoint files
+            vendor_name (str): name of the vendor
+
+        Returns:
+            Checkpoint: checkpoint of the vendor
+        """
+        checkpoint = cls(os.path.join(checkpoint_dir, f"{vendor_name}.json"))
+        try:
+            with open(checkpoint.path) as checkpoint_file:
+                data = json.load(checkpoint_file)
+            checkpoint.done = set(data["done"])
+            checkpoint.flushed = data["flushed"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(
+                f"Could not read checkpoint {checkpoint.path}. Start from scratch."
+            )
+            logger.warning(e)
+        return checkpoint
+
+    def exists(self) -> bool:
+        """True if the checkpoint was saved before (i.e. a previous scrape was aborted)"""
+        return os.path.isfile(self.path)
+
+    def is_done(self, key: str) -> bool:
+        return key in self.done
+
+    def mark_done(self, key: str):
+        self.done.add(key)
+
+    def save(self):
+        """Atomically write the checkpoint to disk"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as checkpoint_file:
+            json.dump(
+                {"done": sorted(self.done), "flushed": self.flushed},
+                checkpoint_file,
+            )
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Delete the checkpoint, e.g. after the scrape finished completely"""
+        self.done = set()
+        self.flushed = 0
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,87 @@
+"""
+Module to store downloaded firmware once per content.
+
+Every file is stored as a blob named after its SHA-256 in <root>/<first two hex digits>/<sha256>.
+The per-vendor download paths are hardlinks to these blobs, so identical firmware listed by several
+products or vendors takes up disk space only once, while every product keeps its own file path.
+Hardlinks require the store and the download directories to be on the same file system, which is
+why the store lives inside the download directory.
+"""
+import os
+import re
+
+from src.logger import get_logger
+
+logger = get_logger()
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ContentStore:
+    def __init__(self, root: str):
+        """Content-addressed store of firmware blobs
+
+        Args:
+            root (str): directory of the blobs
+        """
+        self.root = root
+
+    def blob_path(self, sha256: str) -> str:
+        """Return the path of the blob with the given SHA-256"""
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def has(self, sha256: str) -> bool:
+        """Check if a blob with the given SHA-256 is stored
+
+        Args:
+            sha256 (str): hex digest, any other string (e.g. a scraped MD5) is never stored
+
+        Returns:
+            bool: True if the blob exists
+        """
+        sha256 = (sha256 or "").strip().lower()
+        return bool(SHA256_PATTERN.match(sha256)) and os.path.exists(
+            self.blob_path(sha256)
+        )
+
+    def add(self, path: str, sha256: str) -> bool:
+        """Add a downloaded file to the store
+
+        If a blob with the same content exists, path is replaced by a hardlink to it and the
+        downloaded copy is freed. Otherwise, path becomes the new blob.
+
+        Args:
+            path (str): downloaded file
+            sha256 (str): hex SHA-256 of the file
+
+        Returns:
+            bool: True if the content was already stored (i.e. the file was deduplicated)
+        """
+        blob_path = self.blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            os.link(path, blob_path)
+            return False
+        except FileExistsError:
+            pass
+        if os.path.samefile(path, blob_path):
+            return True
+        self._replace_with_link(blob_path, path)
+        return True
+
+    def link(self, sha256: str, path: str):
+        """Create path as hardlink to a stored blob
+
+        Args:
+            sha256 (str): hex SHA-256 of the blob
+            path (str): path to create
+        """
+        self._replace_with_link(self.blob_path(sha256.strip().lower()), path)
+
+    def _replace_with_link(self, blob_path: str, path: str):
+        # link next to path first, so that path is replaced atomically
+        tmp_path = f"{path}.link"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        os.link(blob_path, tmp_path)
+        os.replace(tmp_path, path)
@@ -6,120 +6,341 @@ Core module for firmware scraper
 # Standard Libraries
 import json
 import os
-from urllib.request import urlopen
-
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 
+from src.browser import create_driver, limit_download_rate, quit_driver
+from src.checkpoint import Checkpoint
+from src.content_store import ContentStore
+from src.run_report import RunReport
 from src.db_connector import DBConnector
+from src.downloader import DownloadEngine, checksum_algorithm, verify_checksum
 from src.logger import get_logger
-from src.scheduler import check_vendors_to_update, update_vendor_schedule
+from src.unpacker import Unpacker, UnsupportedArchive
+from src.Vendors.scraper import Scraper
+from src.watchdog import Watchdog
+from src.workers import run_vendor_processes
+from src.scheduler import (
+    check_vendors_to_update,
+    get_vendor_config,
+    update_vendor_schedule,
+)
 
 # Vendor Modules
 from src.Vendors import *
 
-# Initialize logger and Options for selenium
+# Initialize logger
 logger = get_logger()
-options = Options()
-# options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument("--start-maximized")
-options.add_argument("--window-size=1920,1080")
-options.add_argument("log-level=3")
+
+
+# claim_size: max. number of downloads leased at once
+# lease_seconds: seconds until a lease of a crashed worker expires
+# retry_base_seconds, retry_max_seconds: exponential backoff of failed downloads
+DOWNLOAD_QUEUE_DEFAULTS = {
+    "claim_size": 500,
+    "lease_seconds": 3600,
+    "retry_base_seconds": 600,
+    "retry_max_seconds": 604800,
+}
 
 
 class Core:
-    def __init__(self, logger):
+    def __init__(
+        self,
+        logger,
+        flush_batch_size: int = 200,
+        flush_interval: float = 5.0,
+        checkpoint_dir: str = None,
+        report: RunReport = None,
+        download_engine: DownloadEngine = None,
+        content_store: ContentStore = None,
+        refresh_downloads: bool = False,
+        download_order: str = None,
+        download_queue: dict = None,
+        unpacker: Unpacker = None,
+        ingest_mode: str = "temp_table",
+    ):
         """Core class for firmware scraper
 
         Args:
             logger (_type_): logger
+            flush_batch_size (int, optional): max. number of scraped products kept in memory before
+                they are inserted into the temporary vendor table. Defaults to 200.
+            flush_interval (float, optional): max. number of seconds between two inserts into the
+                temporary vendor table. Defaults to 5.0.
+            checkpoint_dir (str, optional): directory to store scrape checkpoints in, so that aborted
+                scrapes are resumed. Defaults to None (no checkpoints).
+            report (RunReport, optional): report to record stage timings and counters in.
+                Defaults to None (a new report).
+            download_engine (DownloadEngine, optional): engine shared with other vendors to download
+                firmware with. Defaults to None (a new engine per download).
+            content_store (ContentStore, optional): store to deduplicate downloaded firmware in.
+                Defaults to None (no deduplication).
+            refresh_downloads (bool, optional): re-check already downloaded firmware with conditional
+                requests and keep changed files as new versions. Defaults to False.
+            download_order (str, optional): "largest_first" or "smallest_first" to schedule downloads
+                by their probed size. Defaults to None (order of the DB).
+            download_queue (dict, optional): settings of the download queue, see DOWNLOAD_QUEUE_DEFAULTS.
+                Defaults to None (defaults).
+            unpacker (Unpacker, optional): unpacker shared with other vendors to unpack downloaded
+                archives with. Defaults to None (archives are not unpacked).
+            ingest_mode (str, optional): "temp_table" to collect the catalog in a temporary vendor table
+                and compare it with the products table afterwards, or "upsert" to insert new products
+                directly, detected by the unique natural key of the products table. The products table
+                of an earlier version is migrated to the natural key first.
+                Defaults to "temp_table".
         """
         self.current_vendor = None
         self.logger = logger
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint = None
+        self.catalog_complete = False
+        self.report = report or RunReport()
+        self.download_engine = download_engine
+        self.content_store = content_store
+        self.refresh_downloads = refresh_downloads
+        self.download_order = download_order
+        self.download_queue = {**DOWNLOAD_QUEUE_DEFAULTS, **(download_queue or {})}
+        self.unpacker = unpacker
+        self.ingest_mode = ingest_mode
+        self.num_new_products = 0
+        # identifies the leases of this core in the shared download queue
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{id(self)}"
         self.db = DBConnector()
+        if self.ingest_mode == "upsert" and not self.db.ensure_natural_key():
+            self.logger.warning(
+                "The products table has no unique natural key, fall back to temporary tables."
+            )
+            self.ingest_mode = "temp_table"
         self.logger.info("Initialized core and DB.")
 
     def get_current_vendor(self):
         return self.current_vendor
 
     def set_current_vendor(self, new_vendor):
+        """Set vendor to work on
+
+        Args:
+            new_vendor: vendor scraper object, or the vendor scraper class if no browser is needed
+                (e.g. for downloading firmware of vendors without a custom download function)
+        """
         self.current_vendor = new_vendor
 
-    def get_product_catalog(self) -> bool:
-        """get product catalog from vendor"""
-        # self.logger.important(f"Start scraping {self.current_vendor.name}.")
+    def _vendor_class_name(self) -> str:
+        """Return the class name of the current vendor, its config entry is found by it"""
+        vendor = self.current_vendor
+        return (vendor if isinstance(vendor, type) else type(vendor)).__name__
 
-        try:
-            # call vendor specific scraping function
-            metadata = self.current_vendor.scrape_metadata()
-            # self.logger.important(f"Scraping done. Insert {self.current_vendor.name} catalogue into temporary table.")
-        except Exception as e:
-            self.logger.error(f"Could not scrape {self.current_vendor.name}.")
-            self.logger.error(e)
-            self.logger.important("Continue with next vendor.")
-            return False
+    def _create_temp_table(self, vendor_name: str) -> bool:
+        """Create the temporary table of a vendor, or keep it to resume an aborted scrape
+
+        Args:
+            vendor_name (str): name of the vendor
 
+        Returns:
+            bool: True if the table is ready
+        """
         try:
-            # create temporary table for current vendor
-            self.db.create_table(table=f"{self.current_vendor.name}")
-            self.logger.info(
-                f"Created temporary table for {self.current_vendor.name}."
-            )
+            with self.report.stage(vendor_name, "temp_table_create"):
+                if self.checkpoint and self.checkpoint.exists():
+                    # resume aborted scrape: keep temporary table
+                    self.db.create_table(table=f"{vendor_name}")
+                    self.logger.important(
+                        f"Resume {vendor_name} from checkpoint with {self.checkpoint.flushed} products already scraped."
+                    )
+                else:
+                    # create temporary table for current vendor, drop leftovers of aborted runs first
+                    self.db.drop_table(table=f"{vendor_name}")
+                    self.db.create_table(table=f"{vendor_name}")
+                    self.logger.info(
+                        f"Created temporary table for {vendor_name}."
+                    )
         except Exception as e:
             self.logger.error(
-                f"Could not create temporary table for {self.current_vendor.name}."
+                f"Could not create temporary table for {vendor_name}."
             )
             self.logger.error(e)
+            return False
+        return True
+
+    def get_product_catalog(self, watchdog=None) -> bool:
+        """get product catalog from vendor
+
+        The catalog is streamed from the vendor scraper and flushed into the temporary vendor table
+        in batches of flush_batch_size records, or after flush_interval seconds, whichever comes first.
+        If scraping fails midway, everything flushed so far is kept. If a batch cannot be inserted, the
+        vendor fails and its partial catalog is not compared. With ingest_mode "upsert", the
+        batches are upserted into the products table instead (see DBConnector.upsert_products()).
+
+        With a checkpoint_dir, the progress is checkpointed after every flush. If the checkpoint of an
+        aborted scrape exists, its temporary table is kept and the scraper skips all finished work.
+
+        Args:
+            watchdog (Watchdog, optional): watchdog enforcing the budgets of the vendor. If it requests a stop,
+                the scrape is aborted and everything scraped so far is kept. Defaults to None.
+        """
+        vendor_name = self.current_vendor.name
+        self.catalog_complete = False
+        self.checkpoint = None
+        if self.checkpoint_dir and getattr(
+            self.current_vendor, "supports_checkpoints", False
+        ):
+            self.checkpoint = Checkpoint.load(self.checkpoint_dir, vendor_name)
+            self.current_vendor.set_checkpoint(self.checkpoint)
+
+        self.num_new_products = 0
+        if self.ingest_mode == "upsert":
+            # upserting a batch again is idempotent, a resumed scrape needs no table
+            if self.checkpoint and self.checkpoint.exists():
+                self.logger.important(
+                    f"Resume {vendor_name} from checkpoint with {self.checkpoint.flushed} products already scraped."
+                )
+        elif not self._create_temp_table(vendor_name):
             self.logger.important("Continue with next vendor.")
             return False
 
+        batch = []
+        num_flushed = self.checkpoint.flushed if self.checkpoint else 0
+        last_flush = time.monotonic()
+        insert_seconds = 0.0
+
+        def flush():
+            nonlocal batch, num_flushed, last_flush, insert_seconds
+            if batch:
+                insert_start = time.perf_counter()
+                if self.ingest_mode == "upsert":
+                    # insert new products into products table
+                    self.num_new_products += self.db.upsert_products(batch)
+                else:
+                    # insert metadata into temporary table
+                    self.db.insert_products(batch, table=f"{vendor_name}")
+                insert_seconds += time.perf_counter() - insert_start
+                self.report.count(vendor_name, "records_produced", len(batch))
+                num_flushed += len(batch)
+                self.logger.debug(
+                    f"Flushed {len(batch)} products of {vendor_name} into {self._catalog_table(vendor_name)} ({num_flushed} total)."
+                )
+            # a failed insert raises before this point, so the checkpoint never gets ahead of the
+            # persisted records and the batch is kept for a retry
+            if self.checkpoint:
+                self.checkpoint.flushed = num_flushed
+                self.checkpoint.save()
+            batch = []
+            last_flush = time.monotonic()
+
+        scrape_start = time.perf_counter()
         try:
-            # insert metadata into temporary table
-            self.db.insert_products(
-                metadata, table=f"{self.current_vendor.name}"
-            )
-            self.logger.info(
-                f"Inserted {self.current_vendor.name} catalogue into temporary table."
-            )
+            # call vendor specific scraping function
+            iter_metadata = getattr(self.current_vendor, "iter_metadata", None)
+            # the default iter_metadata() only yields after scrape_metadata() returned the whole list
+            streaming = callable(iter_metadata) and getattr(
+                type(self.current_vendor), "iter_metadata", None
+            ) is not getattr(Scraper, "iter_metadata")
+            if streaming:
+                records = iter_metadata()
+            else:
+                records = self.current_vendor.scrape_metadata()
+
+            for record in records:
+                batch.append(record)
+                if (
+                    len(batch) >= self.flush_batch_size
+                    or time.monotonic() - last_flush >= self.flush_interval
+                ):
+                    flush()
+                # a returned list is already scraped, only a generator is stopped between its yields
+                if streaming and watchdog and watchdog.stopped():
+                    break
+            flush()
+
+            if watchdog and watchdog.stopped():
+                if streaming and hasattr(records, "close"):
+                    records.close()
+                self.logger.important(
+                    f"Stopped {vendor_name} after {num_flushed} products ({watchdog.reason})."
+                )
+            else:
+                self.catalog_complete = True
         except Exception as e:
-            self.logger.error(
-                f"Could not insert {self.current_vendor.name} catalogue into temporary table."
-            )
+            self.logger.error(f"Could not scrape {vendor_name}.")
             self.logger.error(e)
-            self.logger.important("Continue with next vendor.")
-            return False
+            self.report.count(vendor_name, "failures")
+            try:
+                flush()
+            except Exception as e:
+                self.logger.error(
+                    f"Could not insert {vendor_name} catalogue into {self._catalog_table(vendor_name)}."
+                )
+                self.logger.error(e)
+                # the catalog in the table misses records, comparing it would go unnoticed
+                self.report.count(vendor_name, "records_not_inserted", len(batch))
+                self.logger.important("Continue with next vendor.")
+                return False
+            if not num_flushed:
+                self.logger.important("Continue with next vendor.")
+                return False
+            self.logger.important(
+                f"Continue with {num_flushed} products of {vendor_name} scraped before the error."
+            )
+        finally:
+            self.report.add_duration(vendor_name, "insert", insert_seconds)
+            self.report.add_duration(
+                vendor_name,
+                "catalog_scrape",
+                time.perf_counter() - scrape_start - insert_seconds,
+            )
 
+        self.logger.info(
+            f"Inserted {num_flushed} products of {vendor_name} catalogue into {self._catalog_table(vendor_name)}."
+        )
         return True
 
+    def _catalog_table(self, vendor_name: str) -> str:
+        """Describe the table the catalog is inserted into, for log messages"""
+        if self.ingest_mode == "upsert":
+            return "products table"
+        return "temporary table"
+
     def compare_products(self) -> bool:
-        """compare products with historized products"""
+        """compare products with historized products
+
+        The comparison runs on the persisted temporary vendor table; new products are inserted into
+        the products table without loading them into memory.
+        The temporary table and the checkpoint are only deleted if the catalog was scraped completely,
+        so that an aborted scrape can be resumed (comparing again is idempotent).
+        With ingest_mode "upsert", the new products were already inserted while scraping and are
+        only reported.
+        """
+        if self.ingest_mode == "upsert":
+            self.report.count(
+                self.current_vendor.name, "new_products", self.num_new_products
+            )
+            self.logger.important(
+                f"{self.num_new_products} new products for {self.current_vendor.name}."
+            )
+            if self.catalog_complete and self.checkpoint:
+                self.checkpoint.clear()
+            return True
 
         try:
-            # compare products with historized products
+            # compare products with historized products and insert new products into products table
             self.logger.info(
                 f"Compare {self.current_vendor.name} catalogue with historized products."
             )
-            metadata_new = self.db.compare_products(
-                table1=f"{self.current_vendor.name}", table2="products"
+            with self.report.stage(self.current_vendor.name, "compare"):
+                num_new_products = self.db.insert_new_products(
+                    table1=f"{self.current_vendor.name}", table2="products"
+                )
+            self.report.count(
+                self.current_vendor.name, "new_products", num_new_products
             )
             self.logger.important(
-                f"{len(metadata_new)} new products for {self.current_vendor.name}."
-            )
-        except Exception as e:
-            self.logger.error(
-                f"Could not compare {self.current_vendor.name} catalogue with historized products."
+                f"{num_new_products} new products for {self.current_vendor.name}."
             )
-            self.logger.error(e)
-            self.logger.important("Continue with next vendor.")
-            return False
-
-        try:
-            # insert new products into products table
-            self.db.insert_products(metadata_new, table="products")
             self.logger.info(
                 f"Inserted new products of {self.current_vendor.name} into products table."
             )
@@ -131,6 +352,15 @@ class Core:
             self.logger.important("Continue with next vendor.")
             return False
 
+        if not self.catalog_complete:
+            self.logger.important(
+                f"Keep temporary table of {self.current_vendor.name} to resume the aborted scrape."
+            )
+            return True
+
+        if self.checkpoint:
+            self.checkpoint.clear()
+
         try:
             # delete temporary table
             self.db.drop_table(table=f"{self.current_vendor.name}")
@@ -145,128 +375,839 @@ class Core:
 
         return True
 
-    def download_firmware(self, download_dir):
-        """download firmware from vendor"""
-        vendor_name = self.get_current_vendor().name
-        logger.important(f"Next: {vendor_name}")
+    def _download_jobs(
+        self,
+        vendor_name: str,
+        engine: DownloadEngine,
+        jobs: list,
+        refreshes: dict = None,
+        reserved: dict = None,
+        checksums: dict = None,
+        resolved: dict = None,
+        attempts: dict = None,
+    ):
+        """Download jobs concurrently and store file path and checksums of the finished downloads
 
-        # download_info: (id, product_name, URL, file_path)
-        products_to_download = self.db.get_products_to_download(vendor_name)
-        # remove all firmware products that have already been downloaded (file_path is not None)
-        products_to_download = [
-            item for item in products_to_download if item[3] is None
-        ]
-        if len(products_to_download) == 0:
-            logger.important(f"No new firmware to download for {vendor_name}.")
-            return
+        Finished downloads and their HTTP validators are written to the DB in batches of flush_batch_size.
+        Downloads that do not match the checksum published by the vendor are moved to the quarantine
+        directory and retried later. Status, bytes, duration and TTFB of every download are recorded
+        in the download metrics of the report.
 
-        # Create vendor-specific download dir
-        vendor_download_dir = os.path.join(download_dir, vendor_name)
-        if not os.path.exists(vendor_download_dir):
-            os.makedirs(vendor_download_dir)
+        Args:
+            vendor_name (str): name of the vendor the jobs belong to
+            engine (DownloadEngine): engine to download with
+            jobs (list): tuples (product id, url, save_as)
+            refreshes (dict, optional): product id -> (validators, checksum_local) of already downloaded
+                products to re-check. Defaults to None.
+            reserved (dict, optional): product id -> size reserved in the disk budget of the engine.
+                Defaults to None.
+            checksums (dict, optional): product id -> checksum_scraped to verify the download with.
+                Defaults to None.
+            resolved (dict, optional): product id -> (url, headers, cookies) of links resolved by the
+                vendor, see Scraper.resolve_download(). Defaults to None.
+            attempts (dict, optional): product id -> number of earlier failed attempts.
+                Defaults to None.
+        """
+        refreshes = refreshes or {}
+        reserved = reserved or {}
+        checksums = checksums or {}
+        resolved = resolved or {}
+        attempts = attempts or {}
+        num_downloads = len(jobs)
+        total_bytes = 0
+        start = time.perf_counter()
+        batch = []
+        validators = []
+        failures = []
+        for i, (id, url, save_as, result, error) in enumerate(
+            engine.download_all(
+                jobs,
+                {id: refresh[0] for id, refresh in refreshes.items()},
+                vendor=self._vendor_class_name(),
+                resolved=resolved,
+            )
+        ):
+            # every successful job has validators, so they bound the size of all batches
+            if len(validators) + len(failures) >= self.flush_batch_size:
+                self._store_downloads(vendor_name, batch, validators, failures)
+                batch = []
+                validators = []
+                failures = []
+            if id in reserved:
+                engine.disk_budget.release(
+                    reserved[id], downloaded=error is None and result.modified
+                )
+            firmware_name = os.path.basename(save_as)
+            host = urlparse(resolved.get(id, (url,))[0]).netloc
+            if error is not None:
+                # HTTP errors carry the response with their status
+                response = getattr(error, "response", None)
+                self.report.downloads.record(
+                    vendor_name,
+                    host,
+                    status=getattr(response, "status_code", None),
+                    retries=attempts.get(id, 0),
+                    error=str(error),
+                )
+                self.logger.warning(
+                    f"[{vendor_name} {i+1}/{num_downloads}] Could not download {firmware_name}"
+                )
+                self.logger.warning(error)
+                self.report.count(vendor_name, "failures")
+                failures.append((id, error))
+                continue
+            self.report.downloads.record(
+                vendor_name,
+                host,
+                status=result.status,
+                num_bytes=result.num_bytes,
+                duration=result.duration,
+                ttfb=result.ttfb,
+                retries=attempts.get(id, 0),
+            )
+            # a 304 response may omit validators, which then stay as they were
+            known = refreshes.get(id, (None, None))[0] or {}
+            validators.append(
+                (
+                    id,
+                    url,
+                    result.validators.get("etag") or known.get("etag"),
+                    result.validators.get("last_modified")
+                    or known.get("last_modified"),
+                    result.validators.get("content_length")
+                    or known.get("content_length"),
+                    result.validators.get("content_type"),
+                )
+            )
+            if not result.modified:
+                self.report.count(vendor_name, "not_modified")
+                continue
+            verified = verify_checksum(result, checksums.get(id))
+            if verified is False:
+                self._quarantine(vendor_name, save_as)
+                self.report.count(vendor_name, "checksum_mismatches")
+                failures.append(
+                    (id, f"Checksum mismatch, expected {checksums[id]}")
+                )
+                continue
+            if verified:
+                self.report.count(vendor_name, "checksums_verified")
+            if id in refreshes:
+                save_as = self._version_refreshed_file(
+                    vendor_name, save_as, result.sha256, refreshes[id][1]
+                )
+                if save_as is None:
+                    continue
+                firmware_name = os.path.basename(save_as)
+            if self.content_store is not None:
+                try:
+                    if self.content_store.add(save_as, result.sha256):
+                        self.report.count(vendor_name, "deduplicated")
+                except OSError as e:
+                    # the file stays a regular file outside the store
+                    self.logger.warning(
+                        f"Could not add {firmware_name} to the content store."
+                    )
+                    self.logger.warning(e)
+            batch.append(
+                (id, save_as, result.md5, result.sha1, result.sha256, result.size)
+            )
+            self.report.count(vendor_name, "downloads")
+            self.report.count(vendor_name, "bytes_downloaded", result.num_bytes)
+            total_bytes += result.num_bytes
+            rate = total_bytes / max(time.perf_counter() - start, 1e-6) / 1e6
+            self.logger.info(
+                f"[{vendor_name} {i+1}/{num_downloads}] Successfully downloaded {firmware_name} ({rate:.1f} MB/s)"
+            )
+        self._store_downloads(vendor_name, batch, validators, failures)
 
-        # Check if vendor implements specific download function
-        vendor_download_func = getattr(
-            self.current_vendor, "download_firmware", None
+    def _quarantine(self, vendor_name: str, path: str):
+        """Move a corrupt download out of the download directory of its vendor
+
+        Args:
+            vendor_name (str): name of the vendor of the download
+            path (str): downloaded file
+        """
+        quarantine_dir = os.path.join(
+            os.path.dirname(os.path.dirname(path)), ".quarantine", vendor_name
+        )
+        os.makedirs(quarantine_dir, exist_ok=True)
+        quarantine_path = os.path.join(quarantine_dir, os.path.basename(path))
+        os.replace(path, quarantine_path)
+        self.logger.warning(
+            f"Checksum of {os.path.basename(path)} does not match, moved it to {quarantine_path}"
         )
-        if callable(vendor_download_func):
+
+    def _preflight(
+        self,
+        vendor_name: str,
+        engine: DownloadEngine,
+        jobs: list,
+        refreshes: dict,
+        resolved: dict = None,
+    ):
+        """Probe size and type of new downloads and admit them against the disk budget
+
+        New downloads are probed with HEAD requests (see probe_url()), re-checked products use the
+        size of their last download. HTML pages are skipped, as vendors serve them instead of firmware
+        for broken links, and count as failed attempts. The remaining jobs are ordered by download_order
+        and admitted as long as they fit into the disk budget of the engine. Jobs that do not fit are
+        released back to the download queue.
+
+        Args:
+            vendor_name (str): name of the vendor the jobs belong to
+            engine (DownloadEngine): engine to probe with
+            jobs (list): tuples (product id, url, save_as)
+            refreshes (dict): product id -> (validators, checksum_local) of products to re-check
+            resolved (dict, optional): product id -> (url, headers, cookies) of links resolved by the
+                vendor. Defaults to None.
+
+        Returns:
+            tuple: (admitted jobs, dict product id -> reserved size, number of deferred jobs)
+        """
+        sizes = {
+            id: (refreshes[id][0] or {}).get("content_length")
+            for id, _, _ in jobs
+            if id in refreshes
+        }
+        skipped = []
+        probed = []
+        with self.report.stage(vendor_name, "preflight"):
+            for id, url, save_as, info, error in engine.probe_all(
+                [job for job in jobs if job[0] not in refreshes], resolved
+            ):
+                if error is not None:
+                    self.logger.debug(f"Could not probe {url}: {error}")
+                    self.report.count(vendor_name, "probe_failures")
+                    sizes[id] = None
+                    continue
+                probed.append(
+                    (
+                        id,
+                        url,
+                        info["etag"],
+                        info["last_modified"],
+                        info["content_length"],
+                        info["content_type"],
+                    )
+                )
+                if (info["content_type"] or "").startswith("text/html"):
+                    self.logger.warning(
+                        f"Skip {os.path.basename(save_as)}, {url} is an HTML page."
+                    )
+                    self.report.count(vendor_name, "skipped_html")
+                    skipped.append((id, f"{url} is an HTML page"))
+                    continue
+                sizes[id] = info["content_length"]
+        self._store_downloads(vendor_name, [], probed, skipped)
+
+        skipped_ids = {id for id, _ in skipped}
+        jobs = [job for job in jobs if job[0] not in skipped_ids]
+        if self.download_order in ["largest_first", "smallest_first"]:
+            known = [job for job in jobs if sizes[job[0]] is not None]
+            unknown = [job for job in jobs if sizes[job[0]] is None]
+            known.sort(
+                key=lambda job: sizes[job[0]],
+                reverse=self.download_order == "largest_first",
+            )
+            jobs = known + unknown
+        if engine.disk_budget is None:
+            return jobs, {}, 0
+
+        admitted = []
+        reserved = {}
+        deferred = []
+        for job in jobs:
+            id = job[0]
+            if engine.disk_budget.reserve(sizes[id]):
+                admitted.append(job)
+                reserved[id] = sizes[id]
+            else:
+                deferred.append(id)
+                self.report.count(vendor_name, "deferred_disk")
+        if deferred:
+            self.logger.warning(
+                f"{len(deferred)} downloads of {vendor_name} do not fit on disk, defer them to the next run."
+            )
             try:
-                download_links = [
-                    (item[0], item[2]) for item in products_to_download
-                ]
-                self.current_vendor.download_firmware(download_links)
+                self.db.release_downloads(deferred)
             except Exception as e:
-                self.logger.warning(
-                    f"Could not finish downloading {vendor_name}."
-                )
+                # the leases expire by themselves
                 self.logger.warning(e)
-        else:
-            num_downloads = len(products_to_download)
+        return admitted, reserved, len(deferred)
 
-            firmware_name = None
-            for i, (id, name, url, _) in enumerate(products_to_download):
-                try:
-                    # for these vendors, the download url does not include a telling filename
-                    if vendor_name in ["foscam", "ABB"]:
-                        name = name.replace("/", "-")
-                        firmware_name = f"{id}_{name}"
-                    elif vendor_name in ["SchneiderElectric"]:
-                        firmware_name = f"{id}_{url.split('&p_File_Name=')[1].split('&')[0]}"
-                    else:
-                        firmware_name = (
-                            f"{id}_{url.split('/')[-1].split('?')[0]}"
-                        )
-                    save_as = os.path.join(vendor_download_dir, firmware_name)
-                    with urlopen(url) as file:
-                        content = file.read()
-                    with open(save_as, "wb") as out_file:
-                        out_file.write(content)
+    def _version_refreshed_file(
+        self, vendor_name: str, refresh_path: str, sha256: str, checksum_local: str
+    ):
+        """Keep a re-downloaded file as new version of its product, if its content changed
 
-                    self.db.set_file_path(id, save_as)
-                    self.logger.info(
-                        f"[{i+1}/{num_downloads}] Successfully downloaded {firmware_name}"
+        Products downloaded before checksums were stored have no checksum_local to compare with. Their
+        re-downloaded file replaces the old one and becomes the baseline of later refreshes.
+
+        Args:
+            vendor_name (str): name of the vendor of the product
+            refresh_path (str): path the file was re-downloaded to (<save_as>.refresh)
+            sha256 (str): hex SHA-256 of the re-downloaded file
+            checksum_local (str): SHA-256 of the current version of the product, None if unknown
+
+        Returns:
+            str: path of the new version, or None if the content did not change
+        """
+        if checksum_local is None:
+            save_as = refresh_path[: -len(".refresh")]
+            os.replace(refresh_path, save_as)
+            self.report.count(vendor_name, "baselined")
+            return save_as
+        if sha256 == checksum_local:
+            os.remove(refresh_path)
+            self.report.count(vendor_name, "unchanged")
+            return None
+        # versions of a product are told apart by the beginning of their checksum
+        root, ext = os.path.splitext(refresh_path[: -len(".refresh")])
+        version_path = f"{root}_{sha256[:12]}{ext}"
+        os.replace(refresh_path, version_path)
+        self.report.count(vendor_name, "changed")
+        self.logger.info(
+            f"Firmware changed, stored new version {os.path.basename(version_path)}"
+        )
+        return version_path
+
+    def _link_stored_firmware(self, id: int, save_as: str, checksum_scraped: str):
+        """Link firmware whose scraped checksum is already in the content store instead of downloading it
+
+        Vendors publish MD5, SHA-1 or SHA-256 checksums. The stored file is looked up by the checksum of
+        the same algorithm, which is told by its length.
+
+        Args:
+            id (int): product id
+            save_as (str): download path of the product
+            checksum_scraped (str): checksum published by the vendor
+
+        Returns:
+            tuple: (id, file_path, md5, sha1, sha256, file_size) to store, or None if it has to be downloaded
+        """
+        if self.content_store is None:
+            return None
+        checksum = (checksum_scraped or "").strip().lower()
+        algorithm = checksum_algorithm(checksum)
+        # a SHA-256 names its blob, the DB only has to be asked for blobs that exist
+        if algorithm is None or (
+            algorithm == "sha256" and not self.content_store.has(checksum)
+        ):
+            return None
+        try:
+            checksums = self.db.get_checksums(checksum, algorithm)
+            if checksums is None or not self.content_store.has(checksums[2]):
+                return None
+            self.content_store.link(checksums[2], save_as)
+        except Exception as e:
+            self.logger.warning(f"Could not link stored firmware to {save_as}")
+            self.logger.warning(e)
+            return None
+        self.logger.info(
+            f"Skip download of {os.path.basename(save_as)}, its checksum is already stored."
+        )
+        return (id, save_as, *checksums)
+
+    def _store_downloads(
+        self,
+        vendor_name: str,
+        batch: list,
+        validators: list = None,
+        failures: list = None,
+    ):
+        """Write file paths, checksums and HTTP validators of a batch of downloads in one transaction
+
+        Args:
+            vendor_name (str): name of the vendor the downloads belong to
+            batch (list): tuples (id, file_path, md5, sha1, sha256, file_size)
+            validators (list, optional): tuples (id, download_link, etag, last_modified,
+                content_length, content_type). Defaults to None.
+            failures (list, optional): tuples (id, error) of failed downloads, to retry with backoff.
+                Defaults to None.
+        """
+        if not batch and not validators and not failures:
+            return
+        try:
+            with self.db.transaction():
+                if batch:
+                    self.db.set_downloaded_files(batch)
+                if validators:
+                    self.db.set_download_validators(validators)
+                if failures:
+                    self.db.fail_downloads(
+                        failures,
+                        self.download_queue["retry_base_seconds"],
+                        self.download_queue["retry_max_seconds"],
                     )
+        except Exception as e:
+            # the files are downloaded again in the next run
+            self.logger.error(
+                f"Could not store {len(batch)} downloads of {vendor_name}."
+            )
+            self.logger.error(e)
+            self.report.count(vendor_name, "failures", len(batch))
+
+    def _download_products(
+        self,
+        vendor_name: str,
+        vendor_download_dir: str,
+        engine: DownloadEngine,
+        products: list,
+    ) -> int:
+        """Download products with the engine, already downloaded products are re-checked for changes
+
+        Vendors with resolves_downloads resolve every link to the HTTP request of the binary first.
+        Links they cannot resolve are handed to their browser-driven download_firmware() and retried
+        with backoff, as the DB does not learn the file path of browser downloads.
+
+        Args:
+            vendor_name (str): name of the vendor of the products
+            vendor_download_dir (str): directory to download into
+            engine (DownloadEngine): engine to download with
+            products (list): tuples (id, product_name, URL, file_path, checksum_scraped, checksum_local)
+                with the number of earlier failed attempts as optional last item
+
+        Returns:
+            int: number of downloads deferred because they did not fit on disk
+        """
+        jobs = []
+        linked = []
+        failures = []
+        refreshes = {}
+        checksums = {}
+        resolved = {}
+        attempts = {}
+        browser_links = []
+        resolves_downloads = getattr(self.current_vendor, "resolves_downloads", False)
+        known_validators = {}
+        if any(product[3] is not None for product in products):
+            try:
+                known_validators = self.db.get_download_validators(vendor_name)
+            except Exception as e:
+                self.logger.warning(
+                    f"Could not load download validators of {vendor_name}."
+                )
+                self.logger.warning(e)
+        for (
+            id,
+            name,
+            url,
+            file_path,
+            checksum_scraped,
+            checksum_local,
+            *queue_state,
+        ) in products:
+            attempts[id] = queue_state[0] if queue_state else 0
+            request_url = url
+            if resolves_downloads:
+                try:
+                    resolved_request = self.current_vendor.resolve_download(url)
                 except Exception as e:
-                    self.logger.warning(
-                        f"[{i+1}/{num_downloads}] Could not download {firmware_name}"
-                    )
+                    self.logger.warning(f"Could not resolve {url}")
                     self.logger.warning(e)
+                    resolved_request = None
+                if resolved_request is None:
+                    if file_path is None:
+                        browser_links.append((id, url))
+                    continue
+                resolved[id] = resolved_request
+                request_url = resolved_request[0]
+                self.report.count(vendor_name, "resolved_downloads")
+            try:
+                # for these vendors, the download url does not include a telling filename
+                if vendor_name in ["foscam", "ABB"]:
+                    name = name.replace("/", "-")
+                    firmware_name = f"{id}_{name}"
+                elif vendor_name in ["SchneiderElectric"]:
+                    firmware_name = f"{id}_{url.split('&p_File_Name=')[1].split('&')[0]}"
+                else:
+                    firmware_name = f"{id}_{request_url.split('/')[-1].split('?')[0]}"
+            except Exception as e:
+                self.logger.warning(f"Could not download {url}")
+                self.logger.warning(e)
+                self.report.count(vendor_name, "failures")
+                failures.append((id, e))
+                continue
+            save_as = os.path.join(vendor_download_dir, firmware_name)
+            if file_path is not None:
+                # re-check a downloaded product, a changed file is kept as a new version
+                refreshes[id] = (known_validators.get(id), checksum_local)
+                jobs.append((id, url, f"{save_as}.refresh"))
+                continue
+            stored = self._link_stored_firmware(id, save_as, checksum_scraped)
+            if stored is not None:
+                linked.append(stored)
+                self.report.count(vendor_name, "skipped_by_checksum")
+            else:
+                jobs.append((id, url, save_as))
+                checksums[id] = checksum_scraped
+        if browser_links:
+            self._download_with_browser(vendor_name, browser_links)
+            failures.extend(
+                (id, f"Could not resolve {url}, downloaded by the browser")
+                for id, url in browser_links
+            )
+        self._store_downloads(vendor_name, linked, failures=failures)
+
+        jobs, reserved, num_deferred = self._preflight(
+            vendor_name, engine, jobs, refreshes, resolved
+        )
+        self._download_jobs(
+            vendor_name,
+            engine,
+            jobs,
+            refreshes,
+            reserved,
+            checksums,
+            resolved,
+            attempts,
+        )
+        return num_deferred
+
+    def _download_with_browser(self, vendor_name: str, download_links: list):
+        """Download links with the browser-driven download function of the current vendor
+
+        Args:
+            vendor_name (str): name of the vendor
+            download_links (list): tuples (id, URL)
+        """
+        try:
+            self.current_vendor.download_firmware(download_links)
+        except Exception as e:
+            self.logger.warning(f"Could not finish downloading {vendor_name}.")
+            self.logger.warning(e)
+            self.report.count(vendor_name, "failures")
+            return
+        self.report.count(vendor_name, "browser_downloads", len(download_links))
+
+    def download_firmware(self, download_dir):
+        """download firmware from vendor
+
+        Vendors with their own download function get all products without file path, unless they
+        resolve their links to plain HTTP requests (see Scraper.resolve_download()). All others
+        are downloaded by the core from the download queue: pending products are queued, and then
+        claimed and downloaded in batches until no job is due. Failed downloads are retried in
+        later runs with exponential backoff.
+        """
+        vendor_name = self.get_current_vendor().name
+        logger.important(f"Next: {vendor_name}")
+
+        # Check if vendor implements specific download function (requires a vendor object with a driver)
+        vendor_download_func = getattr(
+            self.current_vendor, "download_firmware", None
+        )
+        custom_download = (
+            callable(vendor_download_func)
+            and not isinstance(self.current_vendor, type)
+            and not getattr(self.current_vendor, "resolves_downloads", False)
+        )
+
+        # Create vendor-specific download dir
+        vendor_download_dir = os.path.join(download_dir, vendor_name)
+        if not os.path.exists(vendor_download_dir):
+            os.makedirs(vendor_download_dir)
+
+        download_start = time.perf_counter()
+
+        if custom_download:
+            # download_info: (id, product_name, URL, file_path, checksum_scraped, checksum_local)
+            products_to_download = self.db.get_products_to_download(vendor_name)
+            if len(products_to_download) == 0:
+                logger.important(f"No new firmware to download for {vendor_name}.")
+                return
+            self._download_with_browser(
+                vendor_name, [(item[0], item[2]) for item in products_to_download]
+            )
+        else:
+            engine = self.download_engine or DownloadEngine()
+            num_claimed = 0
+            try:
+                if self.refresh_downloads:
+                    self._download_products(
+                        vendor_name,
+                        vendor_download_dir,
+                        engine,
+                        self.db.get_products_to_download(
+                            vendor_name, downloaded=True
+                        ),
+                    )
+                self.db.enqueue_downloads(vendor_name)
+                while products := self.db.claim_downloads(
+                    vendor_name,
+                    self.worker_id,
+                    self.download_queue["claim_size"],
+                    self.download_queue["lease_seconds"],
+                ):
+                    num_claimed += len(products)
+                    if self._download_products(
+                        vendor_name, vendor_download_dir, engine, products
+                    ):
+                        # the disk is full, deferred jobs would only be claimed again
+                        break
+            finally:
+                if engine is not self.download_engine:
+                    engine.close()
+            if num_claimed == 0:
+                logger.important(f"No new firmware to download for {vendor_name}.")
+        self.report.add_duration(
+            vendor_name, "download", time.perf_counter() - download_start
+        )
         self.logger.important(
             f"Finished downloading firmware of {vendor_name}."
         )
 
+    def unpack_firmware(self):
+        """Unpack the downloaded archives of the current vendor and record their files in the DB
 
-if __name__ == "__main__":
+        Every archive is unpacked once: products with an archive that was already unpacked for
+        another product get the files of that product. Downloads that are no archive, or that exceed
+        a limit of the unpacker, are recorded as well and not unpacked again.
+        """
+        vendor_name = self.get_current_vendor().name
+        if self.unpacker is None:
+            return
+        try:
+            products = self.db.get_products_to_unpack(vendor_name)
+        except Exception as e:
+            self.logger.warning(f"Could not load downloads of {vendor_name} to unpack.")
+            self.logger.warning(e)
+            return
+        jobs = []
+        pending = {}
+        linked = []
+        for id, file_path, sha256, unpacked in products:
+            if unpacked:
+                linked.append((id, sha256))
+            elif sha256 in pending:
+                # the same archive is downloaded for several products, it is unpacked only once
+                linked.append((id, sha256))
+            else:
+                pending[sha256] = id
+                jobs.append((id, file_path, f"{file_path}.extracted"))
+        sha256s = {id: sha256 for sha256, id in pending.items()}
 
-    # load config (e.g. max_products, log_level, log_file, chrome settings, headless, etc.)
-    # this way we can avoid boilerplate and hardcoding settings into every vendors module
-    with open("src/config.json") as config_file:
-        config = json.load(config_file)
-    # get list of vendors to update
-    vendor_and_max_products = check_vendors_to_update()
-    vendors_to_scrape = [name for name, _ in vendor_and_max_products]
-    logger.info(f"Scheduled scrapers: {str(vendors_to_scrape)}")
+        batch = []
+        with self.report.stage(vendor_name, "unpack"):
+            for id, file_path, extract_dir, files, error in self.unpacker.unpack_all(
+                jobs
+            ):
+                archive_name = os.path.basename(file_path)
+                if isinstance(error, UnsupportedArchive):
+                    # unpacked in a later run, once the tool is installed
+                    self.logger.debug(error)
+                    self.report.count(vendor_name, "unpack_unsupported")
+                    linked = [link for link in linked if link[1] != sha256s[id]]
+                    continue
+                if error is not None:
+                    self.logger.warning(f"Could not unpack {archive_name}.")
+                    self.logger.warning(error)
+                    self.report.count(vendor_name, "unpack_failures")
+                    batch.append((id, sha256s[id], extract_dir, [], str(error)))
+                elif files is None:
+                    batch.append((id, sha256s[id], None, [], None))
+                else:
+                    self.logger.info(f"Unpacked {len(files)} files from {archive_name}")
+                    self.report.count(vendor_name, "archives_unpacked")
+                    self.report.count(vendor_name, "files_unpacked", len(files))
+                    batch.append(
+                        (
+                            id,
+                            sha256s[id],
+                            extract_dir,
+                            [
+                                (os.path.relpath(path, extract_dir), path, *checksums)
+                                for path, *checksums in files
+                            ],
+                            None,
+                        )
+                    )
+                if len(batch) >= self.flush_batch_size:
+                    self._store_unpacked(vendor_name, batch)
+                    batch = []
+        self._store_unpacked(vendor_name, batch)
+        if linked:
+            try:
+                # links to archives without files are no-ops
+                self.db.link_unpacked_archives(linked)
+                self.report.count(vendor_name, "archives_linked", len(linked))
+            except Exception as e:
+                self.logger.warning(f"Could not link unpacked archives of {vendor_name}.")
+                self.logger.warning(e)
 
-    # initialize core object
-    core = Core(logger=logger)
+    def _store_unpacked(self, vendor_name: str, batch: list):
+        """Write the files of a batch of unpacked archives to the DB, see set_unpacked_archives()"""
+        if not batch:
+            return
+        try:
+            self.db.set_unpacked_archives(batch)
+        except Exception as e:
+            # the archives are unpacked again in the next run
+            self.logger.error(
+                f"Could not store {len(batch)} unpacked archives of {vendor_name}."
+            )
+            self.logger.error(e)
+            self.report.count(vendor_name, "failures", len(batch))
 
-    # iterate over vendors to update
-    for vendor, max_products in vendor_and_max_products:
-        logger.important(f"Next: {vendor}")
 
-        try:
-            driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=options,
+def scrape_vendor(
+    vendor: str,
+    max_products: int,
+    config: dict = None,
+    report: RunReport = None,
+) -> bool:
+    """Scrape catalog of a single vendor and historize its new products.
+
+    Every call works on its own Core object (and thus its own DBConnector and temporary
+    vendor table), so that multiple vendors can be scraped concurrently.
+
+    Args:
+        vendor (str): class name of the vendor scraper
+        max_products (int): maximum number of products to scrape
+        config (dict, optional): content of config.json. Defaults to None.
+        report (RunReport, optional): report to record stage timings and counters in. Defaults to None.
+
+    Returns:
+        bool: True if the vendor was scraped and compared successfully
+    """
+    logger.important(f"Next: {vendor}")
+    config = config or {}
+    vendor_core = Core(
+        logger=logger,
+        flush_batch_size=config.get("flush_batch_size", 200),
+        flush_interval=config.get("flush_interval", 5.0),
+        checkpoint_dir=config.get("checkpoint_dir", None),
+        report=report,
+        ingest_mode=config.get("ingest_mode", "temp_table"),
+    )
+    report = vendor_core.report
+    vendor_name = globals()[vendor].name
+    vendor_config = get_vendor_config(vendor)
+    driver = None
+
+    try:
+        with report.stage(vendor_name, "driver_start"):
+            driver = create_driver(
+                profile=vendor_config.get("browser_profile", "default")
             )
-            glob = globals()
-            core.set_current_vendor(
-                globals()[vendor](max_products=max_products, driver=driver)
+        watchdog = Watchdog.from_config(vendor_name, driver, vendor_config)
+        vendor_core.set_current_vendor(
+            globals()[vendor](
+                max_products=max_products, driver=watchdog.wrap_driver(driver)
             )
-        except Exception as e:
-            core.logger.error(f"Could not start {vendor}.")
-            core.logger.error(e)
-            core.logger.important("Continue with next vendor.")
-            continue
+        )
+    except Exception as e:
+        vendor_core.logger.error(f"Could not start {vendor}.")
+        vendor_core.logger.error(e)
+        vendor_core.logger.important("Continue with next vendor.")
+        report.count(vendor_name, "failures")
+        report.set_status(vendor_name, "failed")
+        quit_driver(driver)
+        return False
 
-        # scrape product catalog
-        if not core.get_product_catalog():
-            continue
+    try:
+        # scrape product catalog, enforcing the vendor's budgets
+        watchdog.start()
+        try:
+            if not vendor_core.get_product_catalog(watchdog=watchdog):
+                report.set_status(vendor_name, "failed")
+                return False
+        finally:
+            watchdog.finish()
+            report.count(vendor_name, "pages_fetched", watchdog.pages)
 
         # compare products with historized products
-        if not core.compare_products():
-            continue
+        if not vendor_core.compare_products():
+            report.set_status(vendor_name, "failed")
+            return False
+
+        report.set_status(
+            vendor_name,
+            "scraped" if vendor_core.catalog_complete else "aborted",
+        )
 
         # prepare for EMBArk
-        # core.prepare_for_embark()
+        # vendor_core.prepare_for_embark()
 
         # cleaning, drop temporary tables if ERROR, etc.
-        # core.cleaning()
+        # vendor_core.cleaning()
 
         # update_vendor_schedule(vendor)
+    finally:
+        # most scrapers quit their driver themselves, make sure no browser is left behind
+        quit_driver(driver)
+
+    return True
+
+
+def scrape_vendors(
+    vendor_and_max_products: list,
+    max_parallel_vendors: int = 1,
+    config: dict = None,
+    on_vendor_scraped=None,
+    report: RunReport = None,
+) -> dict:
+    """Scrape vendors concurrently on a bounded pool of browsers.
 
-    # Download firmware
-    logger.important("Start firmware download.")
+    At most max_parallel_vendors vendors (and therefore Chrome instances) run at the same time.
+    A slow vendor only occupies its own slot, the remaining vendors keep being scheduled.
+    With worker_mode "process" in config.json, every vendor runs in its own worker process
+    (see src/workers.py), otherwise in a thread of this process.
+
+    Args:
+        vendor_and_max_products (list): list of tuples (vendor classname, max_products)
+        max_parallel_vendors (int, optional): size of the browser pool. Defaults to 1.
+        config (dict, optional): content of config.json. Defaults to None.
+        on_vendor_scraped (callable, optional): called with (vendor classname, success) as soon as
+            a vendor is finished. Defaults to None.
+        report (RunReport, optional): report to record stage timings and counters in. Defaults to None.
+
+    Returns:
+        dict: vendor classname -> True if scraping and comparing was successful
+    """
+    if (config or {}).get("worker_mode", "thread") == "process":
+        return run_vendor_processes(
+            vendor_and_max_products,
+            max_parallel_vendors,
+            config,
+            on_vendor_scraped=on_vendor_scraped,
+            report=report,
+        )
+
+    max_parallel_vendors = max(1, int(max_parallel_vendors or 1))
+    logger.important(
+        f"Scrape {len(vendor_and_max_products)} vendors with up to {max_parallel_vendors} in parallel."
+    )
+
+    results = {}
+    with ThreadPoolExecutor(
+        max_workers=max_parallel_vendors, thread_name_prefix="vendor"
+    ) as executor:
+        futures = {
+            executor.submit(
+                scrape_vendor, vendor, max_products, config, report
+            ): vendor
+            for vendor, max_products in vendor_and_max_products
+        }
+        for future in as_completed(futures):
+            vendor = futures[future]
+            try:
+                results[vendor] = future.result()
+            except Exception as e:
+                logger.error(f"Scraping {vendor} failed unexpectedly.")
+                logger.error(e)
+                results[vendor] = False
+            logger.important(
+                f"Finished {vendor} ({len(results)}/{len(futures)})."
+            )
+            if on_vendor_scraped:
+                on_vendor_scraped(vendor, results[vendor])
+
+    return results
+
+
+def get_download_dir(config: dict) -> str:
+    """Return absolute download directory as configured in config.json"""
     try:
         download_dir = os.path.realpath(config["download_dir"])
         logger.important(f"Download directory: {download_dir}")
@@ -275,27 +1216,188 @@ if __name__ == "__main__":
         logger.important(
             f"Download directory not specified in config.json. Will download into '../downloads'."
         )
+    return download_dir
 
-    for vendor, _ in vendor_and_max_products:
-        if vendor != "RockwellScraper":
-            try:
-                # TODO we need the name attribute from the class
-                # initialize with useless driver to make sure Object creation is successful
-                # there is certainly a better way
-                options.add_argument("--headless")
-                core.set_current_vendor(
-                    globals()[vendor](
-                        max_products=None,
-                        driver=webdriver.Chrome(
-                            service=Service(ChromeDriverManager().install()),
-                            options=options,
-                        ),
-                    )
+
+def download_vendor(
+    vendor: str,
+    download_dir: str,
+    config: dict = None,
+    report: RunReport = None,
+    download_engine: DownloadEngine = None,
+    unpacker: Unpacker = None,
+) -> bool:
+    """Download all pending firmware of a single vendor and unpack the downloaded archives.
+
+    Every call works on its own Core object, so that multiple vendors can be downloaded concurrently.
+
+    Args:
+        vendor (str): class name of the vendor scraper
+        download_dir (str): directory to download firmware into
+        config (dict, optional): content of config.json. Defaults to None.
+        report (RunReport, optional): report to record stage timings and counters in. Defaults to None.
+        download_engine (DownloadEngine, optional): engine shared by all vendors. Defaults to None.
+        unpacker (Unpacker, optional): unpacker shared by all vendors. Defaults to None (archives
+            are not unpacked).
+
+    Returns:
+        bool: True if the download finished
+    """
+    if vendor == "RockwellScraper":
+        return False
+
+    config = config or {}
+    content_store = None
+    if config.get("content_store", False):
+        content_store = ContentStore(os.path.join(download_dir, ".store"))
+    vendor_core = Core(
+        logger=logger,
+        report=report,
+        download_engine=download_engine,
+        content_store=content_store,
+        refresh_downloads=config.get("refresh_downloads", False),
+        download_order=config.get("download_order"),
+        download_queue=config.get("download_queue"),
+        unpacker=unpacker,
+    )
+    vendor_class = globals()[vendor]
+    driver = None
+    try:
+        # only vendors with a custom download function drive a browser, to download or to resolve
+        # download links, all others are downloaded by the core and only need the vendor name
+        if hasattr(vendor_class, "download_firmware"):
+            driver = create_driver(headless=True)
+            if download_engine is not None and download_engine.bandwidth:
+                # browser downloads bypass the engine, so the browser itself is throttled
+                bandwidth = download_engine.bandwidth
+                rates = [
+                    bandwidth.vendor_rate(vendor_class.__name__),
+                    bandwidth.global_bucket.rate,
+                ]
+                limit_download_rate(
+                    driver, min((rate for rate in rates if rate), default=None)
                 )
-                core.download_firmware(download_dir)
+            vendor_core.set_current_vendor(
+                vendor_class(max_products=None, driver=driver)
+            )
+        else:
+            vendor_core.set_current_vendor(vendor_class)
+        vendor_core.download_firmware(download_dir)
+        vendor_core.unpack_firmware()
+    except Exception as e:
+        logger.warning(
+            f"Could not finish downloading firmware of {vendor_class.name}."
+        )
+        vendor_core.logger.error(e)
+        vendor_core.logger.important("Continue with next vendor.")
+        vendor_core.report.count(vendor_class.name, "failures")
+        return False
+    finally:
+        quit_driver(driver)
+
+    return True
+
+
+def run_pipeline(
+    vendor_and_max_products: list,
+    download_dir: str,
+    config: dict,
+    report: RunReport = None,
+) -> dict:
+    """Scrape vendors and download their firmware at the same time.
+
+    As soon as a vendor is scraped and its new products are historized, downloading its firmware is
+    queued for a pool of download_workers threads, while the remaining vendors keep being scraped.
+    The files themselves are fetched by one DownloadEngine shared by all vendors, and unpacked by one
+    Unpacker. Downloads that fail unexpectedly are counted as failures of their vendor.
+
+    Args:
+        vendor_and_max_products (list): list of tuples (vendor classname, max_products)
+        download_dir (str): directory to download firmware into
+        config (dict): content of config.json
+        report (RunReport, optional): report to record stage timings and counters in. Defaults to None.
+
+    Returns:
+        dict: vendor classname -> True if scraping and comparing was successful
+    """
+    report = report or RunReport()
+    download_workers = max(1, int(config.get("download_workers", 1)))
+    logger.important(
+        f"Start pipeline with {download_workers} download workers."
+    )
+
+    unpacker = Unpacker.from_config(config)
+    downloads = {}
+    with DownloadEngine.from_config(config) as engine, ThreadPoolExecutor(
+        max_workers=download_workers, thread_name_prefix="download"
+    ) as download_executor:
+
+        def on_vendor_scraped(vendor, success):
+            # pending firmware of earlier runs is downloaded even if scraping failed
+            logger.important(f"Queue firmware download of {vendor}.")
+            future = download_executor.submit(
+                download_vendor, vendor, download_dir, config, report, engine, unpacker
+            )
+            downloads[future] = vendor
+
+        results = scrape_vendors(
+            vendor_and_max_products,
+            config.get("max_parallel_vendors", 1),
+            config,
+            on_vendor_scraped=on_vendor_scraped,
+            report=report,
+        )
+        logger.important("Scraping finished. Wait for remaining downloads.")
+        for future in as_completed(downloads):
+            vendor = downloads[future]
+            try:
+                future.result()
             except Exception as e:
-                logger.warning(
-                    f"Could not finish downloading firmware of {core.get_current_vendor().name}."
+                logger.error(f"Downloading firmware of {vendor} failed unexpectedly.")
+                logger.error(e)
+                report.count(globals()[vendor].name, "failures")
+    if unpacker is not None:
+        unpacker.close()
+
+    return results
+
+
+if __name__ == "__main__":
+
+    # load config (e.g. max_products, log_level, log_file, chrome settings, headless, etc.)
+    # this way we can avoid boilerplate and hardcoding settings into every vendors module
+    with open("src/config.json") as config_file:
+        config = json.load(config_file)
+    # get list of vendors to update
+    vendor_and_max_products = check_vendors_to_update()
+    vendors_to_scrape = [name for name, _ in vendor_and_max_products]
+    logger.info(f"Scheduled scrapers: {str(vendors_to_scrape)}")
+
+    download_dir = get_download_dir(config)
+    report = RunReport()
+
+    if config.get("pipeline_downloads", False):
+        # download new firmware of every vendor as soon as it is scraped
+        run_pipeline(vendor_and_max_products, download_dir, config, report)
+    else:
+        # scrape vendors in parallel, every vendor on its own browser
+        max_parallel_vendors = config.get("max_parallel_vendors", 1)
+        scrape_vendors(
+            vendor_and_max_products,
+            max_parallel_vendors,
+            config,
+            report=report,
+        )
+
+        # Download firmware
+        logger.important("Start firmware download.")
+        unpacker = Unpacker.from_config(config)
+        with DownloadEngine.from_config(config) as engine:
+            for vendor, _ in vendor_and_max_products:
+                download_vendor(
+                    vendor, download_dir, config, report, engine, unpacker
                 )
-                core.logger.error(e)
-                core.logger.important("Continue with next vendor.")
+        if unpacker is not None:
+            unpacker.close()
+
+    report.write(config.get("run_report_dir", "./reports"))
@@ -6,13 +6,21 @@ Username and password for the server are provided via the config.json file, or,
 by exporting the following environment variables, which take precedence over config.json:
 MYSQL_USER
 MYSQL_PASSWORD
+
+Connections are borrowed from a connection pool per process, which is shared by all DBConnector
+objects. Its size is set by ['database']['pool_size'] of config.json. Several statements, also of
+different methods, run in a single transaction inside of DBConnector.transaction().
 """
 import json
 import os
+import re
 import datetime
+import threading
+import time
+from contextlib import contextmanager
 
 import mysql.connector
-from mysql.connector import connect
+from mysql.connector import connect, errorcode, pooling
 from src.logger import get_logger
 
 logger = get_logger()
@@ -58,9 +66,72 @@ def _get_mysql_user_password():
     return user, password
 
 
+# pool_size: connections per process, at most pooling.CNX_POOL_MAXSIZE
+# pool_timeout: seconds to wait for a free connection if all are borrowed
+POOL_DEFAULTS = {"pool_size": 8, "pool_timeout": 30}
+
+# columns that identify a product, including the download link, as vendors publish several files (e.g.
+# per region or language) for the same version. Both ingest modes detect new products by their hash.
+NATURAL_KEY_COLUMNS = ["manufacturer", "product_name", "product_type", "version", "download_link"]
+
+
+def _natural_key_expression(alias: str = None) -> str:
+    """SQL expression of the natural key of a products row, of the table alias if given
+
+    NULL and "" are treated alike, and the comparison is case-insensitive like the default collation.
+    """
+    prefix = f"{alias}." if alias else ""
+    values = ", ".join(f"COALESCE({prefix}{column}, '')" for column in NATURAL_KEY_COLUMNS)
+    return f"SHA2(LOWER(CONCAT_WS(CHAR(31 USING utf8mb4), {values})), 256)"
+
+
+NATURAL_KEY_COLUMN = (
+    f"natural_key CHAR(64) GENERATED ALWAYS AS ({_natural_key_expression()}) STORED"
+)
+
+# pid -> result of the natural key migration, it runs once per process and not per DBConnector
+_natural_key = {}
+_natural_key_lock = threading.Lock()
+
+# errors of statements that conflict with concurrent ones, they succeed when retried
+RETRYABLE_ERRORS = {errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT}
+RETRIES = 3
+
+# (pid, user) -> MySQLConnectionPool, a forked worker process must not share the sockets of its parent
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool_settings() -> dict:
+    try:
+        with open("src/config.json") as config_file:
+            database = json.load(config_file).get("database") or {}
+    except Exception:
+        database = {}
+    return {key: database.get(key, value) for key, value in POOL_DEFAULTS.items()}
+
+
+class _TransactionConnection:
+    """Connection of an open transaction, commit() and close() are left to DBConnector.transaction()"""
+
+    def __init__(self, con):
+        self._con = con
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+
 class DBConnector:
     def __init__(self):
         self.db_user, self.db_password = _get_mysql_user_password()
+        self.pool_settings = _get_pool_settings()
+        self._local = threading.local()
 
         # create firmware DB if it doesn't exist yet
         create_query = "CREATE DATABASE IF NOT EXISTS firmware;"
@@ -77,7 +148,7 @@ class DBConnector:
             logger.error(e)
 
         # create product table if it doesn't exist yet
-        create_products_table_query = """
+        create_products_table_query = f"""
                     CREATE TABLE IF NOT EXISTS products(
                         id INT AUTO_INCREMENT PRIMARY KEY,
                         inserted_at DATE,
@@ -95,13 +166,87 @@ class DBConnector:
                         emba_report_path VARCHAR(1024),
                         embark_report_link VARCHAR(1024),
                         runner_uuid CHAR(128),
-                        additional_data JSON
+                        additional_data JSON,
+                        {NATURAL_KEY_COLUMN},
+                        UNIQUE INDEX natural_key (natural_key)
+                    );
+                """
+        # checksums of downloaded firmware, computed while downloading
+        create_checksums_table_query = """
+                    CREATE TABLE IF NOT EXISTS firmware_checksums(
+                        product_id INT PRIMARY KEY,
+                        md5 CHAR(32),
+                        sha1 CHAR(40),
+                        sha256 CHAR(64),
+                        file_size BIGINT,
+                        INDEX (md5),
+                        INDEX (sha1),
+                        INDEX (sha256)
+                    );
+                """
+        # HTTP validators of the last download of every product, for conditional re-downloads. Products
+        # sharing a download link keep their own, they may have downloaded different versions of it.
+        create_validators_table_query = """
+                    CREATE TABLE IF NOT EXISTS download_validators(
+                        product_id INT PRIMARY KEY,
+                        download_link VARCHAR(1024),
+                        etag VARCHAR(255),
+                        last_modified VARCHAR(64),
+                        content_length BIGINT,
+                        content_type VARCHAR(255),
+                        checked_at DATETIME
+                    );
+                """
+        # pending downloads with their retry state, claimed by download workers with a lease
+        create_queue_table_query = """
+                    CREATE TABLE IF NOT EXISTS download_queue(
+                        product_id INT PRIMARY KEY,
+                        manufacturer VARCHAR(128),
+                        priority INT DEFAULT 0,
+                        attempts INT DEFAULT 0,
+                        last_error TEXT,
+                        next_attempt_at DATETIME,
+                        lease_owner VARCHAR(128),
+                        lease_expires_at DATETIME,
+                        INDEX claim (manufacturer, next_attempt_at, priority)
+                    );
+                """
+        # unpacked archives by SHA-256, num_files is 0 for downloads that are no archive
+        create_unpacked_table_query = """
+                    CREATE TABLE IF NOT EXISTS unpacked_archives(
+                        sha256 CHAR(64) PRIMARY KEY,
+                        extract_dir VARCHAR(1024),
+                        num_files INT,
+                        error TEXT,
+                        unpacked_at DATETIME
+                    );
+                """
+        # files unpacked from the downloaded archive of a product
+        create_firmware_files_table_query = """
+                    CREATE TABLE IF NOT EXISTS firmware_files(
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        product_id INT,
+                        archive_sha256 CHAR(64),
+                        member_path VARCHAR(1024),
+                        file_path VARCHAR(1024),
+                        md5 CHAR(32),
+                        sha1 CHAR(40),
+                        sha256 CHAR(64),
+                        file_size BIGINT,
+                        INDEX (product_id),
+                        INDEX (archive_sha256),
+                        INDEX (sha256)
                     );
                 """
         con = self._get_db_con()
         try:
             with con.cursor() as cursor:
                 cursor.execute(create_products_table_query)
+                cursor.execute(create_checksums_table_query)
+                cursor.execute(create_validators_table_query)
+                cursor.execute(create_queue_table_query)
+                cursor.execute(create_unpacked_table_query)
+                cursor.execute(create_firmware_files_table_query)
                 con.commit()
             con.close()
         except Exception as e:
@@ -110,20 +255,170 @@ class DBConnector:
             )
             logger.error(e)
 
+    def ensure_natural_key(self) -> bool:
+        """Migrate the products table of an earlier version to the unique natural key
+
+        The migration rebuilds the products table, so it only runs for ingest_mode "upsert", which
+        requires the key (see upsert_products()), and only once per process.
+
+        Returns:
+            bool: True if the products table has the unique natural key
+        """
+        with _natural_key_lock:
+            if os.getpid() not in _natural_key:
+                _natural_key[os.getpid()] = self._add_natural_key()
+            return _natural_key[os.getpid()]
+
+    def _has_natural_key(self, cursor) -> bool:
+        """Check if the products table has the current natural key with its unique index
+
+        Returns:
+            bool: True if it has, False if it is missing, None if it is outdated
+        """
+        cursor.execute(
+            """
+            SELECT c.GENERATION_EXPRESSION, MIN(s.NON_UNIQUE)
+            FROM information_schema.COLUMNS AS c
+            LEFT JOIN information_schema.STATISTICS AS s
+            ON s.TABLE_SCHEMA = c.TABLE_SCHEMA AND s.TABLE_NAME = c.TABLE_NAME
+            AND s.INDEX_NAME = 'natural_key'
+            WHERE c.TABLE_SCHEMA = 'firmware' AND c.TABLE_NAME = 'products'
+            AND c.COLUMN_NAME = 'natural_key'
+            GROUP BY c.GENERATION_EXPRESSION;
+            """
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        expression, non_unique = row
+        if "download_link" in (expression or "") and non_unique == 0:
+            return True
+        return None
+
+    def _add_natural_key(self) -> bool:
+        """Add natural_key with its unique index to the products table, if it is missing or outdated
+
+        Returns:
+            bool: True if the products table has the unique natural key, which upsert_products()
+                requires. False if existing duplicates of a product prevent the unique index.
+        """
+        alter_query = f"""
+            ALTER TABLE products
+            ADD COLUMN {NATURAL_KEY_COLUMN},
+            ADD UNIQUE INDEX natural_key (natural_key);
+            """
+        con = self._get_db_con()
+        if con is None:
+            return False
+        try:
+            with con.cursor() as cursor:
+                has_natural_key = self._has_natural_key(cursor)
+                if has_natural_key:
+                    return True
+                if has_natural_key is None:
+                    # the index is dropped together with the column
+                    cursor.execute("ALTER TABLE products DROP COLUMN natural_key;")
+                cursor.execute(alter_query)
+                con.commit()
+            logger.important("Added natural key to the products table.")
+            return True
+        except Exception as e:
+            try:
+                # another worker process may have added it in the meantime
+                with con.cursor() as cursor:
+                    if self._has_natural_key(cursor):
+                        return True
+            except Exception:
+                pass
+            logger.error(
+                "Could not add a unique natural key to the products table, it probably contains the "
+                "same product more than once. Upsert ingest is disabled."
+            )
+            logger.error(e)
+            return False
+        finally:
+            con.close()
+
+    def _get_pool(self) -> pooling.MySQLConnectionPool:
+        """Return the connection pool of this process, it is created on first use"""
+        key = (os.getpid(), self.db_user)
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = pooling.MySQLConnectionPool(
+                    pool_name=re.sub(r"[^\w.:\-*$#]", "_", f"firmware_{self.db_user}")[
+                        : pooling.CNX_POOL_MAXNAMESIZE
+                    ],
+                    pool_size=min(
+                        int(self.pool_settings["pool_size"]), pooling.CNX_POOL_MAXSIZE
+                    ),
+                    pool_reset_session=True,
+                    user=self.db_user,
+                    password=self.db_password,
+                    host=HOST,
+                    database="firmware",
+                )
+            return _pools[key]
+
     def _get_db_con(self):
-        """Return a MySQLConnection to the firmware database."""
-        config = {
-            "user": self.db_user,
-            "password": self.db_password,
-            "host": HOST,
-            "database": "firmware",
-        }
+        """Return a connection to the firmware database, borrowed from the pool.
+
+        The pool checks borrowed connections with a ping and reconnects broken ones. close() returns
+        the connection to the pool. Inside of transaction(), the connection of the transaction is
+        returned instead.
+        """
+        transaction = getattr(self._local, "transaction", None)
+        if transaction is not None:
+            return transaction
+        deadline = time.monotonic() + self.pool_settings["pool_timeout"]
+        while True:
+            try:
+                return self._get_pool().get_connection()
+            except (pooling.PoolError, mysql.connector.errors.InterfaceError) as ex:
+                # all connections are borrowed, or the server is not reachable (yet)
+                if time.monotonic() >= deadline:
+                    logger.error("Could not get a connection from the MySQL pool.")
+                    logger.error(ex)
+                    return None
+                time.sleep(0.1)
+            except Exception as ex:
+                logger.error(ex)
+                return None
+
+    @contextmanager
+    def transaction(self):
+        """Context manager to run statements of this thread in a single transaction
+
+        All DBConnector methods called inside of it use the same connection. The transaction is
+        committed when the block is left and rolled back if it raises. Nested transactions are part
+        of the outermost one.
+
+        Example:
+            with db.transaction():
+                db.set_downloaded_files(downloads)
+                db.set_download_validators(validators)
+
+        Yields:
+            connection of the transaction, to run further statements with its cursor()
+        """
+        transaction = getattr(self._local, "transaction", None)
+        if transaction is not None:
+            yield transaction
+            return
+        con = self._get_db_con()
+        if con is None:
+            raise mysql.connector.errors.PoolError(
+                "Could not get a connection from the MySQL pool."
+            )
+        self._local.transaction = _TransactionConnection(con)
         try:
-            con = mysql.connector.connect(**config)
-        except Exception as ex:
-            print(ex)
-        else:
-            return con
+            yield self._local.transaction
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+        finally:
+            self._local.transaction = None
+            con.close()
 
     def _convert_firmware_dict_to_tuple(self, fw_dict):
         """Expects dict of firmware metadata and returns tuple in expected format for insertion into DB."""
@@ -241,6 +536,9 @@ class DBConnector:
             scraped firmware. Expected keys: "manufacturer", "product_name", "product_type",
             "version", "release_date", "download_link", "checksum_scraped", "additional_data".
             Values can be Null.
+
+        Raises:
+            Exception: if the batch could not be inserted, nothing of it is committed then
         """
         insert_products_query = f"""
             INSERT INTO `{table}`
@@ -249,21 +547,15 @@ class DBConnector:
             additional_data)
             VALUES ( %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
         """
-        try:
-            # TODO this is seriously sketchy
-            product_list = [
-                self._convert_firmware_dict_to_tuple(fw_dict)
-                for fw_dict in product_list
-            ]
-        except Exception as ex:
-            print(ex)
+        # the caller has to know whether the batch is persisted, e.g. before checkpointing it
+        product_list = [
+            self._convert_firmware_dict_to_tuple(fw_dict) for fw_dict in product_list
+        ]
         con = self._get_db_con()
         try:
             with con.cursor() as cursor:
                 cursor.executemany(insert_products_query, product_list)
                 con.commit()
-        except Exception as ex:
-            print(ex)
         finally:
             con.close()
 
@@ -288,28 +580,34 @@ class DBConnector:
             con.close()
         return result
 
-    def get_products_to_download(self, manufacturer, table="products"):
-        """query DB for firmware on any table, optionally filtered by manufacturer
+    def get_products_to_download(
+        self, manufacturer, table="products", downloaded: bool = False
+    ):
+        """query DB for firmware of a manufacturer that is (not yet) downloaded
 
         Args:
             manufacturer (str, optional): get products filtered with WHERE clause on manufacturer. Defaults to ''.
             table (str, optional): table to query for firmwares. Defaults to 'products'.
+            downloaded (bool, optional): return the already downloaded products instead of the pending
+                ones. Defaults to False.
         Returns:
-            result: returns list of tuples with all products
+            result: list of tuples (id, product_name, download_link, file_path, checksum_scraped, checksum_local)
         """
 
         retrieve_products_query = f"""
-            SELECT id, product_name, download_link, file_path
+            SELECT id, product_name, download_link, file_path, checksum_scraped, checksum_local
             FROM `{table}`
+            WHERE file_path IS {"NOT NULL" if downloaded else "NULL"}
             """
+        data = ()
         if manufacturer:
-            # WHERE clause set to manufacturer string
-            retrieve_products_query += f'WHERE manufacturer = "{manufacturer}";'
+            retrieve_products_query += "AND manufacturer = %s"
+            data = (manufacturer,)
         con = self._get_db_con()
         try:
             # print(retrieve_products_query)  # debug
             with con.cursor() as cursor:
-                cursor.execute(retrieve_products_query)
+                cursor.execute(retrieve_products_query, data)
                 result = cursor.fetchall()
         except Exception as ex:
             print(ex)
@@ -317,6 +615,160 @@ class DBConnector:
             con.close()
         return result
 
+    def enqueue_downloads(self, manufacturer: str, table="products") -> int:
+        """Add all products of a manufacturer without file path to the download queue
+
+        Products that are already queued keep their retry state.
+
+        Args:
+            manufacturer (str): manufacturer of the products
+            table (str, optional): table of the products. Defaults to 'products'.
+
+        Returns:
+            int: number of newly queued products
+        """
+        query = f"""
+            INSERT IGNORE INTO download_queue (product_id, manufacturer, next_attempt_at)
+            SELECT id, manufacturer, NOW()
+            FROM `{table}`
+            WHERE manufacturer = %s AND file_path IS NULL;
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.execute(query, (manufacturer,))
+                result = cursor.rowcount
+                con.commit()
+        finally:
+            con.close()
+        return result
+
+    def claim_downloads(
+        self,
+        manufacturer: str,
+        owner: str,
+        limit: int = 500,
+        lease_seconds: int = 3600,
+        table="products",
+    ) -> list:
+        """Lease due downloads of a manufacturer to a worker
+
+        Jobs are claimed in order of priority with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent
+        workers (on any host) never claim the same job. A lease that was not completed or released
+        in time, e.g. because its worker crashed, expires and the job is claimed again.
+
+        Args:
+            manufacturer (str): manufacturer of the products
+            owner (str): id of the claiming worker
+            limit (int, optional): max. number of jobs to claim. Defaults to 500.
+            lease_seconds (int, optional): seconds until the lease expires. Defaults to 3600.
+            table (str, optional): table of the products. Defaults to 'products'.
+
+        Returns:
+            list: tuples (id, product_name, download_link, file_path, checksum_scraped, checksum_local,
+                attempts) with the number of earlier failed attempts
+        """
+        select_query = """
+            SELECT product_id
+            FROM download_queue
+            WHERE manufacturer = %s AND next_attempt_at <= NOW()
+            AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+            ORDER BY priority DESC, next_attempt_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED;
+            """
+        lease_query = """
+            UPDATE download_queue
+            SET lease_owner = %s, lease_expires_at = NOW() + INTERVAL %s SECOND
+            WHERE product_id = %s;
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.execute(select_query, (manufacturer, limit))
+                ids = [row[0] for row in cursor.fetchall()]
+                cursor.executemany(
+                    lease_query, [(owner, lease_seconds, id) for id in ids]
+                )
+                con.commit()
+                if not ids:
+                    return []
+                cursor.execute(
+                    f"""
+                    SELECT p.id, p.product_name, p.download_link, p.file_path,
+                    p.checksum_scraped, p.checksum_local, q.attempts
+                    FROM `{table}` AS p
+                    JOIN download_queue AS q ON q.product_id = p.id
+                    WHERE p.id IN ({", ".join(["%s"] * len(ids))});
+                    """,
+                    ids,
+                )
+                result = cursor.fetchall()
+        finally:
+            con.close()
+        return result
+
+    def fail_downloads(
+        self,
+        failures: list,
+        retry_base_seconds: int = 600,
+        retry_max_seconds: int = 604800,
+    ):
+        """Record failed attempts and schedule their retries with exponential backoff
+
+        The n-th failed attempt of a job is retried after retry_base_seconds * 2^(n-1), at most after
+        retry_max_seconds.
+
+        Args:
+            failures (list): tuples (product_id, error message)
+            retry_base_seconds (int, optional): delay after the first failure. Defaults to 600.
+            retry_max_seconds (int, optional): max. delay. Defaults to 604800 (a week).
+        """
+        if not failures:
+            return
+        # MySQL assigns from left to right, next_attempt_at has to use attempts before the increment
+        query = """
+            UPDATE download_queue
+            SET next_attempt_at = NOW() + INTERVAL LEAST(%s * POW(2, attempts), %s) SECOND,
+            attempts = attempts + 1, last_error = %s,
+            lease_owner = NULL, lease_expires_at = NULL
+            WHERE product_id = %s;
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.executemany(
+                    query,
+                    [
+                        (retry_base_seconds, retry_max_seconds, str(error)[:65535], id)
+                        for id, error in failures
+                    ],
+                )
+                con.commit()
+        finally:
+            con.close()
+
+    def release_downloads(self, product_ids: list):
+        """Give back leased downloads without counting an attempt, e.g. if they did not fit on disk
+
+        Args:
+            product_ids (list): ids of the leased products
+        """
+        if not product_ids:
+            return
+        query = """
+            UPDATE download_queue
+            SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE product_id = %s;
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.executemany(query, [(id,) for id in product_ids])
+                con.commit()
+        finally:
+            con.close()
+
     def set_file_path(self, id, file_path, table="products"):
         """Set file path of product with ID 'id'
 
@@ -341,6 +793,253 @@ class DBConnector:
         finally:
             con.close()
 
+    def get_checksums(self, checksum: str, algorithm: str = "sha256"):
+        """Look up the checksums of an already downloaded file by one of its checksums
+
+        Args:
+            checksum (str): lower-case hex digest of the file
+            algorithm (str, optional): "md5", "sha1" or "sha256". Defaults to "sha256".
+
+        Returns:
+            tuple: (md5, sha1, sha256, file_size), or None if no such file was downloaded
+        """
+        if algorithm not in ("md5", "sha1", "sha256"):
+            raise ValueError(f"Unknown checksum algorithm {algorithm}")
+        query = f"""
+            SELECT md5, sha1, sha256, file_size
+            FROM firmware_checksums
+            WHERE {algorithm} = %s
+            LIMIT 1;
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.execute(query, (checksum,))
+                result = cursor.fetchone()
+        finally:
+            con.close()
+        return result
+
+    def get_download_validators(self, manufacturer: str, table="products") -> dict:
+        """Get the HTTP validators of the last downloads of all products of a manufacturer
+
+        Args:
+            manufacturer (str): manufacturer of the products
+            table (str, optional): table of the products. Defaults to 'products'.
+
+        Returns:
+            dict: product id -> dict with "etag", "last_modified" and "content_length"
+        """
+        query = f"""
+            SELECT v.product_id, v.etag, v.last_modified, v.content_length
+            FROM download_validators AS v
+            JOIN `{table}` AS p ON v.product_id = p.id
+            WHERE p.manufacturer = %s;
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.execute(query, (manufacturer,))
+                result = cursor.fetchall()
+        finally:
+            con.close()
+        return {
+            id: {
+                "etag": etag,
+                "last_modified": last_modified,
+                "content_length": content_length,
+            }
+            for id, etag, last_modified, content_length in result
+        }
+
+    def set_download_validators(self, validators: list):
+        """Store the HTTP validators of a batch of downloads in one transaction
+
+        Args:
+            validators (list): tuples (product_id, download_link, etag, last_modified, content_length,
+                content_type)
+        """
+        if not validators:
+            return
+        query = """
+            INSERT INTO download_validators
+            (product_id, download_link, etag, last_modified, content_length, content_type, checked_at)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE
+            download_link = VALUES(download_link), etag = VALUES(etag), last_modified = VALUES(last_modified),
+            content_length = VALUES(content_length), content_type = VALUES(content_type),
+            checked_at = VALUES(checked_at);
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.executemany(query, validators)
+                con.commit()
+        finally:
+            con.close()
+
+    def set_downloaded_files(self, downloads: list, table="products"):
+        """Set file path and checksums of a batch of downloaded products in one transaction
+
+        checksum_local of the products is set to the SHA-256 of the file, all checksums are stored in
+        the firmware_checksums table. The products are removed from the download queue.
+
+        Args:
+            downloads (list): tuples (id, file_path, md5, sha1, sha256, file_size)
+            table (str, optional): table of the downloaded products. Defaults to 'products'.
+        """
+        if not downloads:
+            return
+        update_products_query = f"""
+            UPDATE `{table}`
+            SET file_path = %s, checksum_local = %s
+            WHERE id = %s;
+            """
+        upsert_checksums_query = """
+            INSERT INTO firmware_checksums (product_id, md5, sha1, sha256, file_size)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            md5 = VALUES(md5), sha1 = VALUES(sha1), sha256 = VALUES(sha256), file_size = VALUES(file_size);
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.executemany(
+                    update_products_query,
+                    [(path, sha256, id) for id, path, _, _, sha256, _ in downloads],
+                )
+                cursor.executemany(
+                    upsert_checksums_query,
+                    [
+                        (id, md5, sha1, sha256, size)
+                        for id, _, md5, sha1, sha256, size in downloads
+                    ],
+                )
+                cursor.executemany(
+                    "DELETE FROM download_queue WHERE product_id = %s;",
+                    [(id,) for id, *_ in downloads],
+                )
+                con.commit()
+        finally:
+            con.close()
+
+    def get_products_to_unpack(self, manufacturer: str, table="products") -> list:
+        """Get downloaded products of a manufacturer whose files are not recorded as unpacked yet
+
+        Downloads that failed to unpack or are no archive are not returned again, unless their
+        content changes.
+
+        Args:
+            manufacturer (str): manufacturer of the products
+            table (str, optional): table of the products. Defaults to 'products'.
+
+        Returns:
+            list: tuples (id, file_path, sha256, unpacked), unpacked is True if an identical archive
+                was already unpacked for another product
+        """
+        query = f"""
+            SELECT p.id, p.file_path, c.sha256, u.sha256 IS NOT NULL
+            FROM `{table}` AS p
+            JOIN firmware_checksums AS c ON c.product_id = p.id
+            LEFT JOIN unpacked_archives AS u ON u.sha256 = c.sha256
+            WHERE p.manufacturer = %s AND p.file_path IS NOT NULL
+            AND (u.sha256 IS NULL OR (u.error IS NULL AND u.num_files > 0))
+            AND NOT EXISTS (
+                SELECT 1 FROM firmware_files AS f
+                WHERE f.product_id = p.id AND f.archive_sha256 = c.sha256
+            );
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.execute(query, (manufacturer,))
+                result = cursor.fetchall()
+        finally:
+            con.close()
+        return [(id, path, sha256, bool(unpacked)) for id, path, sha256, unpacked in result]
+
+    def set_unpacked_archives(self, archives: list):
+        """Store the files of a batch of unpacked archives in one transaction
+
+        Files unpacked from an earlier version of the products are replaced.
+
+        Args:
+            archives (list): tuples (product_id, sha256, extract_dir, files, error) with files as
+                tuples (member_path, file_path, md5, sha1, sha256, file_size). files is empty for
+                downloads that are no archive, error is None if unpacking succeeded.
+        """
+        if not archives:
+            return
+        upsert_archives_query = """
+            INSERT INTO unpacked_archives (sha256, extract_dir, num_files, error, unpacked_at)
+            VALUES (%s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE
+            extract_dir = VALUES(extract_dir), num_files = VALUES(num_files),
+            error = VALUES(error), unpacked_at = VALUES(unpacked_at);
+            """
+        insert_files_query = """
+            INSERT INTO firmware_files
+            (product_id, archive_sha256, member_path, file_path, md5, sha1, sha256, file_size)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.executemany(
+                    upsert_archives_query,
+                    [
+                        (sha256, extract_dir, len(files), error)
+                        for _, sha256, extract_dir, files, error in archives
+                    ],
+                )
+                cursor.executemany(
+                    "DELETE FROM firmware_files WHERE product_id = %s;",
+                    [(id,) for id, *_ in archives],
+                )
+                cursor.executemany(
+                    insert_files_query,
+                    [
+                        (id, sha256, *file)
+                        for id, sha256, _, files, _ in archives
+                        for file in files
+                    ],
+                )
+                con.commit()
+        finally:
+            con.close()
+
+    def link_unpacked_archives(self, products: list):
+        """Record the files of already unpacked archives for other products with the same archive
+
+        Args:
+            products (list): tuples (product_id, sha256 of the archive)
+        """
+        if not products:
+            return
+        copy_files_query = """
+            INSERT INTO firmware_files
+            (product_id, archive_sha256, member_path, file_path, md5, sha1, sha256, file_size)
+            SELECT %s, archive_sha256, member_path, file_path, md5, sha1, sha256, file_size
+            FROM firmware_files
+            WHERE product_id = (
+                SELECT MIN(product_id) FROM firmware_files WHERE archive_sha256 = %s
+            ) AND archive_sha256 = %s;
+            """
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.executemany(
+                    "DELETE FROM firmware_files WHERE product_id = %s;",
+                    [(id,) for id, _ in products],
+                )
+                cursor.executemany(
+                    copy_files_query,
+                    [(id, sha256, sha256) for id, sha256 in products],
+                )
+                con.commit()
+        finally:
+            con.close()
+
     def compare_products(
         self, table1: str, table2: str = "products"
     ) -> list[dict]:
@@ -361,11 +1060,8 @@ class DBConnector:
                     tmp.download_link, tmp.product_url, tmp.file_path, tmp.checksum_local,
                     tmp.checksum_scraped, tmp.emba_tested, tmp.emba_report_path, tmp.embark_report_link, tmp.runner_uuid,
                     tmp.additional_data
-                    from `{table1}` as tmp left join `{table2}` as tmp2 
-                    on tmp.product_name = tmp2.product_name 
-                    and tmp.version = tmp2.version 
-                    and tmp.manufacturer = tmp2.manufacturer 
-                    and tmp.product_type = tmp2.product_type 
+                    from `{table1}` as tmp left join `{table2}` as tmp2
+                    on {_natural_key_expression("tmp")} = {_natural_key_expression("tmp2")}
                     where tmp2.id is null;"""
         try:
             with con.cursor(dictionary=True) as cursor:
@@ -378,6 +1074,97 @@ class DBConnector:
             con.close()
         return result
 
+    def insert_new_products(
+        self, table1: str, table2: str = "products"
+    ) -> int:
+        """Inserts all products of the product catalog in table1 which are not yet in table2 (historized).
+
+        Same comparison as compare_products(), but runs entirely inside the DB, so that the new products
+        never have to be loaded into memory. Products are identified by their natural key, like in
+        upsert_products(). Rows of table1 that collide with the unique natural key of table2 anyway, e.g.
+        duplicates within the catalog, are left as they are; all other errors are raised.
+
+        The compares of vendors scraped in parallel do not lock each other's rows of table2. Deadlocks
+        and lock wait timeouts are retried nonetheless.
+
+        Args:
+            table1 (str): table name of product catalog in temporary vendor table
+            table2 (str, optional): table of of products table (historized). Defaults to 'products'.
+
+        Returns:
+            int: number of inserted (new) products
+        """
+        query = f"""INSERT INTO `{table2}`
+                    (inserted_at, manufacturer, product_name, product_type, version, release_date, download_link,
+                    product_url, file_path, checksum_local, checksum_scraped, emba_tested, emba_report_path,
+                    embark_report_link, runner_uuid, additional_data)
+                    select 
+                    tmp.inserted_at, tmp.manufacturer, tmp.product_name, tmp.product_type, tmp.version, tmp.release_date, 
+                    tmp.download_link, tmp.product_url, tmp.file_path, tmp.checksum_local,
+                    tmp.checksum_scraped, tmp.emba_tested, tmp.emba_report_path, tmp.embark_report_link, tmp.runner_uuid,
+                    tmp.additional_data
+                    from `{table1}` as tmp left join `{table2}` as tmp2
+                    on {_natural_key_expression("tmp")} = {_natural_key_expression("tmp2")}
+                    where tmp2.id is null
+                    on duplicate key update `{table2}`.id = `{table2}`.id;"""
+        for attempt in range(RETRIES + 1):
+            con = self._get_db_con()
+            try:
+                with con.cursor() as cursor:
+                    # read table2 consistently instead of taking shared locks on all its rows, which
+                    # deadlocks with the compares of vendors scraped in parallel
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED;")
+                    cursor.execute(query)
+                    result = cursor.rowcount
+                    con.commit()
+                return result
+            except mysql.connector.Error as ex:
+                if ex.errno not in RETRYABLE_ERRORS or attempt == RETRIES:
+                    raise
+                logger.warning(f"Compare of {table1} conflicted with another one, retry it.")
+                logger.warning(ex)
+                time.sleep(2**attempt)
+            finally:
+                con.close()
+
+    def upsert_products(self, product_list: list[dict], table: str = "products") -> int:
+        """Inserts the products of a scraped catalog that are not yet in table (historized).
+
+        Replaces the temporary vendor table and insert_new_products(): products already in table are
+        detected by the unique index of their natural key in the same pass that inserts the new ones.
+        Existing products are left as they are.
+
+        Args:
+            product_list (list[dict]): scraped products, see insert_products()
+            table (str, optional): table of the products, with natural_key. Defaults to 'products'.
+
+        Returns:
+            int: number of inserted (new) products
+        """
+        if not product_list:
+            return 0
+        # without CLIENT_FOUND_ROWS, duplicates that are left unchanged count 0 rows
+        upsert_products_query = f"""
+            INSERT INTO `{table}`
+            (inserted_at, manufacturer, product_name, product_type, version, release_date, download_link, product_url,
+            file_path, checksum_local, checksum_scraped, emba_tested, emba_report_path, embark_report_link, runner_uuid,
+            additional_data)
+            VALUES ( %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE id = id;
+        """
+        product_list = [
+            self._convert_firmware_dict_to_tuple(fw_dict) for fw_dict in product_list
+        ]
+        con = self._get_db_con()
+        try:
+            with con.cursor() as cursor:
+                cursor.executemany(upsert_products_query, product_list)
+                result = cursor.rowcount
+                con.commit()
+        finally:
+            con.close()
+        return result
+
     def get_products(self, manufacturer="", table="products"):
         """query DB for firmware on any table, optionally filtered by manufacturer
 
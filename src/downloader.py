@@ -0,0 +1,691 @@
+"""
+Module to download firmware files over HTTP.
+
+Files are streamed to disk in fixed-size chunks, so that memory usage is bounded by the chunk size
+instead of the size of the largest firmware. Every download is written to a .part file next to
+its destination and only renamed to the destination once it is complete. Failed downloads therefore
+never leave truncated files behind, and are resumed with HTTP Range requests where the server
+supports it.
+
+Many downloads are run at once by a DownloadEngine. It shares a pool of keep-alive connections
+between its worker threads and caps the number of concurrent downloads per host, so that a single
+slow vendor server neither blocks the other hosts nor gets flooded with connections.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.bandwidth import BandwidthLimiter
+from src.logger import get_logger
+
+logger = get_logger()
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+TIMEOUT = 60  # seconds to wait for the connection and between two chunks
+UNKNOWN_SIZE = 512 * 1024 * 1024  # disk space reserved for a download whose size is unknown
+
+
+class IncompleteDownload(Exception):
+    """Raised if fewer bytes were received than announced by the server"""
+
+
+class DownloadResult:
+    """Outcome of a finished download
+
+    Attributes:
+        num_bytes (int): number of bytes received by the download (less than size if it was resumed)
+        size (int): size of the downloaded file
+        md5 (str): hex MD5 digest of the file
+        sha1 (str): hex SHA-1 digest of the file
+        sha256 (str): hex SHA-256 digest of the file
+        validators (dict): "etag", "last_modified", "content_length" and "content_type" sent by the server
+        modified (bool): False if the server answered a conditional request with 304 Not Modified.
+            Nothing was downloaded then, and size and checksums are None.
+        status (int): HTTP status of the response
+        ttfb (float): seconds from sending the request until the response headers arrived
+        duration (float): seconds from sending the request until the file was complete
+    """
+
+    def __init__(
+        self,
+        num_bytes: int,
+        size: int,
+        hashes: dict,
+        validators: dict = None,
+        modified: bool = True,
+        status: int = None,
+        ttfb: float = None,
+        duration: float = None,
+    ):
+        self.num_bytes = num_bytes
+        self.size = size
+        self.md5 = hashes["md5"].hexdigest() if hashes else None
+        self.sha1 = hashes["sha1"].hexdigest() if hashes else None
+        self.sha256 = hashes["sha256"].hexdigest() if hashes else None
+        self.validators = validators or {}
+        self.modified = modified
+        self.status = status
+        self.ttfb = ttfb
+        self.duration = duration
+
+
+def _get_validators(response: requests.Response) -> dict:
+    content_length = response.headers.get("Content-Length")
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_length": int(content_length) if content_length else None,
+        "content_type": response.headers.get("Content-Type"),
+    }
+
+
+# published checksums are told apart by the length of their hex digest
+CHECKSUM_ALGORITHMS = {32: "md5", 40: "sha1", 64: "sha256"}
+
+
+def checksum_algorithm(checksum: str) -> str:
+    """Tell the algorithm of a published checksum by the length of its hex digest
+
+    Args:
+        checksum (str): checksum, e.g. checksum_scraped of a product, normalized with strip().lower()
+
+    Returns:
+        str: "md5", "sha1" or "sha256", None if checksum is no hex digest of a known length
+    """
+    algorithm = CHECKSUM_ALGORITHMS.get(len(checksum or ""))
+    if algorithm is None or any(c not in "0123456789abcdef" for c in checksum):
+        return None
+    return algorithm
+
+
+def verify_checksum(result: DownloadResult, checksum: str):
+    """Compare a checksum published by the vendor with the checksums computed while downloading
+
+    Args:
+        result (DownloadResult): finished download
+        checksum (str): hex MD5, SHA-1 or SHA-256 digest, e.g. checksum_scraped of the product
+
+    Returns:
+        bool: True if the checksum matches, False if it does not, None if there is no checksum in a
+            known format to compare with
+    """
+    checksum = (checksum or "").strip().lower()
+    algorithm = checksum_algorithm(checksum)
+    if algorithm is None:
+        return None
+    return getattr(result, algorithm) == checksum
+
+
+def _new_hashes() -> dict:
+    return {
+        "md5": hashlib.md5(),
+        "sha1": hashlib.sha1(),
+        "sha256": hashlib.sha256(),
+    }
+
+
+def _update_hashes(hashes: dict, chunk: bytes):
+    for digest in hashes.values():
+        digest.update(chunk)
+
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """Create a session with pooled keep-alive connections
+
+    Args:
+        pool_size (int, optional): connections kept open per host. Defaults to 10.
+
+    Returns:
+        requests.Session: session to download with
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # firmware is stored as sent, so Content-Length has to match the bytes on disk
+    session.headers["Accept-Encoding"] = "identity"
+    return session
+
+
+def _load_part_meta(meta_path: str) -> dict:
+    try:
+        with open(meta_path) as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_part_meta(meta_path: str, meta: dict):
+    with open(meta_path, "w") as meta_file:
+        json.dump(meta, meta_file)
+
+
+def _remove(*paths: str):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def download_file(
+    url: str,
+    save_as: str,
+    chunk_size: int = CHUNK_SIZE,
+    session: requests.Session = None,
+    timeout: float = TIMEOUT,
+    validators: dict = None,
+    throttle=None,
+    headers: dict = None,
+    cookies: dict = None,
+) -> DownloadResult:
+    """Stream url to save_as, resuming an earlier partial download if possible
+
+    MD5, SHA-1 and SHA-256 of the file are computed from the chunks while they are written, so the
+    file is never read back from disk. Only the already downloaded part of a resumed download is
+    read once to continue its hashes.
+
+    If validators of an earlier download of url are given, the request is made conditional with
+    If-None-Match and If-Modified-Since. An unchanged file then costs a single 304 response.
+
+    The download is written to save_as + ".part" and its response headers to save_as + ".part.json".
+    If a download fails and the server announced "Accept-Ranges: bytes" together with an ETag or
+    Last-Modified header, both files are kept. The next call then requests only the missing bytes
+    with a Range request, guarded by If-Range so that the server sends the whole file again if it
+    changed in the meantime. Otherwise, the partial file is removed and the next call starts over.
+
+    Args:
+        url (str): URL to download
+        save_as (str): destination path
+        chunk_size (int, optional): number of bytes read and written at once. Defaults to CHUNK_SIZE.
+        session (requests.Session, optional): session to reuse connections of. Defaults to None.
+        timeout (float, optional): seconds to wait for the server. Defaults to TIMEOUT.
+        validators (dict, optional): "etag" and "last_modified" of an earlier download of url.
+            Defaults to None (unconditional request).
+        throttle (callable, optional): called with the size of every received chunk, to limit the
+            bandwidth (see BandwidthLimiter.throttle()). Defaults to None.
+        headers (dict, optional): additional request headers, e.g. of a browser session. Defaults to None.
+        cookies (dict, optional): request cookies, e.g. of a browser session. Defaults to None.
+
+    Returns:
+        DownloadResult: received bytes, size, checksums and validators of the file
+    """
+    if session is None:
+        session = create_session(pool_size=1)
+
+    part_path = f"{save_as}.part"
+    meta_path = f"{part_path}.json"
+    meta = _load_part_meta(meta_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    headers = dict(headers or {})
+    validator = meta.get("etag") or meta.get("last_modified")
+    if offset and meta.get("url") == url and meta.get("resumable") and validator:
+        headers.update({"Range": f"bytes={offset}-", "If-Range": validator})
+    else:
+        offset = 0
+        if validators and validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators and validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    num_bytes = 0
+    # a partial file that could be resumed is kept, unless the server rejects its range
+    resumable = bool(offset)
+    start = time.perf_counter()
+    try:
+        with session.get(
+            url, stream=True, timeout=timeout, headers=headers, cookies=cookies
+        ) as response:
+            status = response.status_code
+            ttfb = response.elapsed.total_seconds()
+            if response.status_code == 304:
+                return DownloadResult(
+                    0,
+                    None,
+                    None,
+                    _get_validators(response),
+                    modified=False,
+                    status=status,
+                    ttfb=ttfb,
+                    duration=time.perf_counter() - start,
+                )
+            if response.status_code == 416:
+                resumable = False
+            response.raise_for_status()
+            if response.status_code != 206 or not response.headers.get(
+                "Content-Range", ""
+            ).startswith(f"bytes {offset}-"):
+                # server ignored the range or the file changed, start over
+                offset = 0
+            content_length = response.headers.get("Content-Length")
+            expected_size = (
+                offset + int(content_length) if content_length is not None else None
+            )
+            previous = meta if offset else {}
+            meta = {
+                "url": url,
+                "etag": response.headers.get("ETag") or previous.get("etag"),
+                "last_modified": response.headers.get("Last-Modified")
+                or previous.get("last_modified"),
+                "size": expected_size,
+                "resumable": response.headers.get("Accept-Ranges") == "bytes"
+                or response.status_code == 206,
+            }
+            resumable = meta["resumable"] and bool(
+                meta["etag"] or meta["last_modified"]
+            )
+            if resumable:
+                _save_part_meta(meta_path, meta)
+
+            hashes = _new_hashes()
+            if offset:
+                with open(part_path, "rb") as part_file:
+                    while chunk := part_file.read(chunk_size):
+                        _update_hashes(hashes, chunk)
+
+            with open(part_path, "ab" if offset else "wb") as part_file:
+                for chunk in response.iter_content(chunk_size):
+                    part_file.write(chunk)
+                    _update_hashes(hashes, chunk)
+                    num_bytes += len(chunk)
+                    if throttle is not None:
+                        throttle(len(chunk))
+
+        if expected_size is not None and offset + num_bytes != expected_size:
+            raise IncompleteDownload(
+                f"Received {offset + num_bytes} of {expected_size} bytes from {url}"
+            )
+        os.replace(part_path, save_as)
+        _remove(meta_path)
+        validators = _get_validators(response)
+        validators.update(
+            etag=meta["etag"],
+            last_modified=meta["last_modified"],
+            content_length=offset + num_bytes,
+        )
+    except BaseException:
+        if not resumable:
+            _remove(part_path, meta_path)
+        raise
+
+    return DownloadResult(
+        num_bytes,
+        offset + num_bytes,
+        hashes,
+        validators,
+        status=status,
+        ttfb=ttfb,
+        duration=time.perf_counter() - start,
+    )
+
+
+def probe_url(
+    url: str,
+    session: requests.Session = None,
+    timeout: float = TIMEOUT,
+    headers: dict = None,
+    cookies: dict = None,
+) -> dict:
+    """Find out size and type of a download without downloading it
+
+    Sends a HEAD request. Servers that reject HEAD or omit Content-Length are asked for the first
+    byte with a ranged GET instead, whose Content-Range contains the size of the whole file.
+
+    Args:
+        url (str): URL to probe
+        session (requests.Session, optional): session to reuse connections of. Defaults to None.
+        timeout (float, optional): seconds to wait for the server. Defaults to TIMEOUT.
+        headers (dict, optional): additional request headers. Defaults to None.
+        cookies (dict, optional): request cookies. Defaults to None.
+
+    Returns:
+        dict: "content_length" (None if unknown), "content_type", "etag" and "last_modified"
+    """
+    if session is None:
+        session = create_session(pool_size=1)
+
+    try:
+        response = session.head(
+            url,
+            timeout=timeout,
+            allow_redirects=True,
+            headers=headers,
+            cookies=cookies,
+        )
+        response.raise_for_status()
+        info = _get_validators(response)
+    except requests.RequestException:
+        info = {"content_length": None}
+    if info["content_length"] is None:
+        with session.get(
+            url,
+            stream=True,
+            timeout=timeout,
+            headers={**(headers or {}), "Range": "bytes=0-0"},
+            cookies=cookies,
+        ) as response:
+            response.raise_for_status()
+            info = _get_validators(response)
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code == 206:
+                total = content_range.rsplit("/", 1)[-1]
+                info["content_length"] = int(total) if total.isdigit() else None
+    return info
+
+
+class DiskBudget:
+    """Admission control for downloads, shared by all vendors of a run.
+
+    A download is admitted only if its size fits into both the remaining budget and the free disk
+    space minus a reserve, counting the space promised to admitted downloads that are still running.
+    Downloads of unknown size are admitted with a conservative estimate of their size.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        budget_bytes: int = None,
+        reserve_bytes: int = 0,
+        unknown_size_bytes: int = UNKNOWN_SIZE,
+    ):
+        """
+        Args:
+            path (str): directory on the file system to download to
+            budget_bytes (int, optional): max. number of bytes to download in this run.
+                Defaults to None (only limited by free disk space).
+            reserve_bytes (int, optional): disk space to always keep free. Defaults to 0.
+            unknown_size_bytes (int, optional): size to reserve for a download of unknown size.
+                Defaults to UNKNOWN_SIZE (512 MiB).
+        """
+        self.path = path
+        self.budget_bytes = budget_bytes
+        self.reserve_bytes = reserve_bytes
+        self.unknown_size_bytes = unknown_size_bytes
+        self.used_bytes = 0
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "DiskBudget":
+        budget_mb = config.get("download_disk_budget_mb")
+        return cls(
+            os.path.realpath(config.get("download_dir", "../downloads")),
+            budget_bytes=budget_mb * 1024 * 1024 if budget_mb else None,
+            reserve_bytes=config.get("min_free_disk_mb", 1024) * 1024 * 1024,
+            unknown_size_bytes=config.get("unknown_download_size_mb", 512) * 1024 * 1024,
+        )
+
+    def free_bytes(self) -> int:
+        """Return the free disk space that is not yet promised to a running download"""
+        path = self.path
+        while not os.path.exists(path):
+            path = os.path.dirname(path)
+        return shutil.disk_usage(path).free - self._pending_bytes
+
+    def reserve(self, size: int) -> bool:
+        """Admit a download of size bytes if it can finish
+
+        Args:
+            size (int): size of the download, None if unknown (unknown_size_bytes are reserved)
+
+        Returns:
+            bool: True if the download is admitted. release() has to be called once it ended.
+        """
+        size = self.unknown_size_bytes if size is None else size
+        with self._lock:
+            available = self.free_bytes() - self.reserve_bytes
+            if self.budget_bytes is not None:
+                available = min(available, self.budget_bytes - self.used_bytes)
+            if size > available or available <= 0:
+                return False
+            self.used_bytes += size
+            self._pending_bytes += size
+            return True
+
+    def release(self, size: int, downloaded: bool = True):
+        """Release the reservation of an ended download
+
+        Args:
+            size (int): size the download was admitted with, None if unknown
+            downloaded (bool, optional): False if the download failed and its size is given back
+                to the budget. Defaults to True.
+        """
+        size = self.unknown_size_bytes if size is None else size
+        with self._lock:
+            self._pending_bytes -= size
+            if not downloaded:
+                self.used_bytes -= size
+
+
+class DownloadEngine:
+    """Download many files concurrently.
+
+    Downloads are queued per host and dispatched round-robin over the hosts to a pool of max_workers
+    threads, with at most per_host_limit downloads of the same host running at once. Queued downloads
+    of a busy host therefore never occupy a worker, which stays free for the other hosts.
+    One engine is meant to be shared by all vendors downloaded in a run, together with its DiskBudget
+    and BandwidthLimiter.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_host_limit: int = 2,
+        chunk_size: int = CHUNK_SIZE,
+        timeout: float = TIMEOUT,
+        disk_budget: DiskBudget = None,
+        bandwidth: BandwidthLimiter = None,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.disk_budget = disk_budget
+        self.bandwidth = bandwidth
+        self.session = create_session(pool_size=self.max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="fetch"
+        )
+        self._lock = threading.Lock()
+        self._queues = {}  # host -> deque of (future, task)
+        self._hosts = deque()  # hosts with queued downloads, in round-robin order
+        self._active = {}  # host -> number of running downloads
+        self._num_active = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "DownloadEngine":
+        """Create an engine from the download settings in config.json
+
+        Args:
+            config (dict): content of config.json
+
+        Returns:
+            DownloadEngine: engine with the configured limits
+        """
+        return cls(
+            max_workers=int(config.get("download_concurrency", 8)),
+            per_host_limit=int(config.get("per_host_limit", 2)),
+            timeout=config.get("download_timeout", TIMEOUT),
+            disk_budget=DiskBudget.from_config(config),
+            bandwidth=BandwidthLimiter.from_config(config),
+        )
+
+    def submit(
+        self,
+        url: str,
+        save_as: str,
+        validators: dict = None,
+        vendor: str = None,
+        headers: dict = None,
+        cookies: dict = None,
+    ) -> Future:
+        """Queue a download
+
+        Args:
+            url (str): URL to download
+            save_as (str): destination path
+            validators (dict, optional): validators of an earlier download, see download_file().
+                Defaults to None.
+            vendor (str, optional): class name of the vendor whose bandwidth limit applies.
+                Defaults to None.
+            headers (dict, optional): additional request headers. Defaults to None.
+            cookies (dict, optional): request cookies. Defaults to None.
+
+        Returns:
+            Future: resolves to the DownloadResult
+        """
+        throttle = None
+        if self.bandwidth is not None:
+            host = urlparse(url).netloc
+            throttle = lambda num_bytes: self.bandwidth.throttle(
+                num_bytes, host, vendor
+            )
+        return self._enqueue(
+            url,
+            lambda: download_file(
+                url,
+                save_as,
+                self.chunk_size,
+                session=self.session,
+                timeout=self.timeout,
+                validators=validators,
+                throttle=throttle,
+                headers=headers,
+                cookies=cookies,
+            ),
+        )
+
+    def download_all(
+        self,
+        jobs: list,
+        validators: dict = None,
+        vendor: str = None,
+        resolved: dict = None,
+    ):
+        """Download jobs concurrently and yield them as they finish
+
+        Args:
+            jobs (list): tuples (key, url, save_as)
+            validators (dict, optional): key -> validators of an earlier download, to download only
+                changed files. Defaults to None.
+            vendor (str, optional): class name of the vendor whose bandwidth limit applies.
+                Defaults to None.
+            resolved (dict, optional): key -> (url, headers, cookies) to request instead of the url of
+                the job, see Scraper.resolve_download(). Defaults to None.
+
+        Yields:
+            tuple: (key, url, save_as, DownloadResult or None, exception or None)
+        """
+        validators = validators or {}
+        resolved = resolved or {}
+        futures = {}
+        for key, url, save_as in jobs:
+            request_url, headers, cookies = resolved.get(key, (url, None, None))
+            future = self.submit(
+                request_url,
+                save_as,
+                validators.get(key),
+                vendor,
+                headers=headers,
+                cookies=cookies,
+            )
+            futures[future] = (key, url, save_as)
+        yield from self._as_completed(futures)
+
+    def probe_all(self, jobs: list, resolved: dict = None):
+        """Probe jobs concurrently, with the same per-host limits as downloads
+
+        Args:
+            jobs (list): tuples (key, url, save_as)
+            resolved (dict, optional): key -> (url, headers, cookies) to request instead of the url of
+                the job. Defaults to None.
+
+        Yields:
+            tuple: (key, url, save_as, dict of probe_url() or None, exception or None)
+        """
+        resolved = resolved or {}
+        futures = {}
+        for key, url, save_as in jobs:
+            request_url, headers, cookies = resolved.get(key, (url, None, None))
+            future = self._enqueue(
+                request_url,
+                lambda request=(request_url, headers, cookies): probe_url(
+                    request[0],
+                    self.session,
+                    self.timeout,
+                    headers=request[1],
+                    cookies=request[2],
+                ),
+            )
+            futures[future] = (key, url, save_as)
+        yield from self._as_completed(futures)
+
+    def close(self):
+        """Wait for running downloads and close all connections"""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _as_completed(self, futures: dict):
+        for future in as_completed(futures):
+            key, url, save_as = futures[future]
+            error = future.exception()
+            result = None if error else future.result()
+            yield key, url, save_as, result, error
+
+    def _enqueue(self, url: str, task) -> Future:
+        future = Future()
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._queues:
+                self._queues[host] = deque()
+                self._hosts.append(host)
+            self._queues[host].append((future, task))
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        # caller holds self._lock
+        checked = 0
+        while self._num_active < self.max_workers and checked < len(self._hosts):
+            host = self._hosts[0]
+            self._hosts.rotate(-1)
+            if self._active.get(host, 0) >= self.per_host_limit:
+                checked += 1
+                continue
+            future, task = self._queues[host].popleft()
+            if not self._queues[host]:
+                del self._queues[host]
+                self._hosts.remove(host)
+            checked = 0
+            self._active[host] = self._active.get(host, 0) + 1
+            self._num_active += 1
+            self._executor.submit(self._run, host, future, task)
+
+    def _run(self, host: str, future: Future, task):
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(task())
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                self._active[host] -= 1
+                self._num_active -= 1
+                self._dispatch()
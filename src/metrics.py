@@ -0,0 +1,143 @@
+"""
+Module to collect per-file download metrics and aggregate them per host and per vendor.
+
+Every finished or failed download is recorded with its vendor, host, HTTP status, received bytes,
+duration, time to first byte (TTFB) and number of earlier failed attempts. The summary per host and
+per vendor contains
+- "files", "failures" and "error_rate"
+- "bytes" received and "retries" of all files
+- "status": number of files per HTTP status
+- "throughput_mb_per_s", "ttfb_s" and "duration_s": percentiles p50, p90 and p99 of the files
+
+A slow host shows a low throughput and a high TTFB in its own entry only, while a saturated uplink
+lowers the throughput of all hosts at once.
+"""
+import json
+import math
+import threading
+
+from src.logger import get_logger
+
+logger = get_logger()
+
+PERCENTILES = [50, 90, 99]
+
+
+def percentiles(values: list) -> dict:
+    """Nearest-rank percentiles of values
+
+    Args:
+        values (list): numbers
+
+    Returns:
+        dict: "p50", "p90" and "p99", None if values is empty
+    """
+    values = sorted(values)
+    if not values:
+        return {f"p{p}": None for p in PERCENTILES}
+    return {
+        f"p{p}": round(values[max(math.ceil(p / 100 * len(values)) - 1, 0)], 3)
+        for p in PERCENTILES
+    }
+
+
+class DownloadMetrics:
+    def __init__(self):
+        """Thread-safe collection of the metrics of single downloads"""
+        self._lock = threading.Lock()
+        self.files = []
+
+    def record(
+        self,
+        vendor: str,
+        host: str,
+        status: int = None,
+        num_bytes: int = 0,
+        duration: float = None,
+        ttfb: float = None,
+        retries: int = 0,
+        error: str = None,
+    ):
+        """Record the metrics of a download
+
+        Args:
+            vendor (str): vendor the download belongs to
+            host (str): host the file was requested from
+            status (int, optional): HTTP status, None if no response arrived. Defaults to None.
+            num_bytes (int, optional): number of received bytes. Defaults to 0.
+            duration (float, optional): seconds until the download was complete. Defaults to None.
+            ttfb (float, optional): seconds until the response headers arrived. Defaults to None.
+            retries (int, optional): number of earlier failed attempts. Defaults to 0.
+            error (str, optional): error of a failed download. Defaults to None.
+        """
+        with self._lock:
+            self.files.append(
+                {
+                    "vendor": vendor,
+                    "host": host,
+                    "status": status,
+                    "bytes": num_bytes,
+                    "duration": duration,
+                    "ttfb": ttfb,
+                    "retries": retries,
+                    "error": error,
+                }
+            )
+
+    @staticmethod
+    def _aggregate(files: list) -> dict:
+        failures = sum(1 for file in files if file["error"] is not None)
+        statuses = {}
+        for file in files:
+            status = str(file["status"])
+            statuses[status] = statuses.get(status, 0) + 1
+        # 304 responses and failures have no meaningful throughput
+        transfers = [
+            file for file in files if file["bytes"] and file["duration"]
+        ]
+        return {
+            "files": len(files),
+            "failures": failures,
+            "error_rate": round(failures / len(files), 4),
+            "bytes": sum(file["bytes"] for file in files),
+            "retries": sum(file["retries"] for file in files),
+            "status": statuses,
+            "throughput_mb_per_s": percentiles(
+                [file["bytes"] / file["duration"] / 1e6 for file in transfers]
+            ),
+            "ttfb_s": percentiles(
+                [file["ttfb"] for file in files if file["ttfb"] is not None]
+            ),
+            "duration_s": percentiles([file["duration"] for file in transfers]),
+        }
+
+    def summary(self) -> dict:
+        """Aggregate the recorded downloads
+
+        Returns:
+            dict: "hosts" and "vendors", each name -> aggregated metrics
+        """
+        with self._lock:
+            files = list(self.files)
+        summary = {}
+        for key, group in [("host", "hosts"), ("vendor", "vendors")]:
+            grouped = {}
+            for file in files:
+                grouped.setdefault(file[key], []).append(file)
+            summary[group] = {
+                name: self._aggregate(group_files)
+                for name, group_files in sorted(grouped.items())
+            }
+        return summary
+
+    def write(self, path: str):
+        """Write the summary and the metrics of every download as JSON file
+
+        Args:
+            path (str): path of the metrics file
+        """
+        with self._lock:
+            files = list(self.files)
+        with open(path, "w") as metrics_file:
+            json.dump({**self.summary(), "files": files}, metrics_file, indent=2)
+        logger.important(f"Wrote download metrics to {path}.")
@@ -0,0 +1,110 @@
+"""
+Module to collect timings and counters of a run and write them as machine-readable JSON report.
+
+Per vendor, the report contains
+- "stages": accumulated wall clock seconds per stage (e.g. "driver_start", "catalog_scrape", "download")
+- "counters": e.g. "pages_fetched", "records_produced", "bytes_downloaded", "failures"
+- "status": final status of the vendor (e.g. "scraped", "failed")
+
+Metrics of single downloads are aggregated per host and per vendor under "downloads" (see
+src.metrics), and written to a separate metrics file together with the metrics of every file.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.logger import get_logger
+from src.metrics import DownloadMetrics
+
+logger = get_logger()
+
+
+class RunReport:
+    def __init__(self):
+        """Thread-safe collection of stage timings and counters per vendor"""
+        self.started_at = datetime.datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.vendors = {}
+        self.downloads = DownloadMetrics()
+
+    def _vendor(self, vendor: str) -> dict:
+        return self.vendors.setdefault(
+            vendor, {"stages": {}, "counters": {}, "status": None}
+        )
+
+    def add_duration(self, vendor: str, stage: str, seconds: float):
+        """Add seconds to the accumulated duration of a stage"""
+        with self._lock:
+            stages = self._vendor(vendor)["stages"]
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, vendor: str, stage: str):
+        """Context manager timing a stage of a vendor
+
+        Example:
+            with report.stage("DLink", "compare"):
+                ...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_duration(vendor, stage, time.perf_counter() - start)
+
+    def count(self, vendor: str, counter: str, n: int = 1):
+        """Increase a counter of a vendor by n"""
+        with self._lock:
+            counters = self._vendor(vendor)["counters"]
+            counters[counter] = counters.get(counter, 0) + n
+
+    def set_status(self, vendor: str, status: str):
+        with self._lock:
+            self._vendor(vendor)["status"] = status
+
+    def merge(self, vendors: dict):
+        """Merge vendor entries of another report, e.g. collected in a worker process"""
+        for vendor, entry in vendors.items():
+            for stage, seconds in entry["stages"].items():
+                self.add_duration(vendor, stage, seconds)
+            for counter, n in entry["counters"].items():
+                self.count(vendor, counter, n)
+            if entry["status"]:
+                self.set_status(vendor, entry["status"])
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            vendors = json.loads(json.dumps(self.vendors))
+        totals = {}
+        for entry in vendors.values():
+            for counter, n in entry["counters"].items():
+                totals[counter] = totals.get(counter, 0) + n
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration": round(time.perf_counter() - self._start, 3),
+            "totals": totals,
+            "vendors": vendors,
+            "downloads": self.downloads.summary(),
+        }
+
+    def write(self, report_dir: str) -> str:
+        """Write report as JSON file into report_dir, and the download metrics if there are any
+
+        Returns:
+            str: path of the written report
+        """
+        os.makedirs(report_dir, exist_ok=True)
+        timestamp = self.started_at.strftime("%Y-%m-%d_%H-%M-%S")
+        path = os.path.join(report_dir, f"run_report_{timestamp}.json")
+        with open(path, "w") as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+        logger.important(f"Wrote run report to {path}.")
+        if self.downloads.files:
+            self.downloads.write(
+                os.path.join(report_dir, f"download_metrics_{timestamp}.json")
+            )
+        return path
@@ -33,6 +33,24 @@ def check_vendors_to_update(config_file_path: str = "src/config.json") -> list:
     return vendor_list
 
 
+def get_vendor_config(vendor: str, config_file_path: str = "src/config.json") -> dict:
+    """get config entry of a vendor
+
+    Args:
+        vendor: str of vendor classname
+        config_file_path (json): json file with schedule information
+    Returns:
+        dict: vendor entry of config.json, empty if vendor is not configured
+    """
+    with open(config_file_path, "r", encoding="utf-8") as config_file:
+        config = json.load(config_file)
+
+    for vendor_config in config["vendors"]:
+        if vendor_config["class_name"] == vendor:
+            return vendor_config
+    return {}
+
+
 def update_vendor_schedule(vendor: str, config_file_path: str = "src/config.json"):
     """update schedule file AFTER vendor finished
 
@@ -0,0 +1,326 @@
+"""
+Module to unpack downloaded firmware archives.
+
+Many vendors wrap their firmware in zip, tar or 7z bundles, often together with release notes. The
+Unpacker extracts them in a pool of worker processes, next to the archive into "<file>.extracted",
+and returns the inner files with their checksums. Archives inside archives are unpacked as well, up
+to max_depth levels.
+
+Archives are untrusted input, so extraction is bounded:
+- max_total_mb: max. number of bytes extracted from an archive, including nested archives
+- max_files: max. number of files extracted from an archive, including nested archives
+- max_ratio: max. ratio of the declared uncompressed size to the size of an archive (zip bombs)
+Members that would be written outside of the extraction directory, links and device files are
+skipped. An archive that exceeds a limit is removed again entirely.
+
+7z archives are unpacked with the 7z command line tool, if it is installed.
+"""
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.downloader import CHUNK_SIZE, _new_hashes, _update_hashes
+from src.logger import get_logger
+
+logger = get_logger()
+
+UNPACK_DEFAULTS = {
+    "workers": 2,
+    "max_total_mb": 4096,
+    "max_files": 10000,
+    "max_ratio": 200,
+    "max_depth": 2,
+    "timeout": 600,
+}
+
+SEVEN_ZIP_MAGIC = b"7z\xbc\xaf\x27\x1c"
+SEVEN_ZIP = shutil.which("7z") or shutil.which("7za") or shutil.which("7zz")
+
+
+class ArchiveLimitExceeded(Exception):
+    """Raised if an archive exceeds a size, file count or compression ratio limit"""
+
+
+class UnsupportedArchive(Exception):
+    """Raised if the tool to unpack an archive is not installed"""
+
+
+def archive_type(path: str) -> str:
+    """Detect the archive format of a file by its content
+
+    Args:
+        path (str): file to check
+
+    Returns:
+        str: "zip", "tar" or "7z", None if the file is no archive
+    """
+    try:
+        with open(path, "rb") as file:
+            if file.read(len(SEVEN_ZIP_MAGIC)) == SEVEN_ZIP_MAGIC:
+                return "7z"
+        if zipfile.is_zipfile(path):
+            return "zip"
+        if tarfile.is_tarfile(path):
+            return "tar"
+    except OSError:
+        pass
+    return None
+
+
+class _Budget:
+    """Bytes and files left for an archive and all archives nested in it"""
+
+    def __init__(self, limits: dict):
+        self.bytes = limits["max_total_mb"] * 1024 * 1024
+        self.files = limits["max_files"]
+        self.max_ratio = limits["max_ratio"]
+
+    def admit(self, archive: str, num_files: int, declared_size: int):
+        if num_files > self.files:
+            raise ArchiveLimitExceeded(f"{archive} has more than {self.files} files")
+        if declared_size > self.bytes:
+            raise ArchiveLimitExceeded(f"{archive} unpacks to more than {self.bytes} bytes")
+        ratio = declared_size / max(os.path.getsize(archive), 1)
+        if ratio > self.max_ratio:
+            raise ArchiveLimitExceeded(
+                f"{archive} has a compression ratio of {ratio:.0f}"
+            )
+
+    def consume(self, archive: str, num_bytes: int):
+        self.bytes -= num_bytes
+        if self.bytes < 0:
+            raise ArchiveLimitExceeded(f"{archive} unpacks to more than its declared size")
+
+
+def _member_path(extract_dir: str, name: str) -> str:
+    """Return the destination of an archive member, None if it would leave extract_dir"""
+    path = os.path.normpath(os.path.join(extract_dir, name.lstrip("/\\")))
+    if os.path.commonpath([extract_dir, path]) != extract_dir or path == extract_dir:
+        return None
+    return path
+
+
+def _write_member(source, path: str, archive: str, budget: _Budget) -> tuple:
+    """Stream an archive member to path and hash it on the fly
+
+    Returns:
+        tuple: (md5, sha1, sha256, size)
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    hashes = _new_hashes()
+    size = 0
+    with open(path, "wb") as file:
+        while chunk := source.read(CHUNK_SIZE):
+            budget.consume(archive, len(chunk))
+            file.write(chunk)
+            _update_hashes(hashes, chunk)
+            size += len(chunk)
+    budget.files -= 1
+    return (*(hashes[name].hexdigest() for name in ["md5", "sha1", "sha256"]), size)
+
+
+def _hash_file(path: str) -> tuple:
+    hashes = _new_hashes()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            _update_hashes(hashes, chunk)
+    return (
+        *(hashes[name].hexdigest() for name in ["md5", "sha1", "sha256"]),
+        os.path.getsize(path),
+    )
+
+
+def _extract_zip(archive: str, extract_dir: str, budget: _Budget) -> list:
+    files = []
+    with zipfile.ZipFile(archive) as zip_file:
+        members = [info for info in zip_file.infolist() if not info.is_dir()]
+        budget.admit(archive, len(members), sum(info.file_size for info in members))
+        for info in members:
+            path = _member_path(extract_dir, info.filename)
+            if path is None:
+                logger.warning(f"Skip {info.filename} of {archive}, it leaves the archive.")
+                continue
+            with zip_file.open(info) as source:
+                files.append((path, *_write_member(source, path, archive, budget)))
+    return files
+
+
+def _extract_tar(archive: str, extract_dir: str, budget: _Budget) -> list:
+    files = []
+    with tarfile.open(archive) as tar_file:
+        # links and device files are skipped, they could point outside of extract_dir
+        members = [info for info in tar_file.getmembers() if info.isreg()]
+        budget.admit(archive, len(members), sum(info.size for info in members))
+        for info in members:
+            path = _member_path(extract_dir, info.name)
+            if path is None:
+                logger.warning(f"Skip {info.name} of {archive}, it leaves the archive.")
+                continue
+            with tar_file.extractfile(info) as source:
+                files.append((path, *_write_member(source, path, archive, budget)))
+    return files
+
+
+def _extract_7z(archive: str, extract_dir: str, budget: _Budget, timeout: float) -> list:
+    if SEVEN_ZIP is None:
+        raise UnsupportedArchive(f"7z is not installed to unpack {archive}")
+    # an empty password makes encrypted archives fail instead of prompting for one
+    listing = subprocess.run(
+        [SEVEN_ZIP, "l", "-slt", "-ba", "-p", archive],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        check=True,
+        stdin=subprocess.DEVNULL,
+    ).stdout
+    num_files = 0
+    declared_size = 0
+    for entry in listing.split("\n\n"):
+        fields = dict(
+            line.split(" = ", 1) for line in entry.splitlines() if " = " in line
+        )
+        if "Path" in fields and not fields.get("Attributes", "").startswith("D"):
+            num_files += 1
+            declared_size += int(fields.get("Size") or 0)
+    budget.admit(archive, num_files, declared_size)
+    subprocess.run(
+        [SEVEN_ZIP, "x", "-y", "-p", f"-o{extract_dir}", archive],
+        capture_output=True,
+        timeout=timeout,
+        check=True,
+        stdin=subprocess.DEVNULL,
+    )
+    files = []
+    for root, _, names in os.walk(extract_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.islink(path) or not os.path.isfile(path):
+                os.remove(path)
+                continue
+            checksums = _hash_file(path)
+            budget.consume(archive, checksums[-1])
+            budget.files -= 1
+            files.append((path, *checksums))
+    return files
+
+
+def _extract(
+    archive: str, extract_dir: str, budget: _Budget, limits: dict, depth: int
+) -> list:
+    kind = archive_type(archive)
+    if kind is None:
+        return None
+    if os.path.exists(extract_dir):
+        # left over by an interrupted run
+        shutil.rmtree(extract_dir)
+    os.makedirs(extract_dir)
+    if kind == "zip":
+        files = _extract_zip(archive, extract_dir, budget)
+    elif kind == "tar":
+        files = _extract_tar(archive, extract_dir, budget)
+    else:
+        files = _extract_7z(archive, extract_dir, budget, limits["timeout"])
+    if depth < limits["max_depth"]:
+        for path, *_ in list(files):
+            if archive_type(path) is not None:
+                try:
+                    files += _extract(
+                        path, f"{path}.extracted", budget, limits, depth + 1
+                    ) or []
+                except ArchiveLimitExceeded:
+                    raise
+                except Exception as e:
+                    # e.g. a firmware image that merely looks like an archive, it is kept as file
+                    logger.debug(f"Could not unpack nested archive {path}: {e}")
+    return files
+
+
+def unpack_archive(path: str, extract_dir: str, limits: dict = None) -> list:
+    """Unpack an archive and all archives nested in it
+
+    Args:
+        path (str): archive to unpack
+        extract_dir (str): directory to unpack into, replaced if it exists
+        limits (dict, optional): limits of the extraction, see UNPACK_DEFAULTS. Defaults to None.
+
+    Raises:
+        ArchiveLimitExceeded: if the archive exceeds a limit, nothing is left in extract_dir then
+        UnsupportedArchive: if the archive is a 7z archive and 7z is not installed
+
+    Returns:
+        list: tuples (file_path, md5, sha1, sha256, size) of the unpacked files, None if path is no
+            archive
+    """
+    limits = {**UNPACK_DEFAULTS, **(limits or {})}
+    extract_dir = os.path.abspath(extract_dir)
+    try:
+        return _extract(path, extract_dir, _Budget(limits), limits, depth=1)
+    except BaseException:
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        raise
+
+
+class Unpacker:
+    def __init__(self, workers: int = 2, limits: dict = None):
+        """Pool of processes to unpack archives with
+
+        Args:
+            workers (int, optional): number of worker processes. Defaults to 2.
+            limits (dict, optional): limits of every archive, see UNPACK_DEFAULTS. Defaults to None.
+        """
+        self.limits = {**UNPACK_DEFAULTS, **(limits or {})}
+        # forked workers would inherit the locks and connections of the scraper threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Unpacker":
+        """Create an unpacker from the "unpack" settings in config.json
+
+        Args:
+            config (dict): content of config.json
+
+        Returns:
+            Unpacker: unpacker with the configured limits, None if unpacking is disabled
+        """
+        settings = {**UNPACK_DEFAULTS, **(config.get("unpack") or {})}
+        if not settings.pop("enabled", False):
+            return None
+        return cls(workers=int(settings.pop("workers")), limits=settings)
+
+    def unpack_all(self, jobs: list):
+        """Unpack archives concurrently and yield them as they finish
+
+        Args:
+            jobs (list): tuples (key, path, extract_dir)
+
+        Yields:
+            tuple: (key, path, extract_dir, list of unpack_archive() or None, exception or None)
+        """
+        futures = {
+            self._executor.submit(unpack_archive, path, extract_dir, self.limits): (
+                key,
+                path,
+                extract_dir,
+            )
+            for key, path, extract_dir in jobs
+        }
+        for future in as_completed(futures):
+            key, path, extract_dir = futures[future]
+            error = future.exception()
+            result = None if error else future.result()
+            yield key, path, extract_dir, result, error
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
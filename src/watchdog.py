@@ -0,0 +1,144 @@
+"""
+Module to enforce per-vendor budgets on a running scrape.
+
+Budgets are configured per vendor in config.json:
+- "max_runtime": max. number of seconds a vendor may scrape
+- "max_pages": max. number of pages a vendor may load with driver.get()
+- "page_timeout": max. number of seconds to wait for a single page load
+
+When a budget is exceeded, the watchdog requests a stop: the core stops consuming the catalog,
+keeps everything scraped so far and continues with comparing. If the scraper is stuck inside the
+browser (e.g. waiting for an element) and does not return within the grace period, the watchdog
+quits its driver, which makes all pending WebDriver calls fail.
+"""
+import threading
+import time
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.support.events import (
+    AbstractEventListener,
+    EventFiringWebDriver,
+)
+
+from src.browser import quit_driver
+from src.logger import get_logger
+
+logger = get_logger()
+
+
+class BudgetExceeded(WebDriverException):
+    """Raised on page loads after the page budget of a vendor is used up"""
+
+
+class _PageCounter(AbstractEventListener):
+    def __init__(self, watchdog: "Watchdog"):
+        self.watchdog = watchdog
+
+    def before_navigate_to(self, url, driver):
+        self.watchdog.count_page(url)
+
+
+class Watchdog:
+    def __init__(
+        self,
+        vendor_name: str,
+        driver,
+        max_runtime: float = None,
+        max_pages: int = None,
+        page_timeout: float = None,
+        grace_period: float = 60.0,
+    ):
+        """Watchdog enforcing the budgets of a single vendor scrape
+
+        Args:
+            vendor_name (str): name of the vendor
+            driver: WebDriver of the vendor
+            max_runtime (float, optional): max. runtime in seconds. Defaults to None (unlimited).
+            max_pages (int, optional): max. number of page loads. Defaults to None (unlimited).
+            page_timeout (float, optional): page load timeout in seconds. Defaults to None (selenium default).
+            grace_period (float, optional): seconds to wait for the scraper to return after a stop was
+                requested, before its driver is quit. Defaults to 60.0.
+        """
+        self.vendor_name = vendor_name
+        self.driver = driver
+        self.max_runtime = max_runtime
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self.grace_period = grace_period
+
+        self.pages = 0
+        self.reason = None
+        self.start_time = None
+        self._stop_event = threading.Event()
+        self._done_event = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(
+        cls, vendor_name: str, driver, vendor_config: dict
+    ) -> "Watchdog":
+        """Create watchdog from the config.json entry of a vendor"""
+        return cls(
+            vendor_name,
+            driver,
+            max_runtime=vendor_config.get("max_runtime", None),
+            max_pages=vendor_config.get("max_pages", None),
+            page_timeout=vendor_config.get("page_timeout", None),
+        )
+
+    def wrap_driver(self, driver):
+        """Apply page timeout and return driver that counts page loads. Pass the result to the scraper."""
+        if self.page_timeout:
+            driver.set_page_load_timeout(self.page_timeout)
+            driver.set_script_timeout(self.page_timeout)
+        return EventFiringWebDriver(driver, _PageCounter(self))
+
+    def start(self):
+        """Start measuring the runtime of the vendor"""
+        self.start_time = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name=f"watchdog-{self.vendor_name}", daemon=True
+        )
+        self._thread.start()
+
+    def finish(self):
+        """Stop the watchdog after the vendor returned"""
+        self._done_event.set()
+
+    def stopped(self) -> bool:
+        """True if a budget is exceeded and the vendor should stop"""
+        return self._stop_event.is_set()
+
+    def request_stop(self, reason: str):
+        if self._stop_event.is_set():
+            return
+        self.reason = reason
+        self._stop_event.set()
+        logger.warning(
+            f"Stop {self.vendor_name}: {reason}. Keep products scraped so far."
+        )
+
+    def count_page(self, url: str):
+        self.pages += 1
+        if self.max_pages and self.pages > self.max_pages:
+            self.request_stop(f"page budget of {self.max_pages} pages exceeded")
+            raise BudgetExceeded(f"Page budget exceeded, not loading {url}")
+
+    def _run(self):
+        while not self._done_event.wait(timeout=1):
+            if (
+                self.max_runtime
+                and time.monotonic() - self.start_time > self.max_runtime
+            ):
+                self.request_stop(
+                    f"runtime budget of {self.max_runtime} seconds exceeded"
+                )
+            if self._stop_event.is_set():
+                break
+
+        if self._done_event.wait(timeout=self.grace_period):
+            return
+        logger.warning(
+            f"{self.vendor_name} did not stop within {self.grace_period} seconds. Quit its browser."
+        )
+        quit_driver(self.driver)
@@ -0,0 +1,176 @@
+"""
+Module to run vendor scrapers in isolated worker processes.
+
+Every vendor runs in its own process (and process group, which includes its chromedriver and Chrome),
+so that a hung chromedriver, a crashed browser or a memory leak only affects that vendor.
+The parent process
+- runs at most max_parallel_vendors workers at the same time
+- kills the whole process group of a worker that exceeds worker_timeout or worker_memory_limit_mb
+- kills what is left of the process group of a finished worker, and the process groups of all running
+  workers if it stops itself (e.g. on Ctrl-C)
+- collects the result and exit status of every worker
+"""
+import multiprocessing
+import os
+import signal
+import time
+
+from src import Vendors
+from src.logger import get_logger
+from src.run_report import RunReport
+
+logger = get_logger()
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _run_vendor(vendor: str, max_products: int, config: dict, result_queue):
+    """Entry point of a worker process"""
+    # own process group, so that the parent can kill chromedriver and Chrome together with the worker
+    os.setsid()
+
+    # import here, src.core imports this module
+    from src.core import scrape_vendor
+
+    report = RunReport()
+    success = scrape_vendor(vendor, max_products, config, report)
+    result_queue.put((vendor, success, report.vendors))
+
+
+def _process_group_rss(pgid: int) -> int:
+    """Return resident memory in bytes of all processes in process group pgid (Linux only)"""
+    rss = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as stat_file:
+                # the process name may contain spaces, the remaining fields start after its closing bracket
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+            if int(fields[2]) != pgid:
+                continue
+            with open(f"/proc/{pid}/statm") as statm_file:
+                rss += int(statm_file.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+    return rss
+
+
+def _kill_process_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.join(timeout=10)
+
+
+def run_vendor_processes(
+    vendor_and_max_products: list,
+    max_parallel_vendors: int = 1,
+    config: dict = None,
+    on_vendor_scraped=None,
+    report: RunReport = None,
+) -> dict:
+    """Scrape every vendor in its own worker process.
+
+    Args:
+        vendor_and_max_products (list): list of tuples (vendor classname, max_products)
+        max_parallel_vendors (int, optional): max. number of concurrent worker processes. Defaults to 1.
+        config (dict, optional): content of config.json. Defaults to None.
+        on_vendor_scraped (callable, optional): called with (vendor classname, success) as soon as
+            a worker is finished. Defaults to None.
+        report (RunReport, optional): report to merge the reports of the workers into. Defaults to None.
+
+    Returns:
+        dict: vendor classname -> True if scraping and comparing was successful
+    """
+    config = config or {}
+    report = report or RunReport()
+    max_parallel_vendors = max(1, int(max_parallel_vendors or 1))
+    timeout = config.get("worker_timeout", None)
+    memory_limit_mb = config.get("worker_memory_limit_mb", None)
+
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    pending = list(vendor_and_max_products)
+    running = {}  # vendor -> (process, start time)
+    results = {}
+    reported = {}
+
+    def collect(vendor, success, vendor_reports):
+        reported[vendor] = success
+        report.merge(vendor_reports)
+
+    def finish(vendor, exitcode, reason=None):
+        success = reported.pop(vendor, False)
+        results[vendor] = success
+        if reason:
+            logger.error(f"Killed worker of {vendor}: {reason}.")
+        elif exitcode != 0:
+            logger.error(f"Worker of {vendor} exited with status {exitcode}.")
+        if reason or exitcode != 0:
+            vendor_name = getattr(Vendors, vendor).name
+            report.count(vendor_name, "failures")
+            report.set_status(vendor_name, "killed" if reason else "crashed")
+        logger.important(
+            f"Finished {vendor} ({len(results)}/{len(vendor_and_max_products)})."
+        )
+        if on_vendor_scraped:
+            on_vendor_scraped(vendor, success)
+
+    logger.important(
+        f"Scrape {len(pending)} vendors in up to {max_parallel_vendors} worker processes."
+    )
+    try:
+        while pending or running:
+            # start new workers
+            while pending and len(running) < max_parallel_vendors:
+                vendor, max_products = pending.pop(0)
+                process = ctx.Process(
+                    target=_run_vendor,
+                    args=(vendor, max_products, config, result_queue),
+                    name=f"worker-{vendor}",
+                )
+                process.start()
+                running[vendor] = (process, time.monotonic())
+                logger.info(f"Started worker of {vendor} (pid {process.pid}).")
+
+            time.sleep(1)
+
+            # collect results
+            while not result_queue.empty():
+                collect(*result_queue.get())
+
+            # reap finished workers, kill workers over budget
+            for vendor, (process, start_time) in list(running.items()):
+                if not process.is_alive():
+                    process.join()
+                    # the worker may have exited right after putting its result
+                    while not result_queue.empty():
+                        collect(*result_queue.get())
+                    # chromedriver or Chrome may have outlived the worker
+                    _kill_process_group(process)
+                    del running[vendor]
+                    finish(vendor, process.exitcode)
+                    continue
+
+                reason = None
+                if timeout and time.monotonic() - start_time > timeout:
+                    reason = f"timeout of {timeout} seconds exceeded"
+                elif (
+                    memory_limit_mb
+                    and _process_group_rss(process.pid) > memory_limit_mb * 2**20
+                ):
+                    reason = f"memory limit of {memory_limit_mb} MB exceeded"
+                if reason:
+                    _kill_process_group(process)
+                    del running[vendor]
+                    finish(vendor, process.exitcode, reason)
+    finally:
+        # the workers run in their own process groups, so Ctrl-C or an error of the parent does not
+        # reach them and their browsers
+        for vendor, (process, _) in running.items():
+            logger.error(f"Kill worker of {vendor}, the parent process stops.")
+            _kill_process_group(process)
+
+    return results
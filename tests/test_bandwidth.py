@@ -0,0 +1,62 @@
+import json
+import os
+import time
+
+from src import Vendors
+from src.bandwidth import MB, BandwidthLimiter, TokenBucket
+
+
+def test_bucket_limits_average_rate():
+    bucket = TokenBucket(rate=1000)
+    start = time.monotonic()
+    # the first second worth of tokens is a burst, the rest has to wait
+    for _ in range(15):
+        bucket.consume(100)
+    assert 0.4 < time.monotonic() - start < 0.8
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket()
+    start = time.monotonic()
+    bucket.consume(10 * MB)
+    assert time.monotonic() - start < 0.1
+
+
+def test_limits_are_reloaded_when_config_changes(tmp_path):
+    config_path = tmp_path / "config.json"
+    config = {
+        "bandwidth": {"global_mb_per_s": None, "per_host_mb_per_s": 2},
+        "vendors": [
+            {"name": "Zyxel", "class_name": "ZyxelScraper", "download_mb_per_s": None}
+        ],
+    }
+    config_path.write_text(json.dumps(config))
+    limiter = BandwidthLimiter.from_config(config, str(config_path))
+    limiter.reload_interval = 0
+    limiter.throttle(1, host="example.com", vendor="ZyxelScraper")
+    assert limiter.vendor_rate("ZyxelScraper") is None
+
+    config["bandwidth"]["global_mb_per_s"] = 10
+    config["vendors"][0]["download_mb_per_s"] = 1
+    config_path.write_text(json.dumps(config))
+    os.utime(config_path, (time.time() + 10, time.time() + 10))
+    limiter.throttle(1, host="example.com", vendor="ZyxelScraper")
+
+    assert limiter.global_bucket.rate == 10 * MB
+    assert limiter.vendor_rate("ZyxelScraper") == MB
+    assert limiter._vendor_buckets["ZyxelScraper"].rate == MB
+    assert limiter._host_buckets["example.com"].rate == 2 * MB
+
+
+def test_vendor_limits_of_config_apply_to_the_scraper_classes():
+    with open("src/config.json") as config_file:
+        config = json.load(config_file)
+    config["vendors"] = [
+        {**vendor, "download_mb_per_s": i + 1} for i, vendor in enumerate(config["vendors"])
+    ]
+    limiter = BandwidthLimiter.from_config(config)
+
+    # the scrapers are looked up by class, e.g. "Foscam" is FoscamScraper with the name "foscam"
+    for i, vendor in enumerate(config["vendors"]):
+        scraper = getattr(Vendors, vendor["class_name"])
+        assert limiter.vendor_rate(scraper.__name__) == (i + 1) * MB
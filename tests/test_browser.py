@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from src import browser
+
+
+@pytest.fixture(autouse=True)
+def reset_resolver(monkeypatch, tmp_path):
+    monkeypatch.setattr(browser, "_chromedriver_path", None)
+    monkeypatch.setattr(
+        browser, "CHROMEDRIVER_CACHE_FILE", str(tmp_path / "chromedriver.json")
+    )
+    monkeypatch.setattr(
+        browser, "PREINSTALLED_CHROMEDRIVER", str(tmp_path / "missing")
+    )
+    monkeypatch.delenv("CHROMEDRIVER_PATH", raising=False)
+
+
+def _fail_install(*args, **kwargs):
+    raise AssertionError("ChromeDriverManager must not be called")
+
+
+def test_preinstalled_chromedriver_is_used(monkeypatch, tmp_path):
+    preinstalled = tmp_path / "chromedriver"
+    preinstalled.touch()
+    monkeypatch.setattr(browser, "PREINSTALLED_CHROMEDRIVER", str(preinstalled))
+    monkeypatch.setattr(browser.ChromeDriverManager, "install", _fail_install)
+
+    assert browser.get_chromedriver_path() == str(preinstalled)
+
+
+def test_cached_chromedriver_is_used_offline(monkeypatch, tmp_path):
+    cached = tmp_path / "cached_chromedriver"
+    cached.touch()
+    with open(browser.CHROMEDRIVER_CACHE_FILE, "w") as cache_file:
+        json.dump({"110.0.5481.77": str(cached)}, cache_file)
+    monkeypatch.setattr(browser, "get_chrome_version", lambda: "110.0.5481.77")
+    monkeypatch.setattr(browser.ChromeDriverManager, "install", _fail_install)
+
+    assert browser.get_chromedriver_path() == str(cached)
+
+
+def test_chromedriver_is_resolved_once(monkeypatch, tmp_path):
+    installed = tmp_path / "installed_chromedriver"
+    installed.touch()
+    calls = []
+
+    def install(self):
+        calls.append(1)
+        return str(installed)
+
+    monkeypatch.setattr(browser, "get_chrome_version", lambda: "110.0.5481.77")
+    monkeypatch.setattr(browser.ChromeDriverManager, "install", install)
+
+    assert browser.get_chromedriver_path() == str(installed)
+    assert browser.get_chromedriver_path() == str(installed)
+    assert len(calls) == 1
+    with open(browser.CHROMEDRIVER_CACHE_FILE) as cache_file:
+        assert json.load(cache_file) == {"110.0.5481.77": str(installed)}
+
+
+def test_lean_profile_options():
+    options = browser.get_chrome_options(headless=True, profile="lean")
+    assert options.page_load_strategy == "eager"
+    assert "--headless" in options.arguments
+    assert (
+        options.experimental_options["prefs"][
+            "profile.managed_default_content_settings.images"
+        ]
+        == 2
+    )
+
+
+def test_default_profile_options():
+    options = browser.get_chrome_options()
+    assert options.page_load_strategy == "normal"
+    assert "prefs" not in options.experimental_options
@@ -0,0 +1,42 @@
+import hashlib
+import os
+
+from src.content_store import ContentStore
+
+FIRMWARE = b"firmware image"
+SHA256 = hashlib.sha256(FIRMWARE).hexdigest()
+
+
+def test_first_download_becomes_blob(tmp_path):
+    store = ContentStore(str(tmp_path / ".store"))
+    path = tmp_path / "1_fw.bin"
+    path.write_bytes(FIRMWARE)
+
+    assert not store.add(str(path), SHA256)
+    assert store.has(SHA256)
+    assert os.path.samefile(path, store.blob_path(SHA256))
+
+
+def test_duplicate_download_is_hardlinked(tmp_path):
+    store = ContentStore(str(tmp_path / ".store"))
+    first, second = tmp_path / "1_fw.bin", tmp_path / "2_fw.bin"
+    first.write_bytes(FIRMWARE)
+    second.write_bytes(FIRMWARE)
+    store.add(str(first), SHA256)
+
+    assert store.add(str(second), SHA256)
+    assert os.path.samefile(first, second)
+    assert os.stat(store.blob_path(SHA256)).st_nlink == 3
+
+
+def test_stored_blob_is_linked_by_scraped_checksum(tmp_path):
+    store = ContentStore(str(tmp_path / ".store"))
+    first = tmp_path / "1_fw.bin"
+    first.write_bytes(FIRMWARE)
+    store.add(str(first), SHA256)
+
+    # scraped checksums may be upper case, MD5 checksums are never in the store
+    assert store.has(SHA256.upper())
+    assert not store.has(hashlib.md5(FIRMWARE).hexdigest())
+    store.link(SHA256.upper(), str(tmp_path / "2_fw.bin"))
+    assert (tmp_path / "2_fw.bin").read_bytes() == FIRMWARE
@@ -0,0 +1,688 @@
+import hashlib
+import os
+import threading
+import zipfile
+from contextlib import contextmanager
+
+import pytest
+
+from src.checkpoint import Checkpoint
+from src.content_store import ContentStore
+from src.core import Core, download_vendor, run_pipeline, scrape_vendors
+from src.downloader import DiskBudget, DownloadResult, _new_hashes
+from src.logger import get_logger
+from src.run_report import RunReport
+from src.unpacker import Unpacker
+from src.Vendors.scraper import Scraper
+from src.watchdog import Watchdog
+
+
+class FakeDB:
+    """In-memory replacement for DBConnector"""
+
+    has_natural_key = True
+
+    def __init__(self):
+        self.tables = {}
+
+    def ensure_natural_key(self):
+        return self.has_natural_key
+
+    @contextmanager
+    def transaction(self):
+        yield None
+
+    def create_table(self, table):
+        self.tables.setdefault(table, [])
+
+    def drop_table(self, table):
+        self.tables.pop(table, None)
+
+    def insert_products(self, product_list, table="products"):
+        self.tables[table].append(list(product_list))
+
+    def upsert_products(self, product_list, table="products"):
+        products = self.tables.setdefault(table, {})
+        num_new = 0
+        for product in product_list:
+            if product["product_name"] not in products:
+                products[product["product_name"]] = product
+                num_new += 1
+        return num_new
+
+    def get_products_to_download(
+        self, manufacturer, table="products", downloaded=False
+    ):
+        return [
+            product
+            for product in PRODUCTS
+            if (product[3] is not None) == downloaded
+        ]
+
+    def enqueue_downloads(self, manufacturer, table="products"):
+        queue = self.tables.setdefault("queue", {})
+        for product in self.get_products_to_download(manufacturer):
+            queue.setdefault(
+                product[0], {"attempts": 0, "due": True, "leased": False}
+            )
+
+    def claim_downloads(self, manufacturer, owner, limit=500, lease_seconds=3600):
+        queue = self.tables["queue"]
+        due = [
+            id for id, job in queue.items() if job["due"] and not job["leased"]
+        ][:limit]
+        for id in due:
+            queue[id]["leased"] = True
+        return [
+            (*product, queue[product[0]]["attempts"])
+            for product in PRODUCTS
+            if product[0] in due
+        ]
+
+    def fail_downloads(self, failures, retry_base_seconds, retry_max_seconds):
+        for id, _ in failures:
+            job = self.tables["queue"].get(id)
+            if job is not None:
+                job.update(attempts=job["attempts"] + 1, due=False, leased=False)
+
+    def release_downloads(self, product_ids):
+        for id in product_ids:
+            self.tables["queue"][id]["leased"] = False
+
+    def get_download_validators(self, manufacturer, table="products"):
+        return {id: {"etag": f'"{id}"'} for id in (20, 21)}
+
+    def set_downloaded_files(self, downloads, table="products"):
+        self.tables.setdefault("downloads", []).append(list(downloads))
+        for id, *_ in downloads:
+            self.tables.get("queue", {}).pop(id, None)
+
+    def set_download_validators(self, validators):
+        self.tables.setdefault("validators", []).append(list(validators))
+
+    def get_products_to_unpack(self, manufacturer, table="products"):
+        return self.tables.get("to_unpack", [])
+
+    def set_unpacked_archives(self, archives):
+        self.tables.setdefault("unpacked", []).extend(archives)
+
+    def link_unpacked_archives(self, products):
+        self.tables.setdefault("linked", []).extend(products)
+
+
+class FakeDownloadEngine:
+    """Downloads every job instantly, except for product 3.
+
+    Jobs with validators are answered with 304 Not Modified.
+    """
+
+    def __init__(self, disk_budget=None, sizes=None, html=()):
+        self.disk_budget = disk_budget
+        self.sizes = sizes or {}
+        self.html = html
+        self.downloaded = []
+        self.requests = {}
+
+    def probe_all(self, jobs, resolved=None):
+        for id, url, save_as in jobs:
+            info = {
+                "etag": None,
+                "last_modified": None,
+                "content_length": self.sizes.get(id, 8),
+                "content_type": "text/html" if id in self.html else None,
+            }
+            yield id, url, save_as, info, None
+
+    def download_all(self, jobs, validators=None, vendor=None, resolved=None):
+        self.downloaded.extend(id for id, _, _ in jobs)
+        self.requests.update(resolved or {})
+        validators = validators or {}
+        for id, url, save_as in jobs:
+            if id == 3:
+                yield id, url, save_as, None, RuntimeError("connection reset")
+            elif validators.get(id):
+                result = DownloadResult(0, None, None, modified=False, status=304)
+                yield id, url, save_as, result, None
+            else:
+                with open(save_as, "wb") as file:
+                    file.write(b"firmware")
+                result = DownloadResult(
+                    8,
+                    8,
+                    _new_hashes(),
+                    {"etag": f'"{id}"'},
+                    status=200,
+                    ttfb=0.1,
+                    duration=0.5,
+                )
+                yield id, url, save_as, result, None
+
+
+EMPTY_SHA256 = _new_hashes()["sha256"].hexdigest()
+
+# products 20 to 24 are already downloaded, only 20 and 21 have validators, 23 and 24 a checksum
+PRODUCTS = [
+    (
+        id,
+        f"product {id}",
+        f"http://example.com/fw{id}.bin",
+        f"/downloads/{id}_fw{id}.bin" if id >= 20 else None,
+        None,
+        {23: "0" * 64, 24: EMPTY_SHA256}.get(id),
+    )
+    for id in range(25)
+]
+
+
+class FakeScraper:
+    name = "FakeVendor"
+
+    def __init__(self, num_products, fail_after=None):
+        self.num_products = num_products
+        self.fail_after = fail_after
+
+    def iter_metadata(self):
+        for i in range(self.num_products):
+            if i == self.fail_after:
+                raise RuntimeError("browser crashed")
+            yield {"product_name": f"product {i}"}
+
+
+@pytest.fixture
+def core(monkeypatch):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    return Core(logger=get_logger(), flush_batch_size=10, flush_interval=60)
+
+
+def test_catalog_is_flushed_in_batches(core):
+    core.set_current_vendor(FakeScraper(25))
+    assert core.get_product_catalog()
+    assert [len(batch) for batch in core.db.tables["FakeVendor"]] == [10, 10, 5]
+
+
+def test_catalog_is_kept_on_scraper_crash(core):
+    core.set_current_vendor(FakeScraper(25, fail_after=13))
+    assert core.get_product_catalog()
+    assert [len(batch) for batch in core.db.tables["FakeVendor"]] == [10, 3]
+
+
+def test_catalog_fails_without_products(core):
+    core.set_current_vendor(FakeScraper(25, fail_after=0))
+    assert not core.get_product_catalog()
+
+
+class FakeCheckpointScraper(FakeScraper):
+    supports_checkpoints = True
+    checkpoint = None
+
+    def set_checkpoint(self, checkpoint):
+        self.checkpoint = checkpoint
+
+    def iter_metadata(self):
+        for i in range(self.num_products):
+            if self.checkpoint.is_done(str(i)):
+                continue
+            if i == self.fail_after:
+                raise RuntimeError("browser crashed")
+            yield {"product_name": f"product {i}"}
+            self.checkpoint.mark_done(str(i))
+
+
+def test_aborted_scrape_is_resumed(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    core = Core(
+        logger=get_logger(),
+        flush_batch_size=10,
+        flush_interval=60,
+        checkpoint_dir=str(tmp_path),
+    )
+
+    core.set_current_vendor(FakeCheckpointScraper(25, fail_after=13))
+    assert core.get_product_catalog()
+    assert not core.catalog_complete
+    assert core.checkpoint.exists()
+    assert core.checkpoint.flushed == 13
+
+    core.set_current_vendor(FakeCheckpointScraper(25))
+    assert core.get_product_catalog()
+    assert core.catalog_complete
+    scraped = [
+        product["product_name"]
+        for batch in core.db.tables["FakeVendor"]
+        for product in batch
+    ]
+    assert scraped == [f"product {i}" for i in range(25)]
+
+
+class FailingInsertDB(FakeDB):
+    """Loses the connection after the first batch"""
+
+    def insert_products(self, product_list, table="products"):
+        if self.tables[table]:
+            raise ConnectionError("MySQL server has gone away")
+        super().insert_products(product_list, table)
+
+
+def test_checkpoint_does_not_advance_on_failed_insert(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.core.DBConnector", FailingInsertDB)
+    core = Core(
+        logger=get_logger(),
+        flush_batch_size=10,
+        flush_interval=60,
+        checkpoint_dir=str(tmp_path),
+    )
+
+    core.set_current_vendor(FakeCheckpointScraper(25))
+    # the partial catalog is not compared
+    assert not core.get_product_catalog()
+
+    counters = core.report.to_dict()["vendors"]["FakeVendor"]["counters"]
+    assert counters["records_produced"] == 10
+    assert counters["records_not_inserted"] == 10
+    checkpoint = Checkpoint.load(str(tmp_path), "FakeVendor")
+    assert checkpoint.flushed == 10
+    assert checkpoint.done and all(int(key) < 10 for key in checkpoint.done)
+
+
+def test_scrape_stops_when_budget_is_exceeded(core):
+    watchdog = Watchdog("FakeVendor", driver=None, max_pages=12)
+    scraper = FakeScraper(25)
+
+    def iter_metadata():
+        for i in range(scraper.num_products):
+            watchdog.count_page(f"https://example.com/{i}")
+            yield {"product_name": f"product {i}"}
+
+    scraper.iter_metadata = iter_metadata
+    core.set_current_vendor(scraper)
+    assert core.get_product_catalog(watchdog=watchdog)
+    assert not core.catalog_complete
+    assert [len(batch) for batch in core.db.tables["FakeVendor"]] == [10, 2]
+
+
+class FakeListScraper(Scraper):
+    """Returns its whole catalog at once, like most vendor scrapers"""
+
+    name = "FakeVendor"
+
+    def __init__(self, watchdog):
+        self.watchdog = watchdog
+
+    def scrape_metadata(self):
+        products = []
+        for i in range(50):
+            if i == 5:
+                # the budget runs out while the scraper is still running
+                self.watchdog.request_stop("runtime budget exceeded")
+            products.append({"product_name": f"product {i}"})
+        return products
+
+
+def test_returned_catalog_is_kept_when_budget_is_exceeded(core):
+    watchdog = Watchdog("FakeVendor", driver=None)
+    core.set_current_vendor(FakeListScraper(watchdog))
+    assert core.get_product_catalog(watchdog=watchdog)
+    assert not core.catalog_complete
+    assert sum(len(batch) for batch in core.db.tables["FakeVendor"]) == 50
+
+
+def test_downloads_are_stored_in_batches(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    core = Core(
+        logger=get_logger(),
+        flush_batch_size=10,
+        download_engine=FakeDownloadEngine(),
+    )
+    core.set_current_vendor(FakeScraper)
+    core.download_firmware(str(tmp_path))
+
+    batches = core.db.tables["downloads"]
+    # the failure of product 3 counts towards the first batch
+    assert [len(batch) for batch in batches] == [9, 10]
+    id, file_path, md5, sha1, sha256, size = batches[0][0]
+    assert file_path == str(tmp_path / "FakeVendor" / f"{id}_fw{id}.bin")
+    assert sha256 == EMPTY_SHA256
+    # probe results of all 20 products, then the downloads
+    assert [len(batch) for batch in core.db.tables["validators"]] == [20, 9, 10]
+    # every product keeps its own validators, even if it shares its link with another one
+    assert [validator[0] for validator in core.db.tables["validators"][0]] == list(range(20))
+    assert core.report.vendors["FakeVendor"]["counters"]["failures"] == 1
+    metrics = core.report.downloads.summary()["hosts"]["example.com"]
+    assert metrics["files"] == 20 and metrics["failures"] == 1
+    assert metrics["status"] == {"200": 19, "None": 1}
+    assert metrics["throughput_mb_per_s"]["p50"] == 0.0
+
+
+def test_refresh_keeps_changed_files_as_new_version(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    core = Core(
+        logger=get_logger(),
+        download_engine=FakeDownloadEngine(),
+        refresh_downloads=True,
+    )
+    core.set_current_vendor(FakeScraper)
+    core.download_firmware(str(tmp_path))
+
+    counters = core.report.vendors["FakeVendor"]["counters"]
+    assert counters["not_modified"] == 2
+    # 24 has the checksum of the downloaded content
+    assert counters["unchanged"] == 1
+    assert counters["changed"] == 1
+    # 22 was downloaded before checksums were stored, its file is replaced in place
+    assert counters["baselined"] == 1
+    file_paths = {id: path for id, path, *_ in core.db.tables["downloads"][0]}
+    assert file_paths[22] == str(tmp_path / "FakeVendor" / "22_fw22.bin")
+    assert file_paths[23] == str(
+        tmp_path / "FakeVendor" / f"23_fw23_{EMPTY_SHA256[:12]}.bin"
+    )
+    assert 24 not in file_paths
+    assert not any(name.endswith(".refresh") for name in os.listdir(tmp_path / "FakeVendor"))
+
+
+def test_preflight_orders_and_admits_downloads(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    engine = FakeDownloadEngine(
+        disk_budget=DiskBudget(str(tmp_path), budget_bytes=1100),
+        sizes={5: 900, 6: 300},
+        html=(8,),
+    )
+    core = Core(
+        logger=get_logger(), download_engine=engine, download_order="largest_first"
+    )
+    core.set_current_vendor(FakeScraper)
+    core.download_firmware(str(tmp_path))
+
+    # 5 is admitted first and leaves room for the 8 byte downloads only
+    assert engine.downloaded[0] == 5
+    assert 6 not in engine.downloaded and 8 not in engine.downloaded
+    assert len(engine.downloaded) == 18
+    counters = core.report.vendors["FakeVendor"]["counters"]
+    assert counters["deferred_disk"] == 1
+    assert counters["skipped_html"] == 1
+
+
+def test_failed_downloads_are_not_retried_in_the_same_run(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    engine = FakeDownloadEngine()
+    core = Core(
+        logger=get_logger(), download_engine=engine, download_queue={"claim_size": 5}
+    )
+    core.set_current_vendor(FakeScraper)
+    core.download_firmware(str(tmp_path))
+
+    # 20 pending products are claimed in 4 batches, product 3 fails once
+    assert sorted(engine.downloaded) == [id for id in range(20)]
+    assert core.db.tables["queue"] == {
+        3: {"attempts": 1, "due": False, "leased": False}
+    }
+
+
+def test_deferred_downloads_are_released(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    engine = FakeDownloadEngine(
+        disk_budget=DiskBudget(str(tmp_path), budget_bytes=40)
+    )
+    core = Core(
+        logger=get_logger(), download_engine=engine, download_queue={"claim_size": 10}
+    )
+    core.set_current_vendor(FakeScraper)
+    core.download_firmware(str(tmp_path))
+
+    # 5 downloads of 8 bytes fit, the claim loop stops at the first deferred batch
+    assert len(engine.downloaded) == 5
+    queue = core.db.tables["queue"]
+    # 15 deferred products and the failed product 3
+    assert len(queue) == 16
+    assert not any(job["leased"] for job in queue.values())
+
+
+def test_checksum_mismatches_are_quarantined(core, tmp_path):
+    vendor_dir = tmp_path / "FakeVendor"
+    vendor_dir.mkdir()
+    jobs = [
+        (id, f"http://example.com/fw{id}.bin", str(vendor_dir / f"{id}_fw{id}.bin"))
+        for id in (1, 2, 4)
+    ]
+    core.db.tables["queue"] = {id: {"attempts": 0} for id in (1, 2, 4)}
+    checksums = {1: EMPTY_SHA256, 2: "0" * 32, 4: None}
+    core._download_jobs(
+        "FakeVendor", FakeDownloadEngine(), jobs, checksums=checksums
+    )
+
+    assert os.listdir(tmp_path / ".quarantine" / "FakeVendor") == ["2_fw2.bin"]
+    assert sorted(os.listdir(vendor_dir)) == ["1_fw1.bin", "4_fw4.bin"]
+    assert core.db.tables["queue"][2]["attempts"] == 1
+    counters = core.report.vendors["FakeVendor"]["counters"]
+    assert counters["checksum_mismatches"] == 1
+    assert counters["checksums_verified"] == 1
+
+
+def test_stored_firmware_is_linked_by_scraped_md5(core, tmp_path):
+    firmware = tmp_path / "firmware.bin"
+    firmware.write_bytes(b"firmware")
+    checksums = {
+        name: hashlib.new(name, b"firmware").hexdigest() for name in ["md5", "sha1", "sha256"]
+    }
+    core.content_store = ContentStore(str(tmp_path / ".store"))
+    core.content_store.add(str(firmware), checksums["sha256"])
+    core.db.get_checksums = lambda checksum, algorithm: (
+        (*checksums.values(), 8) if checksums[algorithm] == checksum else None
+    )
+
+    save_as = str(tmp_path / "1_firmware.bin")
+    # vendors publish MD5 checksums, e.g. in upper case
+    assert core._link_stored_firmware(1, save_as, checksums["md5"].upper()) == (
+        1,
+        save_as,
+        *checksums.values(),
+        8,
+    )
+    assert os.path.samefile(save_as, firmware)
+    assert core._link_stored_firmware(2, save_as, "0" * 32) is None
+    assert core._link_stored_firmware(3, save_as, "see release notes") is None
+
+
+class FakeResolvingScraper:
+    """Resolves all links to a mirror, except for product 7"""
+
+    name = "FakeVendor"
+    resolves_downloads = True
+
+    def __init__(self):
+        self.browser_links = []
+
+    def resolve_download(self, download_link):
+        if download_link.endswith("fw7.bin"):
+            return None
+        url = download_link.replace("example.com", "mirror.example.com") + "?token=1"
+        return url, {"Referer": "http://example.com/"}, {"session": "1"}
+
+    def download_firmware(self, links):
+        self.browser_links.extend(links)
+
+
+def test_resolved_links_are_downloaded_by_the_engine(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    engine = FakeDownloadEngine()
+    scraper = FakeResolvingScraper()
+    core = Core(logger=get_logger(), download_engine=engine)
+    core.set_current_vendor(scraper)
+    core.download_firmware(str(tmp_path))
+
+    assert 7 not in engine.downloaded and len(engine.downloaded) == 19
+    assert engine.requests[1] == (
+        "http://mirror.example.com/fw1.bin?token=1",
+        {"Referer": "http://example.com/"},
+        {"session": "1"},
+    )
+    file_paths = {id: path for id, path, *_ in core.db.tables["downloads"][0]}
+    assert file_paths[1] == str(tmp_path / "FakeVendor" / "1_fw1.bin")
+    # the unresolved link is downloaded by the browser and retried later
+    assert scraper.browser_links == [(7, "http://example.com/fw7.bin")]
+    assert core.db.tables["queue"][7]["attempts"] == 1
+    counters = core.report.vendors["FakeVendor"]["counters"]
+    assert counters["resolved_downloads"] == 19
+    assert counters["browser_downloads"] == 1
+
+
+def test_archives_are_unpacked_once(core, tmp_path):
+    archive = tmp_path / "1_fw.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("fw/firmware.bin", b"firmware")
+    firmware = tmp_path / "3_fw.bin"
+    firmware.write_bytes(b"firmware")
+    # 2 has the same archive as 1, 4 the same as an archive unpacked in an earlier run
+    core.db.tables["to_unpack"] = [
+        (1, str(archive), "a" * 64, False),
+        (2, str(archive), "a" * 64, False),
+        (3, str(firmware), "b" * 64, False),
+        (4, str(archive), "c" * 64, True),
+    ]
+    core.set_current_vendor(FakeScraper)
+    with Unpacker(workers=1) as unpacker:
+        core.unpacker = unpacker
+        core.unpack_firmware()
+
+    unpacked = {id: rest for id, *rest in core.db.tables["unpacked"]}
+    assert sorted(unpacked) == [1, 3]
+    sha256, extract_dir, files, error = unpacked[1]
+    assert extract_dir == f"{archive}.extracted" and error is None
+    assert [file[:2] for file in files] == [
+        (
+            os.path.join("fw", "firmware.bin"),
+            os.path.join(extract_dir, "fw", "firmware.bin"),
+        )
+    ]
+    # the download that is no archive is recorded without files
+    assert unpacked[3] == ["b" * 64, None, [], None]
+    assert sorted(core.db.tables["linked"]) == [(2, "a" * 64), (4, "c" * 64)]
+    assert core.report.vendors["FakeVendor"]["counters"]["files_unpacked"] == 1
+
+
+def test_upsert_ingest_needs_no_temporary_table(monkeypatch):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    core = Core(logger=get_logger(), flush_batch_size=10, ingest_mode="upsert")
+    core.db.upsert_products([{"product_name": f"product {i}"} for i in range(5)])
+    core.set_current_vendor(FakeScraper(25))
+    assert core.get_product_catalog()
+    assert core.compare_products()
+
+    assert "FakeVendor" not in core.db.tables
+    assert len(core.db.tables["products"]) == 25
+    assert core.report.vendors["FakeVendor"]["counters"]["new_products"] == 20
+
+
+def test_upsert_ingest_falls_back_without_natural_key(monkeypatch):
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    monkeypatch.setattr(FakeDB, "has_natural_key", False)
+    core = Core(logger=get_logger(), ingest_mode="upsert")
+    assert core.ingest_mode == "temp_table"
+
+
+class FakeBrowserScraper(FakeScraper):
+    def __init__(self, max_products=None, driver=None):
+        self.driver = driver
+
+    def download_firmware(self, download_links):
+        pass
+
+
+def test_browser_is_started_only_for_custom_downloads(monkeypatch, tmp_path):
+    started = []
+    vendors = []
+    monkeypatch.setattr("src.core.DBConnector", FakeDB)
+    monkeypatch.setattr(
+        "src.core.create_driver", lambda **kwargs: started.append(kwargs) or "driver"
+    )
+    monkeypatch.setattr("src.core.quit_driver", lambda driver: None)
+    monkeypatch.setattr(
+        Core, "download_firmware", lambda self, _: vendors.append(self.current_vendor)
+    )
+    monkeypatch.setattr(Core, "unpack_firmware", lambda self: None)
+    monkeypatch.setattr("src.core.FakeScraper", FakeScraper, raising=False)
+    monkeypatch.setattr("src.core.FakeBrowserScraper", FakeBrowserScraper, raising=False)
+
+    # vendors downloaded by the core only need their class
+    assert download_vendor("FakeScraper", str(tmp_path))
+    assert started == [] and vendors == [FakeScraper]
+
+    assert download_vendor("FakeBrowserScraper", str(tmp_path))
+    assert len(started) == 1 and vendors[1].driver == "driver"
+
+    assert download_vendor("RockwellScraper", str(tmp_path)) is False
+    assert len(started) == 1 and len(vendors) == 2
+
+
+class FakeEngine:
+    bandwidth = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def test_pipeline_downloads_while_vendors_are_scraped(monkeypatch, tmp_path):
+    vendors = {"Fast": True, "Slow": True, "Broken": False}
+    for name in vendors:
+        monkeypatch.setattr(
+            f"src.core.{name}Scraper", type(f"{name}Scraper", (), {"name": name}), raising=False
+        )
+    downloading = threading.Event()
+    events = []
+
+    def scrape_vendor(vendor, max_products, config, report):
+        if vendor == "SlowScraper":
+            # only finishes once another vendor is being downloaded
+            assert downloading.wait(timeout=5)
+        events.append(f"scraped {vendor}")
+        return vendors[vendor.removesuffix("Scraper")]
+
+    def download_vendor(vendor, *args):
+        events.append(f"download {vendor}")
+        if vendor == "FastScraper":
+            downloading.set()
+        if vendor == "BrokenScraper":
+            raise RuntimeError("no connection to the database")
+        return True
+
+    monkeypatch.setattr("src.core.scrape_vendor", scrape_vendor)
+    monkeypatch.setattr("src.core.download_vendor", download_vendor)
+    monkeypatch.setattr("src.core.DownloadEngine.from_config", lambda config: FakeEngine())
+    report = RunReport()
+
+    results = run_pipeline(
+        [(f"{name}Scraper", None) for name in vendors],
+        str(tmp_path),
+        {"max_parallel_vendors": 3, "download_workers": 2},
+        report,
+    )
+
+    assert results == {"FastScraper": True, "SlowScraper": True, "BrokenScraper": False}
+    assert events.index("download FastScraper") < events.index("scraped SlowScraper")
+    assert sorted(event for event in events if event.startswith("download")) == [
+        "download BrokenScraper",
+        "download FastScraper",
+        "download SlowScraper",
+    ]
+    assert report.to_dict()["vendors"]["Broken"]["counters"] == {"failures": 1}
+
+
+def test_vendor_errors_do_not_stop_other_vendors(monkeypatch):
+    def scrape_vendor(vendor, max_products, config, report):
+        if vendor == "BrokenScraper":
+            raise RuntimeError("chromedriver crashed")
+        return vendor == "FastScraper"
+
+    monkeypatch.setattr("src.core.scrape_vendor", scrape_vendor)
+    scraped = []
+
+    results = scrape_vendors(
+        [(vendor, None) for vendor in ["BrokenScraper", "FastScraper", "EmptyScraper"]],
+        max_parallel_vendors=2,
+        on_vendor_scraped=lambda vendor, success: scraped.append((vendor, success)),
+    )
+
+    assert results == {"BrokenScraper": False, "FastScraper": True, "EmptyScraper": False}
+    assert sorted(scraped) == sorted(results.items())
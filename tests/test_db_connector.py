@@ -0,0 +1,210 @@
+import re
+
+import pytest
+
+from src import db_connector
+from src.db_connector import DBConnector
+
+
+class FakeConnection:
+    def __init__(self, log, pool=None):
+        self.log = log
+        self.pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.log)
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+    def close(self):
+        self.log.append("close")
+        if self.pool is not None:
+            self.pool.borrowed -= 1
+
+
+class FakeCursor:
+    rowcount = 1
+
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, query, data=()):
+        self.log.append("execute")
+
+    def executemany(self, query, data):
+        self.log.append("execute")
+
+    def fetchone(self):
+        # the products table has its natural key
+        return ("sha2(... `download_link` ...)", 0)
+
+
+class FakePool:
+    """Hands out connections until pool_size are borrowed"""
+
+    def __init__(self, pool_size, **kwargs):
+        self.pool_size = pool_size
+        self.borrowed = 0
+        self.log = []
+
+    def get_connection(self):
+        if self.borrowed >= self.pool_size:
+            raise db_connector.pooling.PoolError("pool exhausted")
+        self.borrowed += 1
+        return FakeConnection(self.log, self)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(db_connector, "_pools", {})
+    monkeypatch.setattr(db_connector, "_natural_key", {})
+    monkeypatch.setattr(db_connector.pooling, "MySQLConnectionPool", FakePool)
+    monkeypatch.setattr(
+        db_connector, "_get_pool_settings", lambda: {"pool_size": 2, "pool_timeout": 0}
+    )
+    monkeypatch.setattr(db_connector, "connect", lambda **kwargs: FakeConnection([]))
+    db = DBConnector()
+    db._get_pool().log.clear()
+    return db
+
+
+def test_connections_are_borrowed_from_one_pool(db):
+    assert db._get_pool() is DBConnector()._get_pool()
+    assert db._get_db_con() is not None and db._get_db_con() is not None
+    # the pool is exhausted and the timeout is 0
+    assert db._get_db_con() is None
+
+
+def test_transaction_spans_several_methods(db):
+    with db.transaction():
+        db.release_downloads([1])
+        db.fail_downloads([(2, "error")])
+    log = db._get_pool().log
+    assert log == ["execute", "execute", "commit", "close"]
+
+    log.clear()
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.release_downloads([1])
+            raise RuntimeError()
+    assert log == ["execute", "rollback", "close"]
+
+
+def test_natural_key_is_migrated_once_per_process(db, monkeypatch):
+    queries = []
+    # natural key of an earlier version, without the download link
+    monkeypatch.setattr(FakeCursor, "fetchone", lambda self: ("sha2(...)", 0))
+    monkeypatch.setattr(
+        FakeCursor, "execute", lambda self, query, data=(): queries.append(query)
+    )
+    monkeypatch.setattr(db_connector, "_natural_key", {})
+    # temp_table ingest never touches the products table
+    DBConnector()
+    assert not any("ALTER TABLE" in query for query in queries)
+
+    assert DBConnector().ensure_natural_key()
+    assert DBConnector().ensure_natural_key()
+
+    alters = [query.split()[3] for query in queries if "ALTER TABLE" in query]
+    assert alters == ["DROP", "ADD"]
+
+
+def test_first_failure_is_retried_after_the_base_delay(db, monkeypatch):
+    queries = []
+    monkeypatch.setattr(
+        FakeCursor, "executemany", lambda self, query, data: queries.append((query, data))
+    )
+    db.fail_downloads([(1, "error")], retry_base_seconds=600)
+
+    query, data = queries[0]
+    assignments = query.split("SET", 1)[1].split("WHERE", 1)[0]
+    # evaluate the assignments from left to right like MySQL
+    for value in data[0]:
+        assignments = assignments.replace("%s", repr(value), 1)
+    row = {"attempts": 0, "NULL": None}
+    for assignment in re.split(r",(?![^()]*\))", assignments):
+        column, expression = (part.strip() for part in assignment.split("=", 1))
+        expression = (
+            expression.replace("NOW() + INTERVAL", "")
+            .replace("SECOND", "")
+            .replace("LEAST", "min")
+            .replace("POW", "pow")
+        )
+        row[column] = eval(expression, {}, row)
+    assert row["attempts"] == 1
+    assert row["next_attempt_at"] == 600
+
+
+def test_failed_catalog_insert_is_raised(db, monkeypatch):
+    def executemany(self, query, data):
+        raise db_connector.mysql.connector.Error("MySQL server has gone away")
+
+    monkeypatch.setattr(FakeCursor, "executemany", executemany)
+    product = dict.fromkeys(
+        [
+            "manufacturer",
+            "product_name",
+            "product_type",
+            "version",
+            "release_date",
+            "download_link",
+            "checksum_scraped",
+            "additional_data",
+        ]
+    )
+    with pytest.raises(db_connector.mysql.connector.Error):
+        db.insert_products([product], table="FakeVendor")
+    assert db._get_pool().log == ["close"]
+
+
+def test_catalog_is_compared_by_the_natural_key(db, monkeypatch):
+    queries = []
+    monkeypatch.setattr(
+        FakeCursor, "execute", lambda self, query, data=(): queries.append(query)
+    )
+    db.insert_new_products("FakeVendor")
+    queries = [query for query in queries if "INSERT" in query]
+
+    # the same key as the unique index that upsert ingest relies on
+    assert db_connector._natural_key_expression() in db_connector.NATURAL_KEY_COLUMN
+    assert (
+        f"{db_connector._natural_key_expression('tmp')} = "
+        f"{db_connector._natural_key_expression('tmp2')}"
+    ) in queries[0]
+    # INSERT IGNORE would also store truncated or invalid values with a warning only
+    assert "IGNORE" not in queries[0] and "on duplicate key update" in queries[0]
+
+
+def test_deadlocked_compare_is_retried(db, monkeypatch):
+    queries = []
+
+    def execute(self, query, data=()):
+        queries.append(query)
+        if "INSERT" in query and len(queries) == 2:
+            raise db_connector.mysql.connector.errors.DatabaseError(
+                "Deadlock found when trying to get lock", errno=1213
+            )
+
+    monkeypatch.setattr(FakeCursor, "execute", execute)
+    monkeypatch.setattr(db_connector.time, "sleep", lambda seconds: None)
+    assert db.insert_new_products("FakeVendor") == 1
+
+    # every attempt reads the products table without locking it
+    assert [query.split()[0] for query in queries] == ["SET", "INSERT", "SET", "INSERT"]
+    assert "READ COMMITTED" in queries[2]
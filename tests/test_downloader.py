@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.downloader import (
+    DiskBudget,
+    DownloadEngine,
+    IncompleteDownload,
+    download_file,
+    probe_url,
+    verify_checksum,
+)
+
+FIRMWARE = os.urandom(3 * 1024 * 1024 + 17)
+
+active = Counter()
+max_active = Counter()
+active_lock = threading.Lock()
+range_requests = []
+
+
+class FirmwareHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/firmware.bin":
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(FIRMWARE)))
+            self.end_headers()
+            self.wfile.write(FIRMWARE)
+        elif self.path == "/truncated.bin":
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(FIRMWARE)))
+            self.end_headers()
+            self.wfile.write(FIRMWARE[:1000])
+        elif self.path == "/resumable.bin":
+            etag = '"v1"'
+            first_byte = 0
+            range_header = self.headers.get("Range")
+            if range_header and self.headers.get("If-Range") == etag:
+                first_byte = int(range_header[len("bytes=") : -1])
+            range_requests.append(range_header)
+            self.send_response(206 if first_byte else 200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(FIRMWARE) - first_byte))
+            if first_byte:
+                self.send_header(
+                    "Content-Range",
+                    f"bytes {first_byte}-{len(FIRMWARE) - 1}/{len(FIRMWARE)}",
+                )
+            self.end_headers()
+            if first_byte:
+                self.wfile.write(FIRMWARE[first_byte:])
+            else:
+                # the first attempt breaks off halfway
+                self.wfile.write(FIRMWARE[: len(FIRMWARE) // 2])
+        elif self.path == "/conditional.bin":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(FIRMWARE)))
+            self.end_headers()
+            self.wfile.write(FIRMWARE)
+        elif self.path.startswith("/slow/"):
+            host = self.headers["Host"]
+            with active_lock:
+                active[host] += 1
+                max_active[host] = max(max_active[host], active[host])
+            time.sleep(0.2)
+            with active_lock:
+                active[host] -= 1
+            self.send_response(200)
+            self.send_header("Content-Length", "4")
+            self.end_headers()
+            self.wfile.write(b"slow")
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FirmwareHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def test_download_is_streamed_to_disk(server, tmp_path):
+    save_as = tmp_path / "firmware.bin"
+    throttled = []
+    result = download_file(
+        f"{server}/firmware.bin",
+        str(save_as),
+        chunk_size=64 * 1024,
+        throttle=throttled.append,
+    )
+    assert result.num_bytes == result.size == len(FIRMWARE)
+    assert sum(throttled) == len(FIRMWARE) and max(throttled) <= 64 * 1024
+    assert result.md5 == hashlib.md5(FIRMWARE).hexdigest()
+    assert result.sha1 == hashlib.sha1(FIRMWARE).hexdigest()
+    assert result.sha256 == hashlib.sha256(FIRMWARE).hexdigest()
+    assert save_as.read_bytes() == FIRMWARE
+    assert os.listdir(tmp_path) == ["firmware.bin"]
+    assert result.status == 200
+    assert 0 <= result.ttfb <= result.duration
+
+
+def test_failed_download_leaves_no_file(server, tmp_path):
+    with pytest.raises(Exception):
+        download_file(f"{server}/missing.bin", str(tmp_path / "missing.bin"))
+    assert os.listdir(tmp_path) == []
+
+
+def test_truncated_download_leaves_no_file(server, tmp_path):
+    with pytest.raises((IncompleteDownload, Exception)):
+        download_file(f"{server}/truncated.bin", str(tmp_path / "truncated.bin"))
+    assert os.listdir(tmp_path) == []
+
+
+def test_interrupted_download_is_resumed(server, tmp_path):
+    save_as = tmp_path / "resumable.bin"
+    range_requests.clear()
+    with pytest.raises(Exception):
+        download_file(f"{server}/resumable.bin", str(save_as))
+    assert sorted(os.listdir(tmp_path)) == [
+        "resumable.bin.part",
+        "resumable.bin.part.json",
+    ]
+
+    result = download_file(f"{server}/resumable.bin", str(save_as))
+
+    assert range_requests == [None, f"bytes={len(FIRMWARE) // 2}-"]
+    assert result.num_bytes == len(FIRMWARE) - len(FIRMWARE) // 2
+    assert result.sha256 == hashlib.sha256(FIRMWARE).hexdigest()
+    assert save_as.read_bytes() == FIRMWARE
+    assert os.listdir(tmp_path) == ["resumable.bin"]
+
+
+def test_changed_file_is_downloaded_again(server, tmp_path):
+    save_as = tmp_path / "resumable.bin"
+    (tmp_path / "resumable.bin.part").write_bytes(b"outdated")
+    (tmp_path / "resumable.bin.part.json").write_text(
+        json.dumps(
+            {"url": f"{server}/resumable.bin", "etag": '"v0"', "resumable": True}
+        )
+    )
+    # the server ignores the range of the outdated ETag and breaks off halfway
+    with pytest.raises(Exception):
+        download_file(f"{server}/resumable.bin", str(save_as))
+    assert (tmp_path / "resumable.bin.part").read_bytes() == FIRMWARE[
+        : len(FIRMWARE) // 2
+    ]
+
+
+def test_unchanged_file_is_not_downloaded_again(server, tmp_path):
+    save_as = tmp_path / "conditional.bin"
+    result = download_file(f"{server}/conditional.bin", str(save_as))
+    assert result.modified
+    assert result.validators == {
+        "etag": '"v1"',
+        "last_modified": None,
+        "content_length": len(FIRMWARE),
+        "content_type": None,
+    }
+    save_as.unlink()
+
+    result = download_file(
+        f"{server}/conditional.bin", str(save_as), validators=result.validators
+    )
+    assert not result.modified and result.num_bytes == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_engine_limits_connections_per_host(server, tmp_path):
+    port = server.rsplit(":", 1)[1]
+    hosts = [f"http://127.0.0.1:{port}", f"http://localhost:{port}"]
+    jobs = [
+        (i, f"{hosts[i % 2]}/slow/{i}", str(tmp_path / f"{i}.bin"))
+        for i in range(8)
+    ]
+    max_active.clear()
+    with DownloadEngine(max_workers=4, per_host_limit=2) as engine:
+        start = time.perf_counter()
+        results = list(engine.download_all(jobs))
+        duration = time.perf_counter() - start
+
+    assert sorted(key for key, *_ in results) == list(range(8))
+    assert all(
+        error is None and result.size == 4 for *_, result, error in results
+    )
+    assert max(max_active.values()) <= 2
+    # 8 downloads of 0.2s on 4 workers take two rounds instead of eight
+    assert duration < 1.2
+
+
+def test_engine_reports_failed_jobs(server, tmp_path):
+    jobs = [
+        (1, f"{server}/firmware.bin", str(tmp_path / "firmware.bin")),
+        (2, f"{server}/missing.bin", str(tmp_path / "missing.bin")),
+    ]
+    with DownloadEngine(max_workers=2) as engine:
+        results = {
+            key: (result, error)
+            for key, _, _, result, error in engine.download_all(jobs)
+        }
+
+    assert results[1][0].size == len(FIRMWARE) and results[1][1] is None
+    assert results[2][0] is None and results[2][1] is not None
+
+
+def test_probe_without_head_support_falls_back_to_get(server):
+    # the test server answers HEAD with 501 Not Implemented
+    info = probe_url(f"{server}/firmware.bin")
+    assert info["content_length"] == len(FIRMWARE)
+
+
+def test_disk_budget_admits_only_downloads_that_fit(tmp_path):
+    budget = DiskBudget(str(tmp_path), budget_bytes=100)
+    assert budget.reserve(60)
+    assert not budget.reserve(60)
+    budget.release(60, downloaded=False)
+    assert budget.reserve(60)
+    assert not budget.reserve(None)
+
+    # downloads of unknown size are admitted with a conservative estimate of their size
+    budget = DiskBudget(str(tmp_path), budget_bytes=100, unknown_size_bytes=40)
+    assert budget.reserve(None) and budget.reserve(None)
+    assert not budget.reserve(None)
+    budget.release(None, downloaded=False)
+    assert budget.reserve(None)
+
+    full_disk = DiskBudget(
+        str(tmp_path), reserve_bytes=shutil.disk_usage(tmp_path).free
+    )
+    assert not full_disk.reserve(1)
+    assert not full_disk.reserve(None)
+
+
+def test_checksum_algorithm_is_detected_by_length(server, tmp_path):
+    result = download_file(f"{server}/firmware.bin", str(tmp_path / "fw.bin"))
+    assert verify_checksum(result, hashlib.md5(FIRMWARE).hexdigest().upper())
+    assert verify_checksum(result, hashlib.sha1(FIRMWARE).hexdigest())
+    assert verify_checksum(result, f" {hashlib.sha256(FIRMWARE).hexdigest()}\n")
+    assert verify_checksum(result, hashlib.md5(b"other").hexdigest()) is False
+    assert verify_checksum(result, None) is None
+    assert verify_checksum(result, "see release notes") is None
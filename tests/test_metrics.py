@@ -0,0 +1,27 @@
+from src.metrics import DownloadMetrics, percentiles
+
+
+def test_percentiles():
+    assert percentiles(list(range(1, 101))) == {"p50": 50, "p90": 90, "p99": 99}
+    assert percentiles([2.0]) == {"p50": 2.0, "p90": 2.0, "p99": 2.0}
+    assert percentiles([]) == {"p50": None, "p90": None, "p99": None}
+
+
+def test_downloads_are_aggregated_per_host_and_vendor():
+    metrics = DownloadMetrics()
+    metrics.record("DLink", "a.example.com", 200, 2_000_000, duration=1.0, ttfb=0.2)
+    metrics.record("DLink", "a.example.com", 200, 8_000_000, duration=2.0, ttfb=0.4)
+    metrics.record("DLink", "b.example.com", 404, retries=2, error="Not Found")
+    metrics.record("Zyxel", "b.example.com", 304, duration=0.1, ttfb=0.1)
+
+    summary = metrics.summary()
+    host = summary["hosts"]["a.example.com"]
+    assert host["bytes"] == 10_000_000
+    assert host["throughput_mb_per_s"] == {"p50": 2.0, "p90": 4.0, "p99": 4.0}
+    assert host["ttfb_s"]["p90"] == 0.4
+    vendor = summary["vendors"]["DLink"]
+    assert vendor["files"] == 3 and vendor["error_rate"] == 0.3333
+    assert vendor["retries"] == 2
+    # a 304 response has no throughput
+    assert summary["vendors"]["Zyxel"]["throughput_mb_per_s"]["p50"] is None
+    assert summary["hosts"]["b.example.com"]["status"] == {"404": 1, "304": 1}
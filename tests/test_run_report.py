@@ -0,0 +1,55 @@
+import json
+import os
+
+from src.run_report import RunReport
+
+
+def test_stages_and_counters_are_accumulated():
+    report = RunReport()
+    with report.stage("DLink", "compare"):
+        pass
+    report.add_duration("DLink", "download", 1.5)
+    report.add_duration("DLink", "download", 0.5)
+    report.count("DLink", "bytes_downloaded", 100)
+    report.count("Zyxel", "bytes_downloaded", 50)
+    report.set_status("DLink", "scraped")
+
+    result = report.to_dict()
+    assert result["vendors"]["DLink"]["stages"]["download"] == 2.0
+    assert result["vendors"]["DLink"]["stages"]["compare"] >= 0
+    assert result["vendors"]["DLink"]["status"] == "scraped"
+    assert result["totals"]["bytes_downloaded"] == 150
+
+
+def test_merge_worker_report():
+    report = RunReport()
+    report.count("DLink", "failures")
+
+    worker_report = RunReport()
+    worker_report.count("DLink", "failures", 2)
+    worker_report.add_duration("DLink", "catalog_scrape", 3.0)
+    worker_report.set_status("DLink", "aborted")
+    report.merge(worker_report.vendors)
+
+    assert report.vendors["DLink"]["counters"]["failures"] == 3
+    assert report.vendors["DLink"]["stages"]["catalog_scrape"] == 3.0
+    assert report.vendors["DLink"]["status"] == "aborted"
+
+
+def test_write_report(tmp_path):
+    report = RunReport()
+    report.count("DLink", "records_produced", 10)
+    path = report.write(str(tmp_path))
+
+    with open(path) as report_file:
+        assert json.load(report_file)["totals"] == {"records_produced": 10}
+    # download metrics are only written if something was downloaded
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+    report.downloads.record("DLink", "example.com", 200, 8, duration=1.0, ttfb=0.1)
+    report.write(str(tmp_path))
+    metrics_path = path.replace("run_report_", "download_metrics_")
+    with open(metrics_path) as metrics_file:
+        metrics = json.load(metrics_file)
+    assert metrics["vendors"]["DLink"]["files"] == 1
+    assert metrics["files"][0]["host"] == "example.com"
@@ -0,0 +1,89 @@
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from src.unpacker import (
+    ArchiveLimitExceeded,
+    Unpacker,
+    archive_type,
+    unpack_archive,
+)
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, content in members.items():
+            zip_file.writestr(name, content)
+
+
+def test_nested_archives_are_unpacked(tmp_path):
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, "w") as zip_file:
+        zip_file.writestr("firmware.bin", b"firmware")
+    archive = tmp_path / "bundle.zip"
+    make_zip(archive, {"notes.txt": b"release notes", "inner.zip": inner.getvalue()})
+
+    files = unpack_archive(str(archive), str(tmp_path / "bundle.zip.extracted"))
+
+    paths = {
+        os.path.relpath(path, tmp_path / "bundle.zip.extracted"): checksums
+        for path, *checksums in files
+    }
+    assert sorted(paths) == [
+        "inner.zip",
+        os.path.join("inner.zip.extracted", "firmware.bin"),
+        "notes.txt",
+    ]
+    md5, sha1, sha256, size = paths[os.path.join("inner.zip.extracted", "firmware.bin")]
+    assert sha256 == hashlib.sha256(b"firmware").hexdigest() and size == 8
+
+
+def test_tar_members_outside_the_archive_are_skipped(tmp_path):
+    archive = tmp_path / "firmware.tar"
+    with tarfile.open(archive, "w") as tar_file:
+        for name in ["../evil.sh", "fw/firmware.bin"]:
+            info = tarfile.TarInfo(name)
+            info.size = 8
+            tar_file.addfile(info, io.BytesIO(b"firmware"))
+
+    files = unpack_archive(str(archive), str(tmp_path / "out"))
+
+    assert [path for path, *_ in files] == [str(tmp_path / "out" / "fw" / "firmware.bin")]
+    assert not (tmp_path / "evil.sh").exists()
+
+
+def test_zip_bombs_are_rejected(tmp_path):
+    archive = tmp_path / "bomb.zip"
+    make_zip(archive, {"zeros.bin": b"\0" * 1024 * 1024})
+
+    with pytest.raises(ArchiveLimitExceeded):
+        unpack_archive(str(archive), str(tmp_path / "out"), {"max_ratio": 100})
+    assert not (tmp_path / "out").exists()
+    with pytest.raises(ArchiveLimitExceeded):
+        unpack_archive(str(archive), str(tmp_path / "out"), {"max_files": 0})
+
+
+def test_unpacker_skips_files_that_are_no_archive(tmp_path):
+    firmware = tmp_path / "firmware.bin"
+    firmware.write_bytes(b"\x27\x05\x19\x56" + b"firmware" * 64)
+    archive = tmp_path / "firmware.zip"
+    make_zip(archive, {"firmware.bin": b"firmware"})
+    assert archive_type(str(firmware)) is None
+
+    with Unpacker(workers=1) as unpacker:
+        results = {
+            key: (files, error)
+            for key, _, _, files, error in unpacker.unpack_all(
+                [
+                    (1, str(firmware), str(tmp_path / "1")),
+                    (2, str(archive), str(tmp_path / "2")),
+                ]
+            )
+        }
+
+    assert results[1] == (None, None)
+    assert len(results[2][0]) == 1 and results[2][1] is None
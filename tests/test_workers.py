@@ -0,0 +1,126 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src import Vendors, workers
+from src.run_report import RunReport
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="workers are watched through /proc"
+)
+
+
+def _fake_vendor(vendor, max_products, config, result_queue):
+    """Worker that behaves as configured for its vendor instead of scraping"""
+    os.setsid()
+    behaviour = config["behaviour"][vendor]
+    if behaviour in ("hang", "orphan"):
+        # a child in the same process group, like chromedriver
+        child = subprocess.Popen(["sleep", "60"])
+        with open(os.path.join(config["pid_dir"], f"{vendor}.pid"), "w") as pid_file:
+            pid_file.write(str(child.pid))
+    if behaviour == "finish":
+        report = RunReport()
+        report.count(getattr(Vendors, vendor).name, "records_produced", 3)
+        result_queue.put((vendor, True, report.vendors))
+    elif behaviour == "crash":
+        os._exit(3)
+    elif behaviour == "hang":
+        time.sleep(60)
+    elif behaviour == "late":
+        time.sleep(3)
+    elif behaviour == "leak":
+        memory = b"\1" * 400 * 2**20
+        time.sleep(60)
+
+
+def _is_running(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            return stat_file.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def _child_is_killed(pid_dir, vendor):
+    pid = int((pid_dir / f"{vendor}.pid").read_text())
+    deadline = time.monotonic() + 5
+    while _is_running(pid) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    return not _is_running(pid)
+
+
+def test_workers_over_budget_are_killed_with_their_process_group(monkeypatch, tmp_path):
+    monkeypatch.setattr(workers, "_run_vendor", _fake_vendor)
+    config = {
+        "worker_timeout": 8,
+        "worker_memory_limit_mb": 300,
+        "pid_dir": str(tmp_path),
+        "behaviour": {
+            "AVMScraper": "finish",
+            "BelkinScraper": "crash",
+            "LinksysScraper": "hang",
+            "ZyxelScraper": "leak",
+        },
+    }
+    report = RunReport()
+    scraped = []
+
+    results = workers.run_vendor_processes(
+        [(vendor, None) for vendor in config["behaviour"]],
+        max_parallel_vendors=4,
+        config=config,
+        on_vendor_scraped=lambda vendor, success: scraped.append(vendor),
+        report=report,
+    )
+
+    assert results == {
+        "AVMScraper": True,
+        "BelkinScraper": False,
+        "LinksysScraper": False,
+        "ZyxelScraper": False,
+    }
+    assert sorted(scraped) == sorted(results)
+    # the memory limit is hit before the timeout
+    assert scraped[-1] == "LinksysScraper"
+    vendors = report.to_dict()["vendors"]
+    assert vendors["AVM"]["counters"] == {"records_produced": 3}
+    assert vendors["Belkin"]["status"] == "crashed"
+    assert vendors["Linksys"]["status"] == "killed"
+    assert vendors["Zyxel"]["status"] == "killed"
+    assert all(
+        vendors[vendor]["counters"]["failures"] == 1
+        for vendor in ["Belkin", "Linksys", "Zyxel"]
+    )
+    assert _child_is_killed(tmp_path, "LinksysScraper")
+
+
+def test_process_groups_are_killed_when_workers_or_parent_stop(monkeypatch, tmp_path):
+    monkeypatch.setattr(workers, "_run_vendor", _fake_vendor)
+    config = {
+        "pid_dir": str(tmp_path),
+        "behaviour": {
+            "AVMScraper": "orphan",
+            "LinksysScraper": "hang",
+            "ZyxelScraper": "late",
+        },
+    }
+
+    def on_vendor_scraped(vendor, success):
+        if vendor == "ZyxelScraper":
+            raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        workers.run_vendor_processes(
+            [(vendor, None) for vendor in config["behaviour"]],
+            max_parallel_vendors=3,
+            config=config,
+            on_vendor_scraped=on_vendor_scraped,
+        )
+
+    # the child of a worker that exited normally, and the one of a worker still running
+    assert _child_is_killed(tmp_path, "AVMScraper")
+    assert _child_is_killed(tmp_path, "LinksysScraper")